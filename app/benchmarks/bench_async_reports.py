@@ -0,0 +1,84 @@
+'''
+Concurrent inventory report downloads by slow clients, sync (WSGI) against async (ASGI) endpoint.
+
+    SQL_TEST_DATABASE=/tmp/bench.sqlite3 python manage.py test benchmarks.bench_async_reports
+
+A WSGI server holds a worker thread for the whole download, so with WSGI_THREADS threads the
+downloads queue behind each other. The ASGI endpoint releases the worker while waiting on the
+client, so all the downloads progress at the same time.
+'''
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, Client, TransactionTestCase
+
+from benchmarks.seed import seed_audit_history
+from inventory.models import Staff
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+AUDITS = 20000
+DOWNLOADS = 16
+WSGI_THREADS = 4
+# Seconds a slow client takes to read each chunk of the report
+CLIENT_DELAY = 0.05
+
+
+class AsyncReportsBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(20)
+        self.menu = create_menu(self.location, self.ingredients[:5])
+        seed_audit_history(
+            self.location, self.manager, self.ingredients, self.menu, AUDITS,
+            datetime(2023, 3, 1, tzinfo=timezone.utc), datetime(2023, 3, 31, tzinfo=timezone.utc)
+        )
+        self.payload = {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2024'
+        }
+
+    def download(self):
+        response = Client().post('/inventory/inventory-report/', self.payload, content_type='application/json')
+        size = 0
+        for chunk in response.streaming_content:
+            time.sleep(CLIENT_DELAY)
+            size += len(chunk)
+        return size
+
+    async def adownload(self):
+        response = await AsyncClient().post('/inventory/async/inventory-report/', self.payload, content_type='application/json')
+        size = 0
+        async for chunk in response.streaming_content:
+            await asyncio.sleep(CLIENT_DELAY)
+            size += len(chunk)
+        return size
+
+    async def adownload_all(self):
+        return await asyncio.gather(*(self.adownload() for _ in range(DOWNLOADS)))
+
+    def test_concurrent_slow_downloads(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WSGI_THREADS) as pool:
+            sync_sizes = list(pool.map(lambda _: self.download(), range(DOWNLOADS)))
+        sync_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        async_sizes = async_to_sync(self.adownload_all)()
+        async_elapsed = time.perf_counter() - started
+
+        print(f"\n{DOWNLOADS} downloads of {AUDITS} audits, {CLIENT_DELAY * 1000:.0f}ms per chunk")
+        print(f"{'WSGI, ' + str(WSGI_THREADS) + ' threads':<22} {sync_elapsed:>8.2f}s")
+        print(f"{'ASGI, 1 event loop':<22} {async_elapsed:>8.2f}s")
+
+        self.assertEqual(sync_sizes, async_sizes)
+        self.assertLess(async_elapsed, sync_elapsed)
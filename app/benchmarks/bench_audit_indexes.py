@@ -0,0 +1,77 @@
+'''
+Report latency while the audit history of the whole chain grows 100x.
+
+    python manage.py test benchmarks.bench_audit_indexes
+
+The requested location keeps the same audits in the report period, only the history of the
+other locations and of previous years grows. With the (location, created_at) and
+(location, reason, created_at) indexes the report latency should stay flat.
+'''
+import statistics
+import time
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from benchmarks.seed import seed_audit_history, analyze
+from inventory.models import Staff
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+BASE_HISTORY = 1000
+GROWTH = (1, 10, 100)
+REPEAT = 20
+
+
+class AuditIndexesBenchmark(TestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.other_locations = [create_location(f"Other {index}") for index in range(9)]
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location, *self.other_locations)
+        self.ingredients = create_ingredients(50)
+        self.menu = create_menu(self.location, self.ingredients[:5])
+        self.period = {'start_date': '01/03/2023', 'end_date': '15/03/2023'}
+        seed_audit_history(
+            self.location, self.manager, self.ingredients, self.menu, BASE_HISTORY,
+            datetime(2023, 3, 1, tzinfo=timezone.utc), datetime(2023, 3, 15, tzinfo=timezone.utc)
+        )
+
+    def time_report(self, url):
+        payload = {'staff_id': self.manager.staff_id, 'location_id': self.location.location_id, **self.period}
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            response = self.client.post(url, payload, content_type='application/json')
+            b''.join(response.streaming_content) if response.streaming else response.content
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def test_report_latency_while_history_grows(self):
+        seeded = 0
+        results = []
+        for growth in GROWTH:
+            target = BASE_HISTORY * growth
+            per_location = (target - seeded) // len(self.other_locations)
+            for location in self.other_locations:
+                seed_audit_history(
+                    location, self.manager, self.ingredients, self.menu, per_location,
+                    datetime(2021, 1, 1, tzinfo=timezone.utc), datetime(2023, 12, 31, tzinfo=timezone.utc)
+                )
+            seeded = target
+            call_command('rebuild_rollups', stdout=StringIO())
+            analyze()
+            results.append((
+                growth,
+                self.time_report('/inventory/inventory-report/'),
+                self.time_report('/inventory/finantial-summary/'),
+            ))
+
+        print(f"\n{'history':>10} {'inventory report ms':>20} {'financial summary ms':>21}")
+        for growth, inventory_report, financial_summary in results:
+            print(f"{growth * BASE_HISTORY:>10} {inventory_report * 1000:>20.2f} {financial_summary * 1000:>21.2f}")
+
+        base, largest = results[0], results[-1]
+        self.assertLess(largest[1], base[1] * 3)
+        self.assertLess(largest[2], base[2] * 3)
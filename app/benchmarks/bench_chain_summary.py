@@ -0,0 +1,66 @@
+'''
+Financial summary of a whole chain: one request per location against the chain-wide grouped queries,
+in the calling thread and spread over worker threads.
+
+    SQL_TEST_DATABASE=/tmp/bench.sqlite3 python manage.py test benchmarks.bench_chain_summary
+
+The period starts and ends in the middle of a day, so both the rollups and the raw audits at its edges are read.
+On SQLite the threads mostly add the cost of opening their connections, PostgreSQL runs
+the batches on several backends at the same time.
+'''
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from benchmarks.seed import seed_catalog, seed_audit_history
+from inventory.models import Ingredient
+from inventory.reports import chain_financial_summaries_by_batch, financial_summary
+
+LOCATIONS = 20
+AUDITS = 4000
+DAYS = 365
+BATCH_SIZE = 10
+WORKERS = 4
+
+
+class ChainSummaryBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        now = datetime.now(timezone.utc)
+        self.seeded = seed_catalog(locations=LOCATIONS, ingredients=100, recipes=20, menus_per_location=10)
+        for seeded in self.seeded:
+            ingredients = list(Ingredient.objects.filter(ingredient_id__in=seeded.ingredient_ids))
+            seed_audit_history(seeded.location, seeded.chef, ingredients, seeded.menus[0], AUDITS, now - timedelta(days=DAYS), now)
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.start = now - timedelta(days=DAYS - 1, hours=5)
+        self.end = now - timedelta(hours=5)
+        self.location_ids = [seeded.location.location_id for seeded in self.seeded]
+
+    def test_chain_summary(self):
+        started = time.perf_counter()
+        one_by_one = {location_id: financial_summary(location_id, self.start, self.end) for location_id in self.location_ids}
+        per_location = time.perf_counter() - started
+
+        started = time.perf_counter()
+        grouped = dict(chain_financial_summaries_by_batch(self.location_ids, self.start, self.end, batch_size=LOCATIONS, workers=1))
+        single_batch = time.perf_counter() - started
+
+        started = time.perf_counter()
+        parallel = dict(chain_financial_summaries_by_batch(self.location_ids, self.start, self.end, batch_size=BATCH_SIZE, workers=WORKERS))
+        threaded = time.perf_counter() - started
+
+        print(f"\n{LOCATIONS} locations x {AUDITS} stock audits over {DAYS} days ({connection.vendor})")
+        print(f"{'one summary per location':<36} {per_location * 1000:8.1f} ms")
+        print(f"{'grouped, one batch':<36} {single_batch * 1000:8.1f} ms")
+        print(f"{f'grouped, {WORKERS} threads x {BATCH_SIZE} locations':<36} {threaded * 1000:8.1f} ms")
+
+        for location_id, summary in one_by_one.items():
+            for field, value in summary.items():
+                self.assertAlmostEqual(grouped[location_id][field], value, places=4)
+                self.assertAlmostEqual(parallel[location_id][field], value, places=4)
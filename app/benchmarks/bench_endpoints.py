@@ -0,0 +1,225 @@
+'''
+Mixed traffic through the inventory endpoints of a seeded chain, at a configurable concurrency.
+
+    SQL_TEST_DATABASE=/tmp/bench.sqlite3 python manage.py test benchmarks.bench_endpoints
+
+Reports the throughput, p50/p95/p99 latency, errors and queries per request of every endpoint and
+saves them as JSON, to compare runs between commits. Configured with environment variables:
+
+    BENCH_CONCURRENCY   concurrent clients (default 4)
+    BENCH_REQUESTS      requests per client (default 200)
+    BENCH_MIX           endpoint weights (default delivery:2,waste:1,sale:10,order:4,inventory_report:1,financial_summary:1)
+    BENCH_LOCATIONS     seeded locations (default 5)
+    BENCH_INGREDIENTS   seeded ingredients (default 300)
+    BENCH_HISTORY       seeded stock audits per location (default 5000)
+    BENCH_OUTPUT        JSON results file (default bench_endpoints.json)
+    BENCH_BASELINE      JSON results of a previous run to compare with
+'''
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from benchmarks.seed import seed_catalog, seed_audit_history
+from inventory import sale_plan
+from inventory.models import Ingredient
+
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', 4))
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', 200))
+MIX = os.environ.get('BENCH_MIX', 'delivery:2,waste:1,sale:10,order:4,inventory_report:1,financial_summary:1')
+LOCATIONS = int(os.environ.get('BENCH_LOCATIONS', 5))
+INGREDIENTS = int(os.environ.get('BENCH_INGREDIENTS', 300))
+HISTORY = int(os.environ.get('BENCH_HISTORY', 5000))
+OUTPUT = os.environ.get('BENCH_OUTPUT', 'bench_endpoints.json')
+BASELINE = os.environ.get('BENCH_BASELINE')
+
+REPORT_DAYS = 30
+
+
+def parse_mix(mix):
+    weights = {}
+    for entry in mix.split(','):
+        name, weight = entry.split(':')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(timings, percent):
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[percent - 1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class EndpointsBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        if CONCURRENCY > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        sale_plan.invalidate()
+        self.locations = seed_catalog(locations=LOCATIONS, ingredients=INGREDIENTS)
+        now = datetime.now(timezone.utc)
+        for seeded in self.locations:
+            ingredients = list(Ingredient.objects.filter(ingredient_id__in=seeded.ingredient_ids))
+            seed_audit_history(
+                seeded.location, seeded.chef, ingredients, seeded.menus[0], HISTORY, now - timedelta(days=90), now
+            )
+        call_command('rebuild_rollups', stdout=StringIO())
+        today = now.date()
+        self.period = {
+            'start_date': (today - timedelta(days=REPORT_DAYS)).strftime('%d/%m/%Y'),
+            'end_date': today.strftime('%d/%m/%Y'),
+        }
+
+    # Each request builder returns the url and body of a random request of its endpoint
+
+    def delivery(self, rng, seeded):
+        return '/inventory/ingredient-stock/accept-delivery/', {
+            'staff_id': seeded.chef.staff_id,
+            'location_id': seeded.location.location_id,
+            'delivery': [
+                {'ingredient_id': ingredient_id, 'units': rng.randint(10, 50)}
+                for ingredient_id in rng.sample(seeded.ingredient_ids, min(10, len(seeded.ingredient_ids)))
+            ],
+        }
+
+    def waste(self, rng, seeded):
+        return '/inventory/ingredient-stock/take-stock/', {
+            'staff_id': seeded.chef.staff_id,
+            'location_id': seeded.location.location_id,
+            'take_stock': [
+                {'ingredient_id': ingredient_id, 'units': 0.5}
+                for ingredient_id in rng.sample(seeded.ingredient_ids, min(3, len(seeded.ingredient_ids)))
+            ],
+        }
+
+    def sale(self, rng, seeded):
+        return f"/inventory/menu/{rng.choice(seeded.menus).menu_id}/sell/", {
+            'staff_id': seeded.front_of_house.staff_id,
+            'location_id': seeded.location.location_id,
+        }
+
+    def order(self, rng, seeded):
+        return '/inventory/order/sell/', {
+            'staff_id': seeded.front_of_house.staff_id,
+            'location_id': seeded.location.location_id,
+            'items': [{'menu_id': menu.menu_id, 'quantity': rng.randint(1, 3)} for menu in rng.sample(seeded.menus, 3)],
+        }
+
+    def inventory_report(self, rng, seeded):
+        return '/inventory/inventory-report/', {
+            'staff_id': seeded.manager.staff_id,
+            'location_id': seeded.location.location_id,
+            **self.period,
+        }
+
+    def financial_summary(self, rng, seeded):
+        return '/inventory/finantial-summary/', {
+            'staff_id': seeded.manager.staff_id,
+            'location_id': seeded.location.location_id,
+            **self.period,
+        }
+
+    def run_client(self, worker, weights, results):
+        rng = random.Random(worker)
+        client = Client()
+        names, relative_weights = list(weights), list(weights.values())
+        self.barrier.wait()
+        try:
+            for _ in range(REQUESTS):
+                name = rng.choices(names, relative_weights)[0]
+                url, body = getattr(self, name)(rng, rng.choice(self.locations))
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post(url, body, content_type='application/json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                results[name].append((elapsed, len(queries), response.status_code == 200))
+        finally:
+            connection.close()
+
+    def test_mixed_traffic(self):
+        weights = parse_mix(MIX)
+        results = defaultdict(list)
+        self.barrier = threading.Barrier(CONCURRENCY)
+        started = time.perf_counter()
+        if CONCURRENCY == 1:
+            # in the test thread, which can use an in-memory test database
+            self.run_client(0, weights, results)
+        else:
+            threads = [threading.Thread(target=self.run_client, args=(worker, weights, results)) for worker in range(CONCURRENCY)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        endpoints = {}
+        for name in weights:
+            samples = results.get(name)
+            if not samples:
+                continue
+            timings = [timing for timing, _, _ in samples]
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, _, ok in samples if not ok),
+                'throughput': len(samples) / elapsed,
+                'p50_ms': percentile(timings, 50) * 1000,
+                'p95_ms': percentile(timings, 95) * 1000,
+                'p99_ms': percentile(timings, 99) * 1000,
+                'queries_per_request': statistics.mean(queries for _, queries, _ in samples),
+            }
+        summary = {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'config': {
+                'concurrency': CONCURRENCY, 'requests': REQUESTS, 'mix': weights,
+                'locations': LOCATIONS, 'ingredients': INGREDIENTS, 'history': HISTORY,
+            },
+            'elapsed': elapsed,
+            'throughput': sum(endpoint['requests'] for endpoint in endpoints.values()) / elapsed,
+            'endpoints': endpoints,
+        }
+        with open(OUTPUT, 'w') as output:
+            json.dump(summary, output, indent=2)
+
+        baseline = {}
+        if BASELINE:
+            with open(BASELINE) as baseline_file:
+                baseline = json.load(baseline_file)['endpoints']
+
+        print(f"\n{CONCURRENCY} clients, {summary['throughput']:.1f} requests/s overall, saved to {OUTPUT}")
+        print(f"{'endpoint':<18} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name, endpoint in endpoints.items():
+            print(
+                f"{name:<18} {endpoint['requests']:>8} {endpoint['errors']:>6} {endpoint['throughput']:>8.1f} "
+                f"{endpoint['p50_ms']:>8.2f} {endpoint['p95_ms']:>8.2f} {endpoint['p99_ms']:>8.2f} {endpoint['queries_per_request']:>8.1f}"
+            )
+            if name in baseline:
+                print(
+                    f"{'  vs baseline':<18} {'':>8} {'':>6} {endpoint['throughput'] / baseline[name]['throughput'] - 1:>+8.0%} "
+                    f"{endpoint['p50_ms'] / baseline[name]['p50_ms'] - 1:>+8.0%} {endpoint['p95_ms'] / baseline[name]['p95_ms'] - 1:>+8.0%} "
+                    f"{endpoint['p99_ms'] / baseline[name]['p99_ms'] - 1:>+8.0%} "
+                    f"{endpoint['queries_per_request'] - baseline[name]['queries_per_request']:>+8.1f}"
+                )
+
+        self.assertEqual(sum(endpoint['requests'] for endpoint in endpoints.values()), CONCURRENCY * REQUESTS)
@@ -0,0 +1,73 @@
+'''
+Menu availability of a location with hundreds of menu items and ingredients.
+
+    python manage.py test benchmarks.bench_menu_availability
+
+Compares the NumPy matrix computation with the same computation over Python dicts, and times the
+whole endpoint with the matrix cached.
+'''
+import statistics
+import time
+
+from django.test import TestCase
+
+from benchmarks.seed import seed_catalog
+from inventory import availability
+from inventory.models import RecipeIngredient
+
+MENUS = 400
+INGREDIENTS = 600
+INGREDIENTS_PER_RECIPE = 12
+REPEAT = 50
+
+
+def median_time(function):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+class MenuAvailabilityBenchmark(TestCase):
+
+    def setUp(self):
+        availability.invalidate()
+        self.seeded, = seed_catalog(
+            locations=1, ingredients=INGREDIENTS, recipes=MENUS, ingredients_per_recipe=INGREDIENTS_PER_RECIPE,
+            menus_per_location=MENUS, units=1000
+        )
+        self.location_id = self.seeded.location.location_id
+
+    def python_portions(self, recipes, stock):
+        return {
+            recipe_id: min(stock.get(ingredient_id, 0.0) // quantity for ingredient_id, quantity in lines)
+            for recipe_id, lines in recipes.items()
+        }
+
+    def test_availability(self):
+        matrix = availability.get_menu_matrix(self.location_id)
+        stock = availability.stock_vector(self.location_id, matrix.ingredient_ids)
+        numpy_time = median_time(lambda: availability.portions(matrix, stock))
+
+        recipes = {}
+        for recipe_id, ingredient_id, quantity in RecipeIngredient.objects.values_list('recipe_id', 'ingredient_id', 'quantity'):
+            recipes.setdefault(recipe_id, []).append((ingredient_id, quantity))
+        stock_by_ingredient = dict(zip(matrix.ingredient_ids.tolist(), stock.tolist()))
+        python_time = median_time(lambda: self.python_portions(recipes, stock_by_ingredient))
+
+        endpoint_time = median_time(lambda: self.client.post('/inventory/menu/availability/', {
+            'staff_id': self.seeded.chef.staff_id,
+            'location_id': self.location_id
+        }, content_type='application/json'))
+        availability.invalidate()
+        compile_time = median_time(lambda: availability.compile_menu_matrix(self.location_id))
+
+        print(f"\n{MENUS} menu items x {len(matrix.ingredient_ids)} ingredients")
+        print(f"{'numpy portions':<24} {numpy_time * 1000:>8.3f} ms")
+        print(f"{'python portions':<24} {python_time * 1000:>8.3f} ms")
+        print(f"{'matrix compilation':<24} {compile_time * 1000:>8.3f} ms")
+        print(f"{'endpoint, cached matrix':<24} {endpoint_time * 1000:>8.3f} ms")
+
+        self.assertLess(numpy_time, python_time)
@@ -0,0 +1,64 @@
+'''
+Chain-wide reorder suggestions over a year of consumption.
+
+    python manage.py test benchmarks.bench_reorder_suggestions
+
+Seeds the daily rollups of a year of sales and waste of every ingredient of every location (what
+rebuild_rollups makes of a year of audits) and times the suggestions of the whole chain.
+'''
+import random
+import time
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory.forecast import reorder_suggestions
+from inventory.models import DailyStockRollup, IngredientStock, Staff
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+LOCATIONS = 10
+INGREDIENTS = 200
+DAYS = 365
+# Seconds the suggestions of the whole chain must take at most
+TIME_BUDGET = 5.0
+
+
+class ReorderSuggestionsBenchmark(TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.locations = [create_location(f"Location {index}") for index in range(LOCATIONS)]
+        create_staff(1, Staff.StaffRoles.MANAGER, *self.locations)
+        ingredients = create_ingredients(INGREDIENTS)
+        today = timezone.localdate()
+        for location in self.locations:
+            IngredientStock.objects.bulk_create([
+                IngredientStock(ingredient=ingredient, location=location, units_available=rng.uniform(0, 100))
+                for ingredient in ingredients
+            ])
+            rollups = []
+            for ingredient in ingredients:
+                base_rate = rng.uniform(0.5, 10)
+                for days_ago in range(1, DAYS + 1):
+                    day = today - timedelta(days=days_ago)
+                    units = base_rate * rng.uniform(0.5, 1.5)
+                    rollups.append(DailyStockRollup(
+                        day=day, location=location, ingredient=ingredient, reason='sale', units_change=-units, cost=units, entries=1
+                    ))
+                    if days_ago % 5 == 0:
+                        rollups.append(DailyStockRollup(
+                            day=day, location=location, ingredient=ingredient, reason='waste', units_change=-0.1 * units, cost=0.1, entries=1
+                        ))
+            DailyStockRollup.objects.bulk_create(rollups, batch_size=5000)
+
+    def test_chain_wide_suggestions(self):
+        started = time.perf_counter()
+        suggestions = reorder_suggestions()
+        elapsed = time.perf_counter() - started
+
+        print(f"\n{LOCATIONS} locations x {INGREDIENTS} ingredients x {DAYS} days of rollups")
+        print(f"{len(suggestions)} suggestions in {elapsed:.2f}s ({elapsed / LOCATIONS * 1000:.0f} ms per location)")
+
+        self.assertTrue(suggestions)
+        self.assertLess(elapsed, TIME_BUDGET)
@@ -0,0 +1,68 @@
+'''
+Sale latency with the audits inserted in the request transaction against write-behind audits.
+
+    python manage.py test benchmarks.bench_write_behind
+
+In write-behind mode a sale only runs the stock update and appends its audits to the journal,
+the inserts and rollups are paid by the flusher. Run against PostgreSQL (SQL_ENGINE) for numbers that
+match production: an in-memory SQLite insert is cheaper than the journal fsync.
+'''
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.test import TestCase
+
+from inventory import sale_plan
+from inventory.audit import flush_journal
+from inventory.models import IngredientStock, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+SALES = 300
+INGREDIENTS = 8
+
+
+class WriteBehindBenchmark(TestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(INGREDIENTS)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=4 * SALES) for ingredient in self.ingredients
+        ])
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def time_sales(self):
+        timings = []
+        for _ in range(SALES):
+            started = time.perf_counter()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f"/inventory/menu/{self.menu.menu_id}/sell/", {
+                    'staff_id': self.staff.staff_id,
+                    'location_id': self.location.location_id
+                }, content_type='application/json')
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, 200)
+        return statistics.median(timings), statistics.quantiles(timings, n=100)[98]
+
+    def test_sale_latency(self):
+        inline = self.time_sales()
+        with self.settings(AUDIT_WRITE_BEHIND=True, AUDIT_JOURNAL_PATH=os.path.join(self.directory, 'audit-journal.jsonl')):
+            write_behind = self.time_sales()
+            started = time.perf_counter()
+            flushed = flush_journal()
+            flush_elapsed = time.perf_counter() - started
+
+        print(f"\n{SALES} sales of {INGREDIENTS} ingredients")
+        print(f"{'audits':<14} {'median ms':>10} {'p99 ms':>10}")
+        for name, (median, p99) in (('inline', inline), ('write-behind', write_behind)):
+            print(f"{name:<14} {median * 1000:>10.2f} {p99 * 1000:>10.2f}")
+        print(f"flushed {flushed} audits in {flush_elapsed * 1000:.0f}ms")
+
+        self.assertEqual(StockAudit.objects.count(), 2 * SALES * INGREDIENTS)
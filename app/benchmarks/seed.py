@@ -0,0 +1,104 @@
+import datetime
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from inventory.models import Location, Staff, Ingredient, IngredientStock, Recipe, RecipeIngredient, Menu, StockAudit, SalesAudit
+
+# The staff of a location by role, and the ingredients and menu items it uses
+SeededLocation = namedtuple('SeededLocation', ['location', 'chef', 'front_of_house', 'manager', 'ingredient_ids', 'menus'])
+
+
+def seed_audit_history(location, staff, ingredients, menu, count, start, end, batch_size=5000):
+    '''
+    Insert count stock audits and count / 5 sales audits for a location, spread at random between start and end.
+    created_at is set on insert, so the rows are inserted first and moved to their random time afterwards.
+    '''
+    span = (end - start).total_seconds()
+    reasons = [StockAudit.StockAuditReason.DELIVERY, StockAudit.StockAuditReason.SALE, StockAudit.StockAuditReason.WASTE]
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        stock_audits = StockAudit.objects.bulk_create([
+            StockAudit(
+                reason=random.choice(reasons), units_change=1.0, cost=random.uniform(0.1, 5.0),
+                ingredient=random.choice(ingredients), location=location, staff=staff
+            )
+            for _ in range(size)
+        ], batch_size=1000)
+        sales_audits = SalesAudit.objects.bulk_create([
+            SalesAudit(sale_amount=random.uniform(5.0, 15.0), location=location, menu=menu, staff=staff)
+            for _ in range(size // 5)
+        ], batch_size=1000)
+        _spread(StockAudit, [audit.pk for audit in stock_audits], start, span)
+        _spread(SalesAudit, [audit.pk for audit in sales_audits], start, span)
+
+
+def seed_catalog(locations=5, ingredients=300, recipes=60, ingredients_per_recipe=6, menus_per_location=30, units=1e6, seed=0):
+    '''
+    Seed a chain: locations with a chef, a front-of-house and a manager each, an ingredient catalog, recipes
+    and the menu items of every location, with units of stock of every ingredient its menu items use.
+    Returns a SeededLocation per location.
+    '''
+    rng = random.Random(seed)
+    created_locations = Location.objects.bulk_create([
+        Location(name=f"Location {index}", address=f"{index} Seed street") for index in range(locations)
+    ])
+    created_ingredients = Ingredient.objects.bulk_create([
+        Ingredient(name=f"Seed ingredient {index}", unit=Ingredient.IngredientUnit.LITER, cost=round(rng.uniform(0.1, 5.0), 2))
+        for index in range(ingredients)
+    ])
+    created_recipes = Recipe.objects.bulk_create([Recipe(name=f"Seed recipe {index}") for index in range(recipes)])
+    recipe_ingredients = {
+        recipe.recipe_id: rng.sample(created_ingredients, ingredients_per_recipe) for recipe in created_recipes
+    }
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=recipe_id, ingredient=ingredient, quantity=round(rng.uniform(0.05, 0.5), 2))
+        for recipe_id, chosen in recipe_ingredients.items()
+        for ingredient in chosen
+    ])
+
+    seeded = []
+    roles = [Staff.StaffRoles.CHEF, Staff.StaffRoles.FRONT_OF_HOUSE, Staff.StaffRoles.MANAGER]
+    staff_id = Staff.objects.order_by('-staff_id').values_list('staff_id', flat=True).first() or 0
+    for location in created_locations:
+        staff = []
+        for role in roles:
+            staff_id += 1
+            user = User.objects.create(username=f"seed_staff_{staff_id}", is_active=False)
+            member = Staff.objects.create(
+                staff_id=staff_id, user=user, name=f"Seed staff {staff_id}", dob=datetime.date(1990, 1, 1),
+                role=role, iban=f"GB{staff_id:020d}", bic='AAPUGB21'
+            )
+            member.location.add(location)
+            staff.append(member)
+
+        menus = Menu.objects.bulk_create([
+            Menu(recipe=recipe, location=location, price=round(rng.uniform(5.0, 20.0), 2))
+            for recipe in rng.sample(created_recipes, menus_per_location)
+        ])
+        ingredient_ids = sorted({
+            ingredient.ingredient_id for menu in menus for ingredient in recipe_ingredients[menu.recipe_id]
+        })
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient_id=ingredient_id, location=location, units_available=units) for ingredient_id in ingredient_ids
+        ])
+        seeded.append(SeededLocation(location, *staff, ingredient_ids, menus))
+    return seeded
+
+
+def _spread(model, pks, start, span):
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET created_at = %s WHERE {pk_column} = %s",
+            [(start + timedelta(seconds=random.uniform(0, span)), pk) for pk in pks]
+        )
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
@@ -13,6 +13,7 @@ fi
 
 python manage.py flush --no-input  # comment out if you don't want to flush on every container start or re-start
 python manage.py migrate
+python manage.py manage_audit_partitions
 python manage.py import
 
 exec "$@"
\ No newline at end of file
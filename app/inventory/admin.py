@@ -1,16 +1,161 @@
+'''
+Admin of the inventory models. The audit and stock changelists are read with one query per page (their
+foreign keys joined), counted without an exact COUNT(*) of the table, and their date hierarchy comes from
+the first and last audit, so they load in the same time whatever the length of the history.
+'''
+from datetime import date, datetime, time, timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
 
+from inventory.db import estimated_count
+from inventory.partitions import months
 from .models import Location, Recipe, RecipeIngredient, Ingredient,\
     IngredientStock, Staff, Menu, Modifier, ModifierOption, StockAudit, SalesAudit
 
-admin.site.register(Location)
-admin.site.register(Ingredient)
-admin.site.register(IngredientStock)
-admin.site.register(Recipe)
-admin.site.register(RecipeIngredient)
-admin.site.register(Staff)
-admin.site.register(Menu)
-admin.site.register(Modifier)
-admin.site.register(ModifierOption)
-admin.site.register(StockAudit)
-admin.site.register(SalesAudit)
+# Rows a filtered changelist counts at most, the pages after them are not linked
+EXACT_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Counts at most EXACT_COUNT_LIMIT rows, a bounded scan. Beyond that an unfiltered changelist shows the
+    planner's estimate of the table rows on PostgreSQL.
+    '''
+
+    @cached_property
+    def count(self):
+        count = self.object_list[:EXACT_COUNT_LIMIT].count()
+        if count < EXACT_COUNT_LIMIT or self.object_list.query.where:
+            return count
+        return max(estimated_count(self.object_list.model) or 0, count)
+
+
+class DateRangeQuerySet(QuerySet):
+    '''
+    The audits of a changelist, whose date hierarchy lists every year, month or day between the first and
+    the last audit (two seeks on the created_at index) instead of only those with audits, a DISTINCT over
+    all of them. A period without audits shows an empty page.
+    '''
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        date_range = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if date_range['first'] is None:
+            return []
+        first, last = (timezone.localtime(date_range[end], tzinfo).date() for end in ('first', 'last'))
+        if kind == 'year':
+            periods = [date(year, 1, 1) for year in range(first.year, last.year + 1)]
+        elif kind == 'month':
+            periods = list(months(first.replace(day=1), last.replace(day=1)))
+        else:
+            periods = [first + timedelta(days=days) for days in range((last - first).days + 1)]
+        periods = [timezone.make_aware(datetime.combine(period, time()), tzinfo) for period in periods]
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class AuditAdmin(admin.ModelAdmin):
+    '''
+    Read-only changelist of an append-only, ever growing audit table, latest audits first.
+    Audits are created by the stock movements, not here, and never changed or deleted: the rollups,
+    the stock snapshots and the stock are derived from them.
+    '''
+    date_hierarchy = 'created_at'
+    list_filter = ['location']
+    list_select_related = ['location', 'staff']
+    paginator = EstimatedCountPaginator
+    # the unfiltered total is another COUNT(*)
+    show_full_result_count = False
+    ordering = ['-created_at']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateRangeQuerySet(self.model, query=queryset.query, using=queryset.db)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockAudit)
+class StockAuditAdmin(AuditAdmin):
+    list_display = ['stock_audit_id', 'created_at', 'reason', 'ingredient', 'units_change', 'cost', 'location', 'staff']
+    list_filter = ['reason', 'location']
+    list_select_related = ['ingredient', 'location', 'staff']
+
+
+@admin.register(SalesAudit)
+class SalesAuditAdmin(AuditAdmin):
+    list_display = ['sales_audit_id', 'created_at', 'menu', 'sale_amount', 'location', 'staff']
+    list_select_related = ['menu__recipe', 'menu__location', 'location', 'staff']
+
+
+@admin.register(IngredientStock)
+class IngredientStockAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'location', 'units_available']
+    list_filter = ['location']
+    list_select_related = ['ingredient', 'location']
+    search_fields = ['ingredient__name']
+    autocomplete_fields = ['ingredient', 'location']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    ordering = ['name']
+    search_fields = ['name', 'address']
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    ordering = ['name']
+    list_display = ['name', 'unit', 'cost']
+    search_fields = ['name']
+
+
+@admin.register(Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    ordering = ['name']
+    search_fields = ['name']
+
+
+@admin.register(RecipeIngredient)
+class RecipeIngredientAdmin(admin.ModelAdmin):
+    list_select_related = ['ingredient', 'recipe']
+    autocomplete_fields = ['ingredient', 'recipe']
+
+
+@admin.register(Staff)
+class StaffAdmin(admin.ModelAdmin):
+    list_display = ['name', 'role']
+    list_filter = ['role']
+    search_fields = ['name']
+    autocomplete_fields = ['user', 'location']
+
+
+@admin.register(Menu)
+class MenuAdmin(admin.ModelAdmin):
+    list_filter = ['location']
+    list_select_related = ['recipe', 'location']
+    autocomplete_fields = ['recipe', 'location', 'modifier']
+
+
+@admin.register(Modifier)
+class ModifierAdmin(admin.ModelAdmin):
+    ordering = ['name']
+    search_fields = ['name']
+
+
+@admin.register(ModifierOption)
+class ModifierOptionAdmin(admin.ModelAdmin):
+    list_display = ['option', 'modifier', 'ingredient', 'price', 'quantity']
+    list_select_related = ['modifier', 'ingredient']
+    autocomplete_fields = ['modifier', 'ingredient']
@@ -0,0 +1,131 @@
+'''
+Async (ASGI) variants of the report endpoints. A long report download then waits on the database and
+on the client without holding a worker thread, so one ASGI worker can serve many concurrent downloads
+while the sync endpoints keep serving sales.
+DRF views are sync only, these are plain Django async views answering like their DRF counterparts.
+'''
+import csv
+import io
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import exceptions, status
+
+from inventory import report_cache
+from inventory.authentication import StaffTokenAuthentication, authorize_staff
+from inventory.models import StockAudit
+from inventory.reports import INVENTORY_REPORT_HEADER, astream_csv, ainventory_report_rows, afinancial_summary
+from inventory.reports import parse_period, financial_summary_header, financial_summary_row
+from inventory.reports import FINANCIAL_SUMMARY_FIELDS, current_inventory_value
+from inventory.snapshots import EPOCH
+
+
+def async_api_view(view):
+    '''
+    Only accept POST with a JSON body and skip the CSRF check, like the DRF api_view the sync views use.
+    '''
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        try:
+            request_data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+        return await view(request, request_data, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def authorize_manager(request, request_data):
+    '''
+    Async authorize_staff for the Manager role. Returns the location_id and an error response.
+    '''
+    try:
+        # checking the revocation list may need to reload it from the database
+        authenticated = await sync_to_async(StaffTokenAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as error:
+        return None, JsonResponse({'detail': str(error.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    user = authenticated[0] if authenticated else None
+    if user:
+        # no query needed with a token
+        _, location_id, error = authorize_staff(request_data, user, ['Manager'])
+    else:
+        _, location_id, error = await sync_to_async(authorize_staff)(request_data, user, ['Manager'])
+    if error:
+        return None, JsonResponse(error, safe=False, status=status.HTTP_400_BAD_REQUEST)
+    return location_id, None
+
+
+@async_api_view
+async def generate_inventory_report(request, request_data):
+    location_id, error = await authorize_manager(request, request_data)
+    if error:
+        return error
+
+    timezone_start_date, timezone_end_date = parse_period(request_data)
+    filename = f"inventory_report_{int(round(datetime.now().timestamp()))}.csv"
+
+    # The report of a closed period is served from the cache, like the sync endpoint
+    closed = report_cache.is_closed(timezone_end_date)
+    cached = closed and await sync_to_async(report_cache.get)('inventory_report', location_id, timezone_start_date, timezone_end_date)
+    if not cached:
+        stock_audit = StockAudit.objects.filter(location_id=location_id, created_at__range=(timezone_start_date, timezone_end_date))
+        chunks = astream_csv(INVENTORY_REPORT_HEADER, ainventory_report_rows(stock_audit))
+        if closed:
+            cached, chunks = await report_cache.acollect('inventory_report', location_id, timezone_start_date, timezone_end_date, chunks)
+    if cached:
+        if report_cache.not_modified(request, cached.etag):
+            return HttpResponseNotModified(headers={'ETag': cached.etag})
+        return HttpResponse(
+            cached.content, content_type='text/csv', headers={'Content-Disposition': f"attachment; filename={filename}", 'ETag': cached.etag}
+        )
+
+    return StreamingHttpResponse(
+        chunks,
+        content_type='text/csv',
+        headers={'Content-Disposition': f"attachment; filename={filename}"},
+    )
+
+
+@async_api_view
+async def generate_finantial_summary(request, request_data):
+    location_id, error = await authorize_manager(request, request_data)
+    if error:
+        return error
+
+    timezone_start_date, timezone_end_date = parse_period(request_data)
+
+    # The figures of a closed period are cached, only the current inventory value is read again
+    closed = report_cache.is_closed(timezone_end_date)
+    cached = closed and await sync_to_async(report_cache.get)(
+        'financial_summary', location_id, timezone_start_date, timezone_end_date, since=EPOCH
+    )
+    if cached:
+        summary = {**json.loads(cached.content), 'current_inventory_value': await sync_to_async(current_inventory_value)(location_id)}
+    else:
+        computed_at = timezone.now()
+        summary = await afinancial_summary(location_id, timezone_start_date, timezone_end_date)
+        if closed:
+            figures = {field: summary[field] for field in FINANCIAL_SUMMARY_FIELDS if field != 'current_inventory_value'}
+            await sync_to_async(report_cache.put)(
+                'financial_summary', location_id, timezone_start_date, timezone_end_date, json.dumps(figures), computed_at
+            )
+
+    content = io.StringIO()
+    writer = csv.writer(content)
+    writer.writerow(financial_summary_header())
+    writer.writerow(financial_summary_row(location_id, request_data, summary))
+    etag = report_cache.content_etag(content.getvalue())
+    if report_cache.not_modified(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    return HttpResponse(
+        content.getvalue(),
+        content_type='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=finantial_summary_{int(round(datetime.now().timestamp()))}.csv", 'ETag': etag},
+    )
@@ -0,0 +1,167 @@
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from inventory import journal, report_cache, snapshots
+from inventory.db import bulk_upsert_add
+from inventory.models import StockAudit, SalesAudit, DailyStockRollup, DailySalesRollup
+
+# Journal records inserted per transaction by the flusher
+JOURNAL_BATCH_SIZE = 500
+
+
+def add_to_stock_rollups(stock_audits):
+    totals = defaultdict(lambda: [0.0, 0.0, 0])
+    for audit in stock_audits:
+        key = (audit.location_id, audit.reason, timezone.localdate(audit.created_at), audit.ingredient_id)
+        totals[key][0] += audit.units_change
+        totals[key][1] += audit.cost
+        totals[key][2] += 1
+    bulk_upsert_add(
+        DailyStockRollup,
+        ['location', 'reason', 'day', 'ingredient'],
+        ['units_change', 'cost', 'entries'],
+        # sorted, so concurrent upserts lock the rollup rows in the same order
+        [key + tuple(values) for key, values in sorted(totals.items())]
+    )
+
+
+def add_to_sales_rollups(sales_audits):
+    totals = defaultdict(lambda: [0.0, 0])
+    for audit in sales_audits:
+        key = (audit.location_id, timezone.localdate(audit.created_at), audit.menu_id)
+        totals[key][0] += audit.sale_amount
+        totals[key][1] += 1
+    bulk_upsert_add(
+        DailySalesRollup,
+        ['location', 'day', 'menu'],
+        ['sale_amount', 'sales'],
+        # sorted, so concurrent upserts lock the rollup rows in the same order
+        [key + tuple(values) for key, values in sorted(totals.items())]
+    )
+
+
+def insert_stock_audits(stock_audits):
+    '''
+    Insert the stock audits and add them to the daily rollups.
+    Backdated audits invalidate the cached reports they land in and the stock snapshots after them.
+    '''
+    with transaction.atomic(savepoint=False):
+        StockAudit.objects.bulk_create(stock_audits)
+        add_to_stock_rollups(stock_audits)
+        report_cache.invalidate_audits(stock_audits)
+        snapshots.discard_snapshots(stock_audits)
+
+
+def insert_sales_audits(sales_audits):
+    '''
+    Insert the sales audits and add them to the daily rollups.
+    Backdated audits invalidate the cached reports they land in.
+    '''
+    with transaction.atomic(savepoint=False):
+        SalesAudit.objects.bulk_create(sales_audits)
+        add_to_sales_rollups(sales_audits)
+        report_cache.invalidate_audits(sales_audits)
+
+
+# The journal records name their model, and how its audits are inserted
+JOURNALED_AUDITS = {
+    'stock': (StockAudit, insert_stock_audits),
+    'sales': (SalesAudit, insert_sales_audits),
+}
+
+
+def _journal_value(value):
+    # isoformat keeps the microseconds, unlike DjangoJSONEncoder
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def journal_record(kind, audit):
+    model, _ = JOURNALED_AUDITS[kind]
+    return {
+        'kind': kind,
+        'fields': {
+            field.attname: _journal_value(getattr(audit, field.attname))
+            for field in model._meta.concrete_fields if not field.primary_key
+        },
+    }
+
+
+def journaled_audit(record):
+    model, _ = JOURNALED_AUDITS[record['kind']]
+    return model(**{name: model._meta.get_field(name).to_python(value) for name, value in record['fields'].items()})
+
+
+def journal_audits(kind, audits):
+    '''
+    Append the audits to the journal once the current transaction commits, so the audits of a rolled back
+    stock movement are never journaled. An audit can be lost if the process dies between the commit
+    and the journal fsync, a much shorter window than the flush interval.
+    '''
+    for audit in audits:
+        audit.journal_id = uuid.uuid4().hex
+    records = [journal_record(kind, audit) for audit in audits]
+    transaction.on_commit(lambda: journal.append(records))
+
+
+def save_stock_audits(stock_audits):
+    '''
+    Record the stock audits. All stock movements go through here.
+    With settings.AUDIT_WRITE_BEHIND they are journaled and inserted later by flush_journal.
+    '''
+    if settings.AUDIT_WRITE_BEHIND:
+        journal_audits('stock', stock_audits)
+    else:
+        insert_stock_audits(stock_audits)
+
+
+def save_sales_audits(sales_audits):
+    '''
+    Record the sales audits. All sales go through here.
+    '''
+    if settings.AUDIT_WRITE_BEHIND:
+        journal_audits('sales', sales_audits)
+    else:
+        insert_sales_audits(sales_audits)
+
+
+def insert_journaled_audits(records):
+    '''
+    Insert the audits of a batch of journal records, and their rollups, in one transaction.
+    The audits already in the database, inserted by a flush that crashed before deleting its segment,
+    are skipped so a batch can be retried safely. Returns the number of audits inserted.
+    '''
+    inserted = 0
+    with transaction.atomic():
+        for kind, (model, insert) in JOURNALED_AUDITS.items():
+            audits = [journaled_audit(record) for record in records if record['kind'] == kind]
+            existing = set(model.objects.filter(
+                journal_id__in=[audit.journal_id for audit in audits]
+            ).values_list('journal_id', flat=True)) if audits else set()
+            new_audits = [audit for audit in audits if audit.journal_id not in existing]
+            if new_audits:
+                insert(new_audits)
+            inserted += len(new_audits)
+    return inserted
+
+
+def flush_journal(batch_size=JOURNAL_BATCH_SIZE):
+    '''
+    Insert the audits waiting in the journal in batches of batch_size. Returns the number of audits inserted.
+    Raises BlockingIOError if another flush is running.
+    '''
+    inserted = 0
+    with journal.flusher_lock():
+        for segment in journal.rotate():
+            records, bad_lines = journal.read(segment)
+            for offset in range(0, len(records), batch_size):
+                inserted += insert_journaled_audits(records[offset:offset + batch_size])
+            if bad_lines:
+                journal.reject(bad_lines)
+            os.remove(segment)
+    return inserted
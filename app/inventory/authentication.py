@@ -0,0 +1,195 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from inventory.models import RevokedStaffToken, Staff
+
+TOKEN_SALT = 'inventory.staff-token'
+
+
+class StaffPrincipal:
+    '''
+    The staff member a signed token was issued to, with the role and locations it carries.
+    Set as request.user by StaffTokenAuthentication.
+    '''
+    is_authenticated = True
+
+    def __init__(self, staff_id, role, location_ids, token_id):
+        self.staff_id = staff_id
+        self.role = role
+        self.location_ids = frozenset(location_ids)
+        self.token_id = token_id
+
+    def __str__(self):
+        return f"staff {self.staff_id} ({self.role})"
+
+
+def sign_staff_token(staff):
+    '''
+    Sign a token carrying the staff id, role and permitted location ids. It expires after settings.STAFF_TOKEN_MAX_AGE seconds.
+    '''
+    payload = {
+        'staff_id': staff.staff_id,
+        'role': staff.role,
+        'location_ids': list(staff.location.values_list('location_id', flat=True)),
+        'token_id': uuid.uuid4().hex,
+    }
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def read_staff_token(token):
+    '''
+    Verify the signature and expiry of a token and return its StaffPrincipal. Raises signing.BadSignature
+    (or its subclass SignatureExpired) for a wrong or expired token.
+    '''
+    payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.STAFF_TOKEN_MAX_AGE)
+    return StaffPrincipal(payload['staff_id'], payload['role'], payload['location_ids'], payload['token_id'])
+
+
+class _RevocationList:
+    '''
+    In-process copy of the revoked token ids, reloaded from the database at most every
+    settings.STAFF_TOKEN_REVOCATION_REFRESH seconds so that checking a token costs no query.
+    '''
+
+    def __init__(self):
+        self.token_ids = frozenset()
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def __contains__(self, token_id):
+        now = time.monotonic()
+        if self.loaded_at is None or now - self.loaded_at > settings.STAFF_TOKEN_REVOCATION_REFRESH:
+            with self.lock:
+                self.token_ids = frozenset(
+                    RevokedStaffToken.objects.filter(expires_at__gt=timezone.now()).values_list('token_id', flat=True)
+                )
+                self.loaded_at = now
+        return token_id in self.token_ids
+
+    def add(self, token_id):
+        with self.lock:
+            self.token_ids = self.token_ids | {token_id}
+
+    def clear(self):
+        self.loaded_at = None
+
+
+revoked_tokens = _RevocationList()
+
+
+def revoke_staff_token(token):
+    '''
+    Revoke a token until it would have expired. Other processes see it on their next revocation list reload.
+    '''
+    principal = read_staff_token(token)
+    expires_at = timezone.now() + timedelta(seconds=settings.STAFF_TOKEN_MAX_AGE)
+    RevokedStaffToken.objects.update_or_create(token_id=principal.token_id, defaults={'expires_at': expires_at})
+    revoked_tokens.add(principal.token_id)
+    return principal
+
+
+class StaffTokenAuthentication(authentication.BaseAuthentication):
+    '''
+    Authenticate requests sending "Authorization: Bearer <staff token>" without any database access.
+    Requests without a bearer token are left unauthenticated, the views then fall back to the staff_id in the body.
+    '''
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header')
+
+        try:
+            principal = read_staff_token(auth[1].decode())
+        except (signing.BadSignature, UnicodeError):
+            raise exceptions.AuthenticationFailed('Invalid or expired token')
+        if principal.token_id in revoked_tokens:
+            raise exceptions.AuthenticationFailed('Revoked token')
+        return principal, auth[1]
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def authorize_staff(request_data, user, roles=None):
+    '''
+    Return the staff_id and location_id a request acts as, and an error message if it is not allowed.
+    A request authenticated with a staff token (user is a StaffPrincipal) is checked against the role and
+    locations carried by the token, without any query. Otherwise the staff_id in the body is looked up.
+    '''
+    wrong_staff = 'Missing/wrong staff_id or staff with wrong role' if roles else 'Missing/wrong staff_id'
+    wrong_location = 'Missing location or staff does not work in location'
+    try:
+        location_id = int(request_data.get('location_id', -1))
+    except (TypeError, ValueError):
+        return None, None, wrong_location
+
+    if isinstance(user, StaffPrincipal):
+        staff_id, role, location_ids = user.staff_id, user.role, user.location_ids
+    else:
+        staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).values('staff_id', 'role').first()
+        staff_id, role = (staff['staff_id'], staff['role']) if staff else (None, None)
+        location_ids = None
+
+    if not staff_id or (roles and role not in roles):
+        return None, None, wrong_staff
+
+    # staff can only make this action within a location that they work in
+    if location_ids is None:
+        works_in_location = Staff.location.through.objects.filter(staff_id=staff_id, location_id=location_id).exists()
+    else:
+        works_in_location = location_id in location_ids
+    if not works_in_location:
+        return None, None, wrong_location
+
+    return staff_id, location_id, None
+
+
+def staff_role(staff_id, user):
+    '''
+    The role of the staff member a request acts as, carried by its staff token or looked up.
+    '''
+    if isinstance(user, StaffPrincipal):
+        return user.role
+    return Staff.objects.filter(staff_id=staff_id).values_list('role', flat=True).first()
+
+
+def authorize_staff_locations(request_data, user, roles=None):
+    '''
+    Return the staff_id and the location_ids a chain-wide request covers, and an error message if it is not allowed.
+    The request covers the location_ids listed in the body, which the staff member must all work in,
+    or all the locations they work in when the body lists none.
+    '''
+    wrong_staff = 'Missing/wrong staff_id or staff with wrong role' if roles else 'Missing/wrong staff_id'
+    wrong_locations = 'Wrong location_ids or staff does not work in all of them'
+
+    if isinstance(user, StaffPrincipal):
+        staff_id, role, location_ids = user.staff_id, user.role, user.location_ids
+    else:
+        staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).values('staff_id', 'role').first()
+        staff_id, role = (staff['staff_id'], staff['role']) if staff else (None, None)
+        location_ids = None
+
+    if not staff_id or (roles and role not in roles):
+        return None, None, wrong_staff
+    if location_ids is None:
+        location_ids = frozenset(Staff.location.through.objects.filter(staff_id=staff_id).values_list('location_id', flat=True))
+
+    requested = request_data.get('location_ids')
+    if requested is None:
+        return staff_id, sorted(location_ids), None
+    if not isinstance(requested, list) or not requested or any(type(location_id) is not int for location_id in requested):
+        return None, None, wrong_locations
+    if not set(requested) <= location_ids:
+        return None, None, wrong_locations
+    return staff_id, sorted(set(requested)), None
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from inventory.models import IngredientStock, Menu, RecipeIngredient
+
+# The recipes of the menu items of a location as a sparse recipe x ingredient quantity matrix, in compressed rows:
+# the lines of recipe filled_rows[k] are line_columns / line_quantities[row_starts[k]:row_starts[k + 1]], where a column
+# is a position in ingredient_ids. menu_rows[m] is the row of the recipe of menu_ids[m].
+# A dense matrix would be mostly zeros, a recipe uses a handful of the ingredients of the location.
+MenuMatrix = namedtuple('MenuMatrix', [
+    'menu_ids', 'menu_rows', 'recipes', 'ingredient_ids', 'filled_rows', 'row_starts', 'line_columns', 'line_quantities'
+])
+
+# Absorbs the float error of stock / quantity, i.e. 0.3 / 0.1 is 2.9999999999999996 portions
+PORTION_EPSILON = 1e-9
+
+_matrices = {}
+_lock = threading.Lock()
+
+
+def compile_menu_matrix(location_id):
+    menus = list(Menu.objects.filter(location_id=location_id).order_by('menu_id').values_list('menu_id', 'recipe_id'))
+    recipe_ids = sorted({recipe_id for _, recipe_id in menus})
+    recipe_rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+
+    # a recipe listing an ingredient twice needs both quantities
+    quantities = defaultdict(float)
+    for recipe_id, ingredient_id, quantity in RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'ingredient_id', 'quantity'
+    ):
+        quantities[(recipe_rows[recipe_id], ingredient_id)] += quantity
+    lines = sorted((row, ingredient_id, quantity) for (row, ingredient_id), quantity in quantities.items() if quantity > 0)
+
+    ingredient_ids = np.array(sorted({ingredient_id for _, ingredient_id, _ in lines}), dtype=np.int64)
+    line_rows = np.array([row for row, _, _ in lines], dtype=np.int64)
+    filled_rows, row_starts = np.unique(line_rows, return_index=True)
+    return MenuMatrix(
+        menu_ids=np.array([menu_id for menu_id, _ in menus], dtype=np.int64),
+        menu_rows=np.array([recipe_rows[recipe_id] for _, recipe_id in menus], dtype=np.int64),
+        recipes=len(recipe_ids),
+        ingredient_ids=ingredient_ids,
+        filled_rows=filled_rows,
+        row_starts=row_starts,
+        line_columns=np.searchsorted(ingredient_ids, np.array([ingredient_id for _, ingredient_id, _ in lines], dtype=np.int64)),
+        line_quantities=np.array([quantity for _, _, quantity in lines], dtype=np.float64),
+    )
+
+
+def get_menu_matrix(location_id):
+    '''
+    Return the MenuMatrix of a location from the per-process cache, compiling it on a miss.
+    '''
+    now = time.monotonic()
+    cached = _matrices.get(location_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    matrix = compile_menu_matrix(location_id)
+    with _lock:
+        _matrices[location_id] = (matrix, now + settings.SALE_PLAN_CACHE_TTL)
+    return matrix
+
+
+def invalidate():
+    with _lock:
+        _matrices.clear()
+
+
+def stock_vector(location_id, ingredient_ids):
+    '''
+    The units available at the location of each of ingredient_ids (sorted), 0 for those without a stock record.
+    '''
+    stock = np.zeros(len(ingredient_ids))
+    rows = list(IngredientStock.objects.filter(location_id=location_id).values_list('ingredient_id', 'units_available'))
+    if rows and len(ingredient_ids):
+        stock_ingredients, units = (np.array(column) for column in zip(*rows))
+        positions = np.searchsorted(ingredient_ids, stock_ingredients).clip(max=len(ingredient_ids) - 1)
+        used = ingredient_ids[positions] == stock_ingredients
+        stock[positions[used]] = units[used]
+    return stock
+
+
+def portions(matrix, stock):
+    '''
+    The portions of every recipe of the matrix the stock can make, min(stock / quantity) over its ingredients,
+    as floats: inf for a recipe without ingredients.
+    '''
+    recipe_portions = np.full(matrix.recipes, np.inf)
+    if len(matrix.line_quantities):
+        ratios = stock[matrix.line_columns] / matrix.line_quantities
+        recipe_portions[matrix.filled_rows] = np.minimum.reduceat(ratios, matrix.row_starts)
+    return np.floor(recipe_portions + PORTION_EPSILON).clip(min=0)
+
+
+def menu_availability(location_id):
+    '''
+    The portions of each menu item of the location that can be made with its current stock, as a list of
+    (menu_id, portions), None portions for a menu item without ingredients.
+    One stock query, the recipes matrix is cached.
+    '''
+    matrix = get_menu_matrix(location_id)
+    recipe_portions = portions(matrix, stock_vector(location_id, matrix.ingredient_ids))
+    return [
+        (menu_id, None if np.isinf(menu_portions) else int(menu_portions))
+        for menu_id, menu_portions in zip(matrix.menu_ids.tolist(), recipe_portions[matrix.menu_rows].tolist())
+    ]
@@ -0,0 +1,52 @@
+from django.db import connection
+
+# Keeps the number of bound parameters per statement well below SQLite's limit
+UPSERT_BATCH_SIZE = 250
+
+
+def bulk_upsert_add(model, conflict_fields, add_fields, rows, batch_size=UPSERT_BATCH_SIZE):
+    '''
+    Insert rows or, when a row with the same conflict_fields already exists,
+    add the incoming add_fields values to the stored ones.
+    Each row is a tuple with the values of conflict_fields followed by add_fields.
+    Relies on INSERT ... ON CONFLICT which both PostgreSQL and SQLite (3.24+) support,
+    so a whole set of increments is applied in one statement per batch without
+    reading the rows into Python first.
+    '''
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    conflict_columns = [qn(model._meta.get_field(name).column) for name in conflict_fields]
+    add_columns = [qn(model._meta.get_field(name).column) for name in add_fields]
+    columns = conflict_columns + add_columns
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    updates = ', '.join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in add_columns)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([placeholders] * len(batch))} "
+                f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {updates}"
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+
+
+def estimated_count(model):
+    '''
+    The number of rows of a model's table (all its partitions) as last estimated by the PostgreSQL planner
+    statistics, without scanning it. None on other databases, or before the table was ever analyzed.
+    '''
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT SUM(reltuples) FROM pg_partition_tree(%s::regclass) AS tree "
+            "JOIN pg_class ON pg_class.oid = tree.relid WHERE tree.isleaf AND reltuples >= 0",
+            [model._meta.db_table]
+        )
+        estimate = cursor.fetchone()[0]
+    return None if estimate is None else int(estimate)
@@ -0,0 +1,107 @@
+'''
+Reorder suggestions from the consumption (sales and waste) of every ingredient at a location.
+
+The consumption is read from the daily stock rollups, so a year of audits is one row per ingredient and day,
+and turned into an ingredient x day matrix to compute the rolling window rates of all ingredients at once.
+'''
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from inventory.models import DailyStockRollup, Ingredient, IngredientStock, Location, StockAudit
+
+# Rolling windows (days) of the consumption rates, the forecast uses the highest rate of the FORECAST_WINDOWS
+# so a recent surge is followed straight away while a quiet week does not hide the usual consumption.
+RATE_WINDOWS = (7, 28, 91)
+FORECAST_WINDOWS = (7, 28)
+
+ReorderLine = namedtuple('ReorderLine', [
+    'location_id', 'ingredient_id', 'units_available', 'daily_rates', 'daily_rate', 'days_until_stockout',
+    'suggested_units', 'suggested_cost'
+])
+
+
+def consumption_matrix(location_id, first_day, days):
+    '''
+    The units of each ingredient consumed (sold or wasted) at the location on each of the days from first_day,
+    as the sorted ingredient_ids and an ingredient x day matrix.
+    '''
+    rows = list(DailyStockRollup.objects.filter(
+        location_id=location_id,
+        reason__in=[StockAudit.StockAuditReason.SALE, StockAudit.StockAuditReason.WASTE],
+        day__gte=first_day,
+        day__lt=first_day + timedelta(days=days),
+    ).values_list('ingredient_id', 'day', 'units_change'))
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, days))
+
+    row_ingredients, row_days, units_change = zip(*rows)
+    ingredient_ids, ingredient_rows = np.unique(np.array(row_ingredients, dtype=np.int64), return_inverse=True)
+    day_columns = (np.array(row_days, dtype='datetime64[D]') - np.datetime64(first_day, 'D')).astype(np.int64)
+    matrix = np.zeros((len(ingredient_ids), days))
+    # sales and waste of the same day are two rollups, their changes are negative
+    np.add.at(matrix, (ingredient_rows, day_columns), -np.array(units_change, dtype=np.float64))
+    return ingredient_ids, matrix
+
+
+def daily_rates(matrix, windows=RATE_WINDOWS):
+    '''
+    The average daily consumption of every row of the matrix over the last days of each window, as a row x window matrix.
+    '''
+    # totals[:, d] is the consumption of the last d days
+    totals = np.cumsum(matrix[:, ::-1], axis=1)
+    return np.column_stack([totals[:, window - 1] / window for window in windows]) if len(matrix) else np.zeros((0, len(windows)))
+
+
+def reorder_lines(location_id, today=None):
+    '''
+    The forecast of every ingredient consumed at the location in the last max(RATE_WINDOWS) whole days:
+    its daily consumption rate, the days until its current stock runs out and the units to order so the stock
+    covers the delivery lead time plus REORDER_COVER_DAYS (0 units when it already does).
+    '''
+    today = today or timezone.localdate()
+    history_days = max(RATE_WINDOWS)
+    # whole days only, today is still going
+    ingredient_ids, matrix = consumption_matrix(location_id, today - timedelta(days=history_days), history_days)
+    if not len(ingredient_ids):
+        return []
+
+    stock = dict(IngredientStock.objects.filter(location_id=location_id, ingredient_id__in=ingredient_ids.tolist()).values_list(
+        'ingredient_id', 'units_available'
+    ))
+    costs = dict(Ingredient.objects.filter(ingredient_id__in=ingredient_ids.tolist()).values_list('ingredient_id', 'cost'))
+    units_available = np.array([stock.get(ingredient_id, 0.0) for ingredient_id in ingredient_ids.tolist()])
+    unit_costs = np.array([costs[ingredient_id] for ingredient_id in ingredient_ids.tolist()])
+
+    rates = daily_rates(matrix)
+    forecast_rate = rates[:, [RATE_WINDOWS.index(window) for window in FORECAST_WINDOWS]].max(axis=1)
+    with np.errstate(divide='ignore'):
+        days_until_stockout = np.where(forecast_rate > 0, units_available / forecast_rate, np.inf)
+    horizon = settings.REORDER_LEAD_DAYS + settings.REORDER_COVER_DAYS
+    suggested_units = np.where(
+        days_until_stockout < horizon, np.ceil(np.maximum(forecast_rate * horizon - units_available, 0)), 0
+    )
+
+    return [
+        ReorderLine(location_id, *line)
+        for line in zip(
+            ingredient_ids.tolist(), units_available.tolist(), rates.tolist(), forecast_rate.tolist(), days_until_stockout.tolist(),
+            suggested_units.tolist(), (suggested_units * unit_costs).tolist()
+        )
+    ]
+
+
+def reorder_suggestions(location_ids=None, today=None):
+    '''
+    The lines to order of every location (or of location_ids), soonest stockout first within a location.
+    '''
+    if location_ids is None:
+        location_ids = Location.objects.order_by('location_id').values_list('location_id', flat=True)
+    suggestions = []
+    for location_id in location_ids:
+        lines = [line for line in reorder_lines(location_id, today) if line.suggested_units > 0]
+        suggestions.extend(sorted(lines, key=lambda line: line.days_until_stockout))
+    return suggestions
@@ -0,0 +1,91 @@
+'''
+Idempotency-Key support for the endpoints that change the stock.
+
+A client sends a key of its choosing with a request, and the same key with the retries of that request when the
+response got lost. The first request runs the view and stores its response in an IdempotencyRecord, in the same
+transaction as the stock change, so either both are committed or neither. The retries get the stored response
+back without running the view again, a single lookup. A retry arriving while the first request is still running
+waits on the record row and then gets its response. Keys are per staff member and expire after
+settings.IDEMPOTENCY_KEY_TTL seconds.
+'''
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from inventory.authentication import StaffPrincipal
+from inventory.models import IdempotencyRecord, Staff
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _staff_id(request):
+    # the staff member the request acts as, checked by the view itself: the body staff_id is read the way
+    # authorize_staff looks it up, i.e. "12" is staff 12
+    if isinstance(request.user, StaffPrincipal):
+        return request.user.staff_id
+    try:
+        return Staff._meta.pk.get_prep_value(request.data.get('staff_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _replay(record, fingerprint):
+    if record.request_hash != fingerprint:
+        return Response(
+            f"{HEADER} already used for a different request", status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(json.loads(record.response_body), status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view):
+    '''
+    Decorate a DRF function view (under @api_view) so requests with an Idempotency-Key header run at most once.
+    '''
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(f"{HEADER} longer than {MAX_KEY_LENGTH} characters", status=status.HTTP_400_BAD_REQUEST)
+        staff_id = _staff_id(request)
+        if staff_id is None:
+            # without a staff member the key cannot be scoped, running the request could apply it twice
+            return Response('Missing/wrong staff_id', status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_hash(request)
+        expired_before = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        record = IdempotencyRecord.objects.filter(staff_id=staff_id, key=key, created_at__gte=expired_before).first()
+        if record and record.status_code is not None:
+            return _replay(record, fingerprint)
+
+        with transaction.atomic():
+            # expired records are evicted as new keys come, the index on created_at keeps it a seek
+            IdempotencyRecord.objects.filter(created_at__lt=expired_before).delete()
+            # a concurrent request with the same key blocks here until the first one commits
+            record, created = IdempotencyRecord.objects.get_or_create(
+                staff_id=staff_id, key=key, defaults={'request_hash': fingerprint}
+            )
+            if created:
+                response = view(request, *args, **kwargs)
+                record.status_code = response.status_code
+                record.response_body = json.dumps(response.data)
+                record.save(update_fields=['status_code', 'response_body'])
+                return response
+        return _replay(record, fingerprint)
+
+    return wrapper
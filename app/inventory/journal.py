@@ -0,0 +1,101 @@
+'''
+Durable local append-only journal of audit records, for the write-behind mode of inventory.audit.
+
+Requests append their records to settings.AUDIT_JOURNAL_PATH holding a shared lock. The flusher takes
+the lock exclusively to move the journal aside as a numbered segment, so it never reads a file that is
+still being appended to, inserts the records of the segment and then deletes it. A segment left behind
+by a flusher that crashed is flushed again by the next one.
+'''
+import fcntl
+import glob
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+SEGMENT_SUFFIX = '.segment'
+
+
+@contextmanager
+def _locked(path, operation):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
+def append(records):
+    '''
+    Append records (JSON serializable dicts) to the journal and fsync them before returning.
+    All the records go in a single O_APPEND write, so concurrent appends do not interleave.
+    '''
+    data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode()
+    with _locked(settings.AUDIT_JOURNAL_PATH + '.lock', fcntl.LOCK_SH):
+        fd = os.open(settings.AUDIT_JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            written = os.write(fd, data)
+            if written != len(data):
+                raise OSError(f"Short write to the audit journal ({written} of {len(data)} bytes)")
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def segments():
+    '''
+    The journal segments waiting to be flushed, oldest first.
+    '''
+    paths = glob.glob(glob.escape(settings.AUDIT_JOURNAL_PATH) + '.*' + SEGMENT_SUFFIX)
+    return sorted(paths, key=lambda path: int(path[:-len(SEGMENT_SUFFIX)].rsplit('.', 1)[1]))
+
+
+def rotate():
+    '''
+    Move the records appended so far to a new segment. Returns all the segments waiting to be flushed.
+    '''
+    path = settings.AUDIT_JOURNAL_PATH
+    with _locked(path + '.lock', fcntl.LOCK_EX):
+        if os.path.exists(path) and os.path.getsize(path):
+            os.replace(path, f"{path}.{time.time_ns()}{SEGMENT_SUFFIX}")
+    return segments()
+
+
+def read(path):
+    '''
+    The records of a journal file and its lines that cannot be decoded, i.e. a record torn by a crash while appending.
+    '''
+    records = []
+    bad_lines = []
+    if not os.path.exists(path):
+        return records, bad_lines
+    with open(path, encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                bad_lines.append(line)
+    return records, bad_lines
+
+
+def reject(bad_lines):
+    '''
+    Keep the lines that cannot be flushed in a .rejected file next to the journal, to be inspected by hand.
+    '''
+    with open(settings.AUDIT_JOURNAL_PATH + '.rejected', 'a', encoding='utf-8') as rejected:
+        rejected.writelines(line if line.endswith('\n') else line + '\n' for line in bad_lines)
+        rejected.flush()
+        os.fsync(rejected.fileno())
+
+
+@contextmanager
+def flusher_lock():
+    '''
+    Held by the flusher, so only one flushes at a time. Raises BlockingIOError when another flusher holds it.
+    '''
+    with _locked(settings.AUDIT_JOURNAL_PATH + '.flush.lock', fcntl.LOCK_EX | fcntl.LOCK_NB):
+        yield
@@ -0,0 +1,81 @@
+'''
+Keyset (cursor) pagination over the audit tables, for integrations reading the stock and sales movements.
+
+A page is the movements after a cursor in (created_at, audit id) order, read with a seek on the
+(location, created_at) indexes whatever the position in the ledger, where an OFFSET would scan and throw
+away all the rows before it. The next cursor is the key of the last movement of the page, so a consumer
+tails the new movements by asking again with it. Movements younger than SETTLE_SECONDS are left for the
+next page: their created_at is set before they commit, an older one could still appear behind the cursor.
+Audits backdated by more than that (i.e. a late write-behind flush) land behind the cursors already handed out.
+'''
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.models import SalesAudit, StockAudit
+from inventory.snapshots import SETTLE_SECONDS
+
+CURSOR_SALT = 'inventory.ledger-cursor'
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# An audit model, the request fields it can be filtered on, and the fields of its movements
+Ledger = namedtuple('Ledger', ['model', 'filters', 'fields'])
+
+LEDGERS = {
+    'stock': Ledger(
+        StockAudit, ['reason', 'ingredient_id'],
+        ['stock_audit_id', 'reason', 'ingredient_id', 'units_change', 'cost', 'staff_id', 'created_at']
+    ),
+    'sales': Ledger(SalesAudit, ['menu_id'], ['sales_audit_id', 'menu_id', 'sale_amount', 'staff_id', 'created_at']),
+}
+
+Page = namedtuple('Page', ['movements', 'next_cursor', 'has_more'])
+
+
+class WrongCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, audit_id):
+    return signing.dumps([created_at.isoformat(), audit_id], salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    '''
+    The (created_at, audit id) a cursor points after. Raises WrongCursor for a cursor not issued by encode_cursor.
+    '''
+    try:
+        created_at, audit_id = signing.loads(cursor, salt=CURSOR_SALT)
+        return parse_datetime(created_at), int(audit_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise WrongCursor(cursor)
+
+
+def ledger_page(kind, location_id, filters=None, cursor=None, since=None, limit=PAGE_SIZE):
+    '''
+    The Page of the movements of the location after cursor (or from since, or from the first one), oldest first,
+    with at most limit movements. filters maps the filter fields of the ledger to the values to match.
+    One query, an index seek.
+    '''
+    ledger = LEDGERS[kind]
+    pk = ledger.model._meta.pk.attname
+    movements = ledger.model.objects.filter(
+        location_id=location_id, created_at__lt=timezone.now() - timedelta(seconds=SETTLE_SECONDS), **(filters or {})
+    )
+    if cursor:
+        created_at, audit_id = decode_cursor(cursor)
+        # created_at__gte bounds the index range, the Q only drops the movements of the same instant
+        movements = movements.filter(Q(created_at__gt=created_at) | Q(**{pk + '__gt': audit_id}), created_at__gte=created_at)
+    elif since:
+        movements = movements.filter(created_at__gte=since)
+
+    rows = list(movements.order_by('created_at', pk).values(*ledger.fields)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1][pk]) if rows else cursor
+    return Page(rows, next_cursor, has_more)
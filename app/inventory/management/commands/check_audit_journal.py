@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from inventory import journal
+from inventory.audit import JOURNALED_AUDITS, journaled_audit
+
+
+class Command(BaseCommand):
+    help = '''Compare the audits waiting in the journal with the database: how many are already inserted
+    (a flush interrupted before deleting its segment), how many are pending, and whether any differs from
+    the audit inserted with the same journal_id.'''
+
+    def handle(self, *args, **options):
+        inserted = pending = 0
+        mismatches = []
+        bad_lines = 0
+        for path in journal.segments() + [settings.AUDIT_JOURNAL_PATH]:
+            records, file_bad_lines = journal.read(path)
+            bad_lines += len(file_bad_lines)
+            for kind, (model, _) in JOURNALED_AUDITS.items():
+                audits = {audit.journal_id: audit for audit in map(journaled_audit, records) if model is type(audit)}
+                fields = [field.attname for field in model._meta.concrete_fields if not field.primary_key]
+                stored = {
+                    row['journal_id']: row
+                    for journal_ids in _batches(list(audits))
+                    for row in model.objects.filter(journal_id__in=journal_ids).values(*fields)
+                }
+                for journal_id, audit in audits.items():
+                    if journal_id not in stored:
+                        pending += 1
+                        continue
+                    inserted += 1
+                    if any(getattr(audit, field) != stored[journal_id][field] for field in fields):
+                        mismatches.append(f"{kind} audit {journal_id} in {path}")
+
+        self.stdout.write(f"{inserted} journaled audits already inserted, {pending} pending, {bad_lines} unreadable lines")
+        if mismatches or bad_lines:
+            for mismatch in mismatches:
+                self.stderr.write(f"Differs from the database: {mismatch}")
+            raise CommandError(f"{len(mismatches)} journaled audits differ from the database, {bad_lines} unreadable lines")
+        self.stdout.write(self.style.SUCCESS('The journal is consistent with the database'))
+
+
+def _batches(journal_ids, size=500):
+    for offset in range(0, len(journal_ids), size):
+        yield journal_ids[offset:offset + size]
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.audit import flush_journal
+
+
+class Command(BaseCommand):
+    help = '''Insert the audits written to the journal in write-behind mode (AUDIT_WRITE_BEHIND).
+    Safe to run again after a crash, the audits already inserted are skipped.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running as the background flusher, flushing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                inserted = flush_journal()
+            except BlockingIOError:
+                raise CommandError('Another flusher is running')
+            self.stdout.write(f"Flushed {inserted} audits in {time.perf_counter() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
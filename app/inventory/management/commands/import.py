@@ -1,80 +1,127 @@
+import time
+
 from django.core.management.base import BaseCommand
 import openpyxl
 from inventory.models import Location, Staff, Ingredient, Recipe, RecipeIngredient, Modifier, ModifierOption, Menu
 from django.contrib.auth.models import User
 from django.db import transaction
 
+BATCH_SIZE = 500
+
+
+def as_id(value):
+    # numeric cells are read as floats (i.e. 21.0)
+    return int(value) if value is not None else None
+
 
 class Command(BaseCommand):
     help = 'Import data from file'
 
     def handle(self, *args, **options):
-        wb_obj = openpyxl.load_workbook('inventory/management/commands/Weird_Salads_Data_Export.xlsx')
-        sheet = wb_obj.active
-        for sheet in wb_obj.worksheets:
-            match sheet.title:
-                case 'locations':
-                    self.import_locations(sheet)
-                case 'staff':
-                    self.import_staff(sheet)
-                case 'ingredients':
-                    self.import_ingredients(sheet)
-                case 'recipes':
-                    self.import_recipes(sheet)
-                case 'modifiers':
-                    self.import_modifiers(sheet)
-                case 'menus':
-                    self.import_menus(sheet)
+        # read_only streams the rows instead of loading the whole workbook in memory
+        wb_obj = openpyxl.load_workbook('inventory/management/commands/Weird_Salads_Data_Export.xlsx', read_only=True)
+        importers = {
+            'locations': self.import_locations,
+            'staff': self.import_staff,
+            'ingredients': self.import_ingredients,
+            'recipes': self.import_recipes,
+            'modifiers': self.import_modifiers,
+            'menus': self.import_menus,
+        }
+        try:
+            for sheet in wb_obj.worksheets:
+                if sheet.title not in importers:
+                    continue
+                started = time.perf_counter()
+                with transaction.atomic():
+                    # This below code executes inside a transaction.
+                    count = importers[sheet.title](self.rows(sheet))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{sheet.title}: {count} rows in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/s)")
+        finally:
+            wb_obj.close()
 
         self.stdout.write(self.style.SUCCESS('IMPORT SUCCESS!!'))
 
-    def import_staff(self, sheet):
-        with transaction.atomic():
-            # This below code executes inside a transaction.
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                staff = Staff.objects.filter(staff_id=row[0]).first()
-                if not staff:
-                    user = User(username='_'.join(row[1].split()), is_active='False')
-                    user.save()
-                    staff = Staff(staff_id=row[0], name=row[1], dob=row[2], role=row[3], iban=row[4], bic=row[5], user=user)
-                    staff.save()
-                staff.location.add(Location.objects.filter(location_id=row[6]).first())
-                staff.save()
-
-    def import_locations(self, sheet):
-        with transaction.atomic():
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                location = Location(name=row[1], address=row[2])
-                location.save()
-
-    def import_ingredients(self, sheet):
-        with transaction.atomic():
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                ingredient = Ingredient(name=row[1], unit=row[2], cost=row[3])
-                ingredient.save()
-
-    def import_recipes(self, sheet):
-        with transaction.atomic():
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                recipe, created = Recipe.objects.get_or_create(name=row[1])
-                recipe_ingredient = RecipeIngredient(recipe=recipe, quantity=row[2], ingredient=Ingredient.objects.filter(ingredient_id=row[3]).first())
-                recipe_ingredient.save()
-
-    def import_modifiers(self, sheet):
-        with transaction.atomic():
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                modifier, created = Modifier.objects.get_or_create(name=row[1])
-                ingredient = Ingredient.objects.filter(name=row[2]).first()
-                modifier_option = ModifierOption(option=row[2], price=row[3], modifier=modifier, ingredient=ingredient)
-                modifier_option.save()
-
-    def import_menus(self, sheet):
-        with transaction.atomic():
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                menu = Menu(
-                    recipe=Recipe.objects.filter(recipe_id=row[0]).first(),
-                    location=Location.objects.filter(location_id=row[1]).first(),
-                    price=row[2],
-                    modifier=Modifier.objects.filter(modifier_id=row[3]).first() if row[3] else None
-                )
-                menu.save()
+    def rows(self, sheet):
+        '''
+        Data rows of a sheet, skipping the header and empty rows. Read-only sheets
+        drop trailing empty cells, so rows are padded with None to the header width.
+        '''
+        rows = sheet.iter_rows(values_only=True)
+        width = len(next(rows, ()))
+        for row in rows:
+            if row and row[0] is not None:
+                yield tuple(row) + (None,) * (width - len(row))
+
+    def import_staff(self, rows):
+        existing_staff_ids = set(Staff.objects.values_list('staff_id', flat=True))
+        new_staff = {}
+        staff_locations = []
+        for row in rows:
+            staff_id = as_id(row[0])
+            if staff_id not in existing_staff_ids and staff_id not in new_staff:
+                new_staff[staff_id] = row
+            staff_locations.append((staff_id, as_id(row[6])))
+
+        users = User.objects.bulk_create(
+            [User(username='_'.join(row[1].split()), is_active=False) for row in new_staff.values()],
+            batch_size=BATCH_SIZE
+        )
+        Staff.objects.bulk_create([
+            Staff(staff_id=staff_id, name=row[1], dob=row[2], role=row[3], iban=row[4], bic=row[5], user=user)
+            for (staff_id, row), user in zip(new_staff.items(), users)
+        ], batch_size=BATCH_SIZE)
+        Staff.location.through.objects.bulk_create([
+            Staff.location.through(staff_id=staff_id, location_id=location_id)
+            for staff_id, location_id in staff_locations
+        ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        return len(staff_locations)
+
+    def import_locations(self, rows):
+        locations = Location.objects.bulk_create(
+            [Location(name=row[1], address=row[2]) for row in rows],
+            batch_size=BATCH_SIZE
+        )
+        return len(locations)
+
+    def import_ingredients(self, rows):
+        ingredients = Ingredient.objects.bulk_create(
+            [Ingredient(name=row[1], unit=row[2], cost=row[3]) for row in rows],
+            batch_size=BATCH_SIZE
+        )
+        return len(ingredients)
+
+    def import_recipes(self, rows):
+        rows = list(rows)
+        recipe_ids = dict(Recipe.objects.values_list('name', 'recipe_id'))
+        new_names = list(dict.fromkeys(row[1] for row in rows if row[1] not in recipe_ids))
+        for recipe in Recipe.objects.bulk_create([Recipe(name=name) for name in new_names], batch_size=BATCH_SIZE):
+            recipe_ids[recipe.name] = recipe.recipe_id
+
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe_id=recipe_ids[row[1]], quantity=row[2], ingredient_id=as_id(row[3]))
+            for row in rows
+        ], batch_size=BATCH_SIZE)
+        return len(rows)
+
+    def import_modifiers(self, rows):
+        rows = list(rows)
+        modifier_ids = dict(Modifier.objects.values_list('name', 'modifier_id'))
+        new_names = list(dict.fromkeys(row[1] for row in rows if row[1] not in modifier_ids))
+        for modifier in Modifier.objects.bulk_create([Modifier(name=name) for name in new_names], batch_size=BATCH_SIZE):
+            modifier_ids[modifier.name] = modifier.modifier_id
+
+        ingredient_ids = dict(Ingredient.objects.values_list('name', 'ingredient_id'))
+        ModifierOption.objects.bulk_create([
+            ModifierOption(option=row[2], price=row[3], modifier_id=modifier_ids[row[1]], ingredient_id=ingredient_ids.get(row[2]))
+            for row in rows
+        ], batch_size=BATCH_SIZE)
+        return len(rows)
+
+    def import_menus(self, rows):
+        menus = Menu.objects.bulk_create([
+            Menu(recipe_id=as_id(row[0]), location_id=as_id(row[1]), price=row[2], modifier_id=as_id(row[3]) if row[3] else None)
+            for row in rows
+        ], batch_size=BATCH_SIZE)
+        return len(menus)
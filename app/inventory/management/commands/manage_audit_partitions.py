@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inventory import partitions, report_cache
+from inventory.models import StockAudit, StockSnapshot
+
+
+class Command(BaseCommand):
+    help = '''Create the monthly partitions of the audit tables for the coming months and, with a retention,
+    detach (or drop) the months older than it. PostgreSQL only. Run it daily or at least monthly (i.e. from cron).'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=settings.AUDIT_PARTITION_MONTHS_AHEAD, help='Months to create ahead of the current one')
+        parser.add_argument(
+            '--retention-months', type=int, default=settings.AUDIT_RETENTION_MONTHS,
+            help='Whole months of audits to keep before the current one, 0 keeps them all'
+        )
+        parser.add_argument('--drop', action='store_true', help='Drop the expired partitions instead of detaching them')
+
+    def handle(self, *args, **options):
+        if not all(partitions.is_partitioned(table) for table in partitions.PARTITIONED_TABLES):
+            self.stdout.write('The audit tables are not partitioned, they only are on PostgreSQL')
+            return
+
+        this_month = partitions.month_start(timezone.now())
+        created = partitions.create_partitions(this_month, partitions.add_months(this_month, options['ahead']))
+        self.stdout.write(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+
+        if options['retention_months'] > 0:
+            self.expire(partitions.add_months(this_month, -options['retention_months']), options['drop'])
+
+        for table, rows in partitions.default_partition_rows().items():
+            if rows:
+                self.stderr.write(
+                    f"{rows} audits in {table}{partitions.DEFAULT_SUFFIX}, outside the partitioned months: "
+                    "move them to new partitions by hand before creating their months"
+                )
+        self.stdout.write(self.style.SUCCESS('Audit partitions up to date'))
+
+    def expire(self, cutoff, drop):
+        expired = partitions.expired_partitions(cutoff)
+        if not expired:
+            return
+        # The stock and the inventory value after cutoff are rebuilt from a snapshot and the audits after it
+        unsnapshotted = set(
+            StockAudit.objects.filter(created_at__lt=cutoff).order_by().values_list('location_id', flat=True).distinct()
+        ) - set(StockSnapshot.objects.filter(taken_at__gte=cutoff).values_list('location_id', flat=True).distinct())
+        if unsnapshotted:
+            raise CommandError(
+                f"Locations {sorted(unsnapshotted)} have no stock snapshot since {cutoff:%Y-%m-%d}, "
+                "run take_stock_snapshots before expiring their audits"
+            )
+
+        with transaction.atomic():
+            for partition in expired:
+                partitions.detach_partition(partition, drop)
+            report_cache.invalidate_period(min(partition.month for partition in expired), cutoff)
+        self.stdout.write(
+            f"{'Dropped' if drop else 'Detached'} {len(expired)} partitions before {cutoff:%Y-%m-%d}: "
+            f"{', '.join(partition.name for partition in expired)}"
+        )
@@ -0,0 +1,68 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import StockAudit, SalesAudit, DailyStockRollup, DailySalesRollup
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = '''Backfill or rebuild the daily rollups of the stock and sales audits.
+    Run it for closed days, or while no stock movements are being recorded, since movements
+    written during the rebuild of their day could be counted twice.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD), defaults to the first audit')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD), defaults to today')
+
+    def parse_day(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Wrong day {value}, expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        start_day = self.parse_day(options['start']) if options['start'] else None
+        end_day = self.parse_day(options['end']) if options['end'] else timezone.localdate()
+
+        tz = timezone.get_current_timezone()
+        audit_filter = {'created_at__lt': timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz)}
+        rollup_filter = {'day__lte': end_day}
+        if start_day:
+            audit_filter['created_at__gte'] = timezone.make_aware(datetime.combine(start_day, time.min), tz)
+            rollup_filter['day__gte'] = start_day
+
+        with transaction.atomic():
+            DailyStockRollup.objects.filter(**rollup_filter).delete()
+            DailySalesRollup.objects.filter(**rollup_filter).delete()
+
+            stock_totals = StockAudit.objects.filter(**audit_filter).annotate(day=TruncDate('created_at')).order_by().values(
+                'location_id', 'ingredient_id', 'reason', 'day'
+            ).annotate(total_units_change=Sum('units_change'), total_cost=Sum('cost'), total_entries=Count('*'))
+            stock_rollups = DailyStockRollup.objects.bulk_create((
+                DailyStockRollup(
+                    day=row['day'], location_id=row['location_id'], ingredient_id=row['ingredient_id'], reason=row['reason'],
+                    units_change=row['total_units_change'], cost=row['total_cost'], entries=row['total_entries']
+                )
+                for row in stock_totals.iterator()
+            ), batch_size=BATCH_SIZE)
+
+            sales_totals = SalesAudit.objects.filter(**audit_filter).annotate(day=TruncDate('created_at')).order_by().values(
+                'location_id', 'menu_id', 'day'
+            ).annotate(total_sale_amount=Sum('sale_amount'), total_sales=Count('*'))
+            sales_rollups = DailySalesRollup.objects.bulk_create((
+                DailySalesRollup(
+                    day=row['day'], location_id=row['location_id'], menu_id=row['menu_id'],
+                    sale_amount=row['total_sale_amount'], sales=row['total_sales']
+                )
+                for row in sales_totals.iterator()
+            ), batch_size=BATCH_SIZE)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(stock_rollups)} stock and {len(sales_rollups)} sales daily rollups"
+        ))
@@ -0,0 +1,21 @@
+from django.core import signing
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.authentication import revoke_staff_token
+
+
+class Command(BaseCommand):
+    help = 'Revoke a staff token before it expires'
+
+    def add_arguments(self, parser):
+        parser.add_argument('token')
+
+    def handle(self, *args, **options):
+        try:
+            principal = revoke_staff_token(options['token'])
+        except signing.SignatureExpired:
+            raise CommandError('The token has already expired')
+        except signing.BadSignature:
+            raise CommandError('Invalid token')
+
+        self.stdout.write(self.style.SUCCESS(f"Revoked token {principal.token_id} of staff {principal.staff_id}"))
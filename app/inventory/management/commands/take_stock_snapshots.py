@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory.snapshots import take_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = '''Snapshot the stock of every location every STOCK_SNAPSHOT_INTERVAL seconds since its latest snapshot.
+    Run it periodically (i.e. from cron), a run catches up with all the snapshots missed since the previous one.'''
+
+    def handle(self, *args, **options):
+        taken = take_stock_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f"Took {taken} stock snapshots (every {settings.STOCK_SNAPSHOT_INTERVAL} seconds)"
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_alter_salesaudit_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStockRollup',
+            fields=[
+                ('daily_stock_rollup_id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('reason', models.CharField(choices=[('delivery', 'Delivery'), ('sale', 'Sale'), ('waste', 'Waste')], max_length=16)),
+                ('units_change', models.FloatField(default=0.0)),
+                ('cost', models.FloatField(default=0.0)),
+                ('entries', models.IntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.ingredient')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.location')),
+            ],
+            options={
+                'db_table': 'inventory_daily_stock_rollup',
+                'unique_together': {('location', 'reason', 'day', 'ingredient')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('daily_sales_rollup_id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('sale_amount', models.FloatField(default=0.0)),
+                ('sales', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.location')),
+                ('menu', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.menu')),
+            ],
+            options={
+                'db_table': 'inventory_daily_sales_rollup',
+                'unique_together': {('location', 'day', 'menu')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+# PostgreSQL only: the same indexes with the columns the reports read added as non-key columns,
+# so the reports are answered with index-only scans
+COVERING_INDEXES = [
+    ('stock_audit_loc_created_idx', 'inventory_stock_audit', 'location_id, created_at', 'stock_audit_id, reason, cost, ingredient_id, staff_id'),
+    ('stock_audit_loc_rsn_crt_idx', 'inventory_stock_audit', 'location_id, reason, created_at', 'cost'),
+    ('sale_audit_loc_created_idx', 'inventory_sale_audit', 'location_id, created_at', 'sale_amount'),
+]
+
+
+def add_covering_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, columns, included_columns in COVERING_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name}")
+        schema_editor.execute(f"CREATE INDEX {name} ON {table} ({columns}) INCLUDE ({included_columns})")
+
+
+def remove_covering_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, columns, _ in COVERING_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name}")
+        schema_editor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_dailystockrollup_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesaudit',
+            index=models.Index(fields=['location', 'created_at'], name='sale_audit_loc_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockaudit',
+            index=models.Index(fields=['location', 'created_at'], name='stock_audit_loc_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockaudit',
+            index=models.Index(fields=['location', 'reason', 'created_at'], name='stock_audit_loc_rsn_crt_idx'),
+        ),
+        migrations.RunPython(add_covering_columns, remove_covering_columns),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_audit_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedStaffToken',
+            fields=[
+                ('token_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'inventory_revoked_staff_token',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_revokedstafftoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('stock_snapshot_id', models.AutoField(primary_key=True, serialize=False)),
+                ('taken_at', models.DateTimeField()),
+                ('units_available', models.FloatField(default=0.0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.ingredient')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.location')),
+            ],
+            options={
+                'db_table': 'inventory_stock_snapshot',
+                'unique_together': {('location', 'taken_at', 'ingredient')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesaudit',
+            name='journal_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='stockaudit',
+            name='journal_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='salesaudit',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='stockaudit',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
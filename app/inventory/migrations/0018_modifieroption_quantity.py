@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_audit_journal_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modifieroption',
+            name='quantity',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
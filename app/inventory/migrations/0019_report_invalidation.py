@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_modifieroption_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportInvalidation',
+            fields=[
+                ('report_invalidation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_from', models.DateTimeField()),
+                ('created_to', models.DateTimeField()),
+                ('invalidated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.location')),
+            ],
+            options={
+                'db_table': 'inventory_report_invalidation',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from inventory.partitions import PARTITIONED_TABLES, rebuild_table
+
+
+# PostgreSQL only: the audit tables are rebuilt as tables partitioned by month, see inventory.partitions.
+# The rows are copied, on a large database run it in a maintenance window.
+
+def partition_audits(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in PARTITIONED_TABLES:
+        rebuild_table(schema_editor, table, partitioned=True)
+
+
+def unpartition_audits(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in PARTITIONED_TABLES:
+        rebuild_table(schema_editor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_report_invalidation'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_audits, unpartition_audits),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_partition_audits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockaudit',
+            index=models.Index(fields=['location', 'ingredient', 'created_at'], name='stock_audit_loc_ing_crt_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0021_stock_audit_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('idempotency_record_id', models.AutoField(primary_key=True, serialize=False)),
+                ('staff_id', models.IntegerField()),
+                ('key', models.CharField(max_length=255)),
+                ('request_hash', models.CharField(max_length=64)),
+                ('status_code', models.IntegerField(null=True)),
+                ('response_body', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'inventory_idempotency_record',
+                'unique_together': {('staff_id', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesaudit',
+            index=models.Index(fields=['created_at', 'sales_audit_id'], name='sale_audit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockaudit',
+            index=models.Index(fields=['created_at', 'stock_audit_id'], name='stock_audit_created_idx'),
+        ),
+    ]
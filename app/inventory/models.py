@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 alphanumeric = RegexValidator(r'^[0-9a-zA-Z]*$', 'Only alphanumeric characters are allowed.')
 
@@ -80,6 +81,8 @@ class ModifierOption(models.Model):
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, blank=True, null=True)
     option = models.CharField(max_length=50)
     price = models.FloatField()
+    # units of the ingredient the option adds to a portion
+    quantity = models.FloatField(default=1.0)
 
     def __str__(self):
         return self.option
@@ -133,13 +136,25 @@ class StockAudit(models.Model):
     units_change = models.FloatField(editable=False)
     # We need this calculation in real time beacuse the cost of an ingredient can vary over time
     cost = models.FloatField(editable=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the movement happens, not on insert: audits journaled in write-behind mode are inserted later
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Set on the audits written through the journal, so a retried flush can skip those already inserted
+    journal_id = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.reason} of {self.units_change} of {self.ingredient.name} at {self.location.name} by {self.staff.name} cost {self.cost} at {self.created_at}"
 
     class Meta:
         db_table = 'inventory_stock_audit'
+        # Audits are always read for a location and a created_at range, often for one reason or ingredient too.
+        # On PostgreSQL migration 0014 also makes them covering indexes for the report columns.
+        indexes = [
+            models.Index(fields=['location', 'created_at'], name='stock_audit_loc_created_idx'),
+            models.Index(fields=['location', 'reason', 'created_at'], name='stock_audit_loc_rsn_crt_idx'),
+            models.Index(fields=['location', 'ingredient', 'created_at'], name='stock_audit_loc_ing_crt_idx'),
+            # The latest audits of all locations, for the admin changelist and its date hierarchy
+            models.Index(fields=['created_at', 'stock_audit_id'], name='stock_audit_created_idx'),
+        ]
 
 
 class SalesAudit(models.Model):
@@ -149,10 +164,135 @@ class SalesAudit(models.Model):
     menu = models.ForeignKey(Menu, on_delete=models.PROTECT, editable=False)
     # We need this calculation in real time beacuse the cost of an ingredient can vary over time
     sale_amount = models.FloatField(editable=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    journal_id = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.staff.name} sold {self.sale_amount} at {self.location.name} at {self.created_at} "
 
     class Meta:
         db_table = 'inventory_sale_audit'
+        indexes = [
+            models.Index(fields=['location', 'created_at'], name='sale_audit_loc_created_idx'),
+            models.Index(fields=['created_at', 'sales_audit_id'], name='sale_audit_created_idx'),
+        ]
+
+
+class DailyStockRollup(models.Model):
+    '''
+    Stock audits added up per location, ingredient, reason and day (in settings.TIME_ZONE).
+    Kept up to date as audits are written, see inventory.audit, and rebuilt with the rebuild_rollups command.
+    '''
+    daily_stock_rollup_id = models.AutoField(primary_key=True)
+    day = models.DateField()
+    location = models.ForeignKey(Location, on_delete=models.PROTECT)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.PROTECT)
+    reason = models.CharField(max_length=16, choices=StockAudit.StockAuditReason.choices)
+    units_change = models.FloatField(default=0.0)
+    cost = models.FloatField(default=0.0)
+    entries = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.reason} of {self.units_change} of ingredient {self.ingredient_id} at location {self.location_id} on {self.day}"
+
+    class Meta:
+        db_table = 'inventory_daily_stock_rollup'
+        # Column order serves the reports: location, reason and a range of days
+        unique_together = ('location', 'reason', 'day', 'ingredient',)
+
+
+class DailySalesRollup(models.Model):
+    '''
+    Sales audits added up per location, menu item and day (in settings.TIME_ZONE).
+    '''
+    daily_sales_rollup_id = models.AutoField(primary_key=True)
+    day = models.DateField()
+    location = models.ForeignKey(Location, on_delete=models.PROTECT)
+    menu = models.ForeignKey(Menu, on_delete=models.PROTECT)
+    sale_amount = models.FloatField(default=0.0)
+    sales = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.sales} sales of menu {self.menu_id} at location {self.location_id} on {self.day}"
+
+    class Meta:
+        db_table = 'inventory_daily_sales_rollup'
+        unique_together = ('location', 'day', 'menu',)
+
+
+class RevokedStaffToken(models.Model):
+    '''
+    Staff tokens revoked before their expiry, see inventory.authentication.
+    Rows can be deleted once expires_at is past.
+    '''
+    token_id = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.token_id} revoked until {self.expires_at}"
+
+    class Meta:
+        db_table = 'inventory_revoked_staff_token'
+
+
+class StockSnapshot(models.Model):
+    '''
+    The units of an ingredient a location had at taken_at, rebuilt from the stock audits up to then.
+    Taken every settings.STOCK_SNAPSHOT_INTERVAL seconds by the take_stock_snapshots command, so the stock
+    at any time is a snapshot plus the audits after it, see inventory.snapshots.
+    '''
+    stock_snapshot_id = models.AutoField(primary_key=True)
+    taken_at = models.DateTimeField()
+    location = models.ForeignKey(Location, on_delete=models.PROTECT)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.PROTECT)
+    units_available = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f"{self.units_available} of ingredient {self.ingredient_id} at location {self.location_id} at {self.taken_at}"
+
+    class Meta:
+        db_table = 'inventory_stock_snapshot'
+        # Column order serves the lookup of the latest snapshot of a location before a time
+        unique_together = ('location', 'taken_at', 'ingredient',)
+
+
+class ReportInvalidation(models.Model):
+    '''
+    Audits of a location (of every location when location is null) created between created_from and created_to
+    that were written, changed or deleted at invalidated_at, after the reports covering that time could have
+    been cached. A cached report computed before invalidated_at over a window overlapping them is stale,
+    see inventory.report_cache. Rows can be deleted once older than settings.REPORT_CACHE_TIMEOUT.
+    '''
+    report_invalidation_id = models.AutoField(primary_key=True)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, blank=True, null=True)
+    created_from = models.DateTimeField()
+    created_to = models.DateTimeField()
+    invalidated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"audits of location {self.location_id} from {self.created_from} to {self.created_to} changed at {self.invalidated_at}"
+
+    class Meta:
+        db_table = 'inventory_report_invalidation'
+
+
+class IdempotencyRecord(models.Model):
+    '''
+    The response to the first request a staff member sent with an Idempotency-Key header, replayed to the retries
+    of that request, see inventory.idempotency. Rows expire settings.IDEMPOTENCY_KEY_TTL seconds after created_at.
+    '''
+    idempotency_record_id = models.AutoField(primary_key=True)
+    staff_id = models.IntegerField()
+    key = models.CharField(max_length=255)
+    # sha256 of the method, path and body of the request, a key sent again with another request is refused
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} of staff {self.staff_id}: {self.status_code}"
+
+    class Meta:
+        db_table = 'inventory_idempotency_record'
+        unique_together = ('staff_id', 'key',)
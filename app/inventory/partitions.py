@@ -0,0 +1,199 @@
+'''
+Monthly partitions of the audit tables on PostgreSQL, see migration 0020 and the manage_audit_partitions command.
+
+Both audit tables are range partitioned by created_at, one partition per calendar month (UTC), so the reports
+only scan the months of their period, the indexes of the month being written stay small, and expired months are
+detached or dropped whole instead of deleted row by row. A default partition catches the audits of the months
+without a partition, it should stay empty: a month cannot be added while the default holds audits of it.
+PostgreSQL requires the partition key in every unique constraint, so the primary keys and the journal_id
+constraints of the partitioned tables include created_at.
+'''
+import re
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+
+# Audit table -> primary key column
+PARTITIONED_TABLES = {
+    'inventory_stock_audit': 'stock_audit_id',
+    'inventory_sale_audit': 'sales_audit_id',
+}
+PARTITION_KEY = 'created_at'
+DEFAULT_SUFFIX = '_default'
+
+# A monthly partition of an audit table, month is the aware datetime its range starts at
+Partition = namedtuple('Partition', ['table', 'name', 'month'])
+
+_MONTH_SUFFIX = re.compile(r'_y(\d{4})m(\d{2})$')
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, months):
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + years, month=month_index + 1)
+
+
+def months(first_month, last_month):
+    '''
+    The months from first_month to last_month, both included.
+    '''
+    month = first_month
+    while month <= last_month:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(table, using=connection):
+    if using.vendor != 'postgresql':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = partrelid WHERE relname = %s", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(table, using=connection):
+    '''
+    The monthly partitions of a table, oldest first. The default partition is not one of them.
+    '''
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = inhparent JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE parent.relname = %s", [table]
+        )
+        names = [name for name, in cursor.fetchall()]
+    found = []
+    for name in names:
+        match = _MONTH_SUFFIX.search(name)
+        if match:
+            found.append(Partition(table, name, datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)))
+    return sorted(found, key=lambda partition: partition.month)
+
+
+def create_partitions(first_month, last_month, using=connection):
+    '''
+    Create the missing partitions of the audit tables from first_month to last_month. Returns the names created.
+    '''
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = {partition.month for partition in partitions(table, using)}
+        with using.cursor() as cursor:
+            for month in months(first_month, last_month):
+                if month in existing:
+                    continue
+                name = partition_name(table, month)
+                cursor.execute(
+                    f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)", [month, add_months(month, 1)]
+                )
+                created.append(name)
+    return created
+
+
+def expired_partitions(cutoff, using=connection):
+    '''
+    The partitions of the audit tables whose whole month is before cutoff.
+    '''
+    return [
+        partition
+        for table in PARTITIONED_TABLES
+        for partition in partitions(table, using)
+        if add_months(partition.month, 1) <= cutoff
+    ]
+
+
+def detach_partition(partition, drop=False, using=connection):
+    '''
+    Detach a partition from its audit table, its audits are kept in a table of the same name to be archived,
+    or dropped with drop.
+    '''
+    with using.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {partition.table} DETACH PARTITION {partition.name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {partition.name}")
+
+
+def default_partition_rows(using=connection):
+    '''
+    The number of audits in the default partition of each audit table, they belong to months without a partition.
+    '''
+    counts = {}
+    with using.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}{DEFAULT_SUFFIX}")
+            counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def _unique_with_key(definition, partitioned):
+    # UNIQUE (journal_id) <-> UNIQUE (journal_id, created_at)
+    columns = definition[definition.index('(') + 1:definition.rindex(')')]
+    columns = [column.strip() for column in columns.split(',') if column.strip() != PARTITION_KEY]
+    if partitioned:
+        columns.append(PARTITION_KEY)
+    return f"UNIQUE ({', '.join(columns)})"
+
+
+def rebuild_table(schema_editor, table, partitioned, months_ahead=3):
+    '''
+    Rebuild an audit table as a table partitioned by month (or back as a plain table), copying its rows.
+    The partitions cover the months of its audits up to months_ahead months from now, plus the default one.
+    Takes an exclusive lock on the table for as long as the copy takes.
+    '''
+    pk = PARTITIONED_TABLES[table]
+    old_table = f"{table}_rebuilt"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)", [table, table]
+        )
+        index_definitions = [definition for definition, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')", [table]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({PARTITION_KEY}) FROM {table}")
+        oldest = cursor.fetchone()[0]
+
+    partition_by = f" PARTITION BY RANGE ({PARTITION_KEY})" if partitioned else ""
+    schema_editor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+    schema_editor.execute(
+        f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS){partition_by}"
+    )
+    if partitioned:
+        now = datetime.now(dt_timezone.utc)
+        with schema_editor.connection.cursor() as cursor:
+            for month in months(month_start(oldest or now), add_months(month_start(now), months_ahead)):
+                cursor.execute(
+                    f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                    [month, add_months(month, 1)]
+                )
+        schema_editor.execute(f"CREATE TABLE {table}{DEFAULT_SUFFIX} PARTITION OF {table} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), COALESCE(MAX({pk}), 0) + 1, false) FROM {table}"
+    )
+    # the old table takes its indexes and constraints with it, so their names can be used again
+    schema_editor.execute(f"DROP TABLE {old_table}")
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = f"PRIMARY KEY ({pk}, {PARTITION_KEY})" if partitioned else f"PRIMARY KEY ({pk})"
+        elif kind == 'u':
+            definition = _unique_with_key(definition, partitioned)
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    for definition in index_definitions:
+        # the index of a partitioned table is defined ON ONLY it, and created on its partitions one by one
+        schema_editor.execute(definition.replace(' ON ONLY ', ' ON '))
@@ -0,0 +1,179 @@
+'''
+Results of the reports over closed periods, in the settings.REPORT_CACHE_ALIAS cache.
+
+The audits of a period that ended more than SETTLE_SECONDS ago do not change, so a report over it is computed
+once and served from the cache, with an ETag, until an audit is written, changed or deleted inside its window:
+a backdated audit from the write-behind journal, an offline till or an admin edit. Those writes record a
+ReportInvalidation, and a cached report is only served after checking no invalidation overlapping its window
+was recorded since it was computed: one indexed lookup instead of aggregating the audits again.
+'''
+import hashlib
+import itertools
+from collections import namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from inventory.models import ReportInvalidation
+from inventory.snapshots import EPOCH, SETTLE_SECONDS
+
+CachedReport = namedtuple('CachedReport', ['computed_at', 'etag', 'content'])
+
+
+def _cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def _key(endpoint, location_id, start, end):
+    return f"report:{endpoint}:{location_id}:{start.isoformat()}:{end.isoformat()}"
+
+
+def is_closed(end):
+    '''
+    Whether no audit can still be created up to end, the period can be cached.
+    '''
+    return end <= timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+
+
+def content_etag(content):
+    return '"' + hashlib.sha256(content.encode()).hexdigest()[:32] + '"'
+
+
+def not_modified(request, etag):
+    '''
+    Whether the client sent If-None-Match with the etag, it already has the content.
+    '''
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag in etags
+
+
+def is_stale(location_id, since, end, computed_at):
+    '''
+    Whether audits of the location created between since and end were written, changed or deleted after
+    computed_at. Invalidations recorded up to SETTLE_SECONDS before count too, their transaction may not
+    have committed when the report was computed.
+    '''
+    return ReportInvalidation.objects.filter(
+        Q(location_id=location_id) | Q(location__isnull=True),
+        created_from__lte=end,
+        created_to__gte=since,
+        invalidated_at__gte=computed_at - timedelta(seconds=SETTLE_SECONDS),
+    ).exists()
+
+
+def get(endpoint, location_id, start, end, since=None):
+    '''
+    The CachedReport of the endpoint over [start, end], or None when it is not cached or stale.
+    since is the earliest audit time the report depends on, start by default.
+    '''
+    key = _key(endpoint, location_id, start, end)
+    cached = _cache().get(key)
+    if cached is None:
+        return None
+    cached = CachedReport(*cached)
+    if is_stale(location_id, start if since is None else since, end, cached.computed_at):
+        _cache().delete(key)
+        return None
+    return cached
+
+
+def put(endpoint, location_id, start, end, content, computed_at):
+    '''
+    Cache the content of a report, computed from what the database held at computed_at, unless it is larger
+    than REPORT_CACHE_MAX_BYTES. Returns its CachedReport.
+    '''
+    cached = CachedReport(computed_at, content_etag(content), content)
+    if len(content) <= settings.REPORT_CACHE_MAX_BYTES:
+        _cache().set(_key(endpoint, location_id, start, end), tuple(cached))
+    return cached
+
+
+def collect(endpoint, location_id, start, end, chunks):
+    '''
+    Read the chunks of a report while they fit in REPORT_CACHE_MAX_BYTES. Returns the CachedReport of the whole
+    report, now cached, and None, or None and the chunks to stream when it is larger: the chunks already read
+    followed by the others.
+    '''
+    computed_at = timezone.now()
+    chunks = iter(chunks)
+    collected = []
+    size = 0
+    for chunk in chunks:
+        collected.append(chunk)
+        size += len(chunk)
+        if size > settings.REPORT_CACHE_MAX_BYTES:
+            return None, itertools.chain(collected, chunks)
+    return put(endpoint, location_id, start, end, ''.join(collected), computed_at), None
+
+
+async def acollect(endpoint, location_id, start, end, chunks):
+    '''
+    collect for the async chunks of a report streamed by an async view.
+    '''
+    computed_at = timezone.now()
+    chunks = aiter(chunks)
+    collected = []
+    size = 0
+    async for chunk in chunks:
+        collected.append(chunk)
+        size += len(chunk)
+        if size > settings.REPORT_CACHE_MAX_BYTES:
+            return None, _achain(collected, chunks)
+    return await sync_to_async(put)(endpoint, location_id, start, end, ''.join(collected), computed_at), None
+
+
+async def _achain(collected, chunks):
+    for chunk in collected:
+        yield chunk
+    async for chunk in chunks:
+        yield chunk
+
+
+def invalidate_audits(audits):
+    '''
+    Record a ReportInvalidation for each location of the audits created more than SETTLE_SECONDS ago,
+    covering their created_at, to be called when they are inserted, changed or deleted.
+    Audits created just now cannot land in a cached window and record nothing.
+    '''
+    now = timezone.now()
+    settled = now - timedelta(seconds=SETTLE_SECONDS)
+    windows = {}
+    for audit in audits:
+        if audit.created_at < settled:
+            created_from, created_to = windows.get(audit.location_id, (audit.created_at, audit.created_at))
+            windows[audit.location_id] = (min(created_from, audit.created_at), max(created_to, audit.created_at))
+    if windows:
+        ReportInvalidation.objects.bulk_create([
+            ReportInvalidation(location_id=location_id, created_from=created_from, created_to=created_to, invalidated_at=now)
+            for location_id, (created_from, created_to) in windows.items()
+        ])
+        prune(now)
+
+
+def invalidate_period(created_from, created_to):
+    '''
+    Invalidate the cached reports of every location depending on the audits created between created_from and created_to.
+    '''
+    now = timezone.now()
+    ReportInvalidation.objects.create(location=None, created_from=created_from, created_to=created_to, invalidated_at=now)
+    prune(now)
+
+
+def invalidate_all():
+    '''
+    Invalidate the cached reports of every location and period, i.e. when the ingredient costs they use change.
+    '''
+    invalidate_period(EPOCH, timezone.now())
+
+
+def prune(now):
+    # Reports computed before the oldest invalidations have expired from the cache
+    if settings.REPORT_CACHE_TIMEOUT is not None:
+        ReportInvalidation.objects.filter(
+            invalidated_at__lt=now - timedelta(seconds=settings.REPORT_CACHE_TIMEOUT + SETTLE_SECONDS)
+        ).delete()
@@ -0,0 +1,287 @@
+import csv
+import io
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import DateTimeField, F, Q, Sum, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import Location, IngredientStock, StockAudit, SalesAudit, DailyStockRollup, DailySalesRollup, StockSnapshot
+from inventory.snapshots import EPOCH
+
+# Rows written to the in-memory buffer before a chunk is sent to the client
+STREAM_CHUNK_ROWS = 500
+# Rows fetched from the database per round trip (server-side cursor on PostgreSQL)
+DB_CHUNK_SIZE = 2000
+
+INVENTORY_REPORT_HEADER = ['stock_audit_id', 'reason', 'cost', 'ingredient_id', 'staff_id', 'created_at']
+
+
+def stream_csv(header, rows, chunk_rows=STREAM_CHUNK_ROWS):
+    '''
+    Render header and rows as CSV text chunks of chunk_rows rows, so a response can be
+    streamed with a memory footprint that does not depend on the number of rows.
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def astream_csv(header, rows, chunk_rows=STREAM_CHUNK_ROWS):
+    '''
+    stream_csv for an async iterator of rows, to be served by an async StreamingHttpResponse.
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def inventory_report_rows(stock_audit):
+    return stock_audit.values_list(*INVENTORY_REPORT_HEADER).iterator(chunk_size=DB_CHUNK_SIZE)
+
+
+async def ainventory_report_rows(stock_audit):
+    # values() and not values_list(): on Django 4.2 values_list().aiterator() runs the query in the event loop
+    async for row in stock_audit.values(*INVENTORY_REPORT_HEADER).aiterator(chunk_size=DB_CHUNK_SIZE):
+        yield tuple(row.values())
+
+
+def parse_period(request_data):
+    '''
+    The start_date and end_date (dd/mm/yyyy) of a report request as aware datetimes at midnight.
+    '''
+    tz = timezone.get_current_timezone()
+    start_date = datetime.strptime(request_data.get('start_date'), '%d/%m/%Y')
+    end_date = datetime.strptime(request_data.get('end_date'), '%d/%m/%Y')
+    return timezone.make_aware(start_date, tz), timezone.make_aware(end_date, tz)
+
+
+def split_period(start, end):
+    '''
+    Split the [start, end] period into the whole days it covers, as a [first_day, last_day) range
+    of dates for the daily rollups, and a Q over created_at for the partial days at its edges.
+    '''
+    tz = timezone.get_current_timezone()
+    first_day = timezone.localtime(start, tz).date()
+    if timezone.localtime(start, tz).time() != time.min:
+        first_day += timedelta(days=1)
+    # the day of end is never whole, the period stops at end
+    last_day = timezone.localtime(end, tz).date()
+    if first_day >= last_day:
+        return None, None, Q(created_at__range=(start, end))
+
+    first_midnight = timezone.make_aware(datetime.combine(first_day, time.min), tz)
+    last_midnight = timezone.make_aware(datetime.combine(last_day, time.min), tz)
+    edges = Q(created_at__gte=start, created_at__lt=first_midnight) | Q(created_at__gte=last_midnight, created_at__lte=end)
+    return first_day, last_day, edges
+
+
+def _location_total(queryset, expression):
+    return Coalesce(
+        Subquery(queryset.filter(location=OuterRef('pk')).order_by().values('location').annotate(total=Sum(expression)).values('total')),
+        Value(0.0)
+    )
+
+
+def annotate_inventory_value_at(locations, at):
+    '''
+    Annotate a Location queryset with the value of its inventory at at (inventory_value_at), at the current
+    ingredient costs: the value of its latest stock snapshot before at plus the value of the audits after it.
+    '''
+    latest_snapshot = StockSnapshot.objects.filter(location=OuterRef('pk'), taken_at__lte=at).order_by('-taken_at').values('taken_at')[:1]
+    snapshot_value = _location_total(
+        StockSnapshot.objects.filter(taken_at=OuterRef('inventory_snapshot_at')), F('units_available') * F('ingredient__cost')
+    )
+    audits_value = _location_total(
+        StockAudit.objects.filter(created_at__gt=OuterRef('inventory_snapshot_at'), created_at__lte=at), F('units_change') * F('ingredient__cost')
+    )
+    return locations.annotate(
+        inventory_snapshot_at=Coalesce(Subquery(latest_snapshot), Value(EPOCH, output_field=DateTimeField()))
+    ).annotate(inventory_value_at=snapshot_value + audits_value)
+
+
+def annotate_financial_summary(locations, start, end):
+    '''
+    Annotate a Location queryset with the revenue, deliveries cost and waste cost between start and end,
+    the inventory value at end and the current inventory value.
+    Whole days are read from the daily rollups and only the partial days at the edges from the raw audits,
+    so the cost does not grow with the length of the period.
+    '''
+    first_day, last_day, edges = split_period(start, end)
+    delivery = StockAudit.StockAuditReason.DELIVERY
+    waste = StockAudit.StockAuditReason.WASTE
+
+    stock_audit = StockAudit.objects.filter(edges)
+    sales_audit = SalesAudit.objects.filter(edges)
+    revenue = _location_total(sales_audit, 'sale_amount')
+    deliveries_cost = _location_total(stock_audit.filter(reason=delivery), 'cost')
+    waste_cost = _location_total(stock_audit.filter(reason=waste), 'cost')
+    if first_day:
+        stock_rollup = DailyStockRollup.objects.filter(day__gte=first_day, day__lt=last_day)
+        sales_rollup = DailySalesRollup.objects.filter(day__gte=first_day, day__lt=last_day)
+        revenue += _location_total(sales_rollup, 'sale_amount')
+        deliveries_cost += _location_total(stock_rollup.filter(reason=delivery), 'cost')
+        waste_cost += _location_total(stock_rollup.filter(reason=waste), 'cost')
+
+    return annotate_inventory_value_at(locations, end).annotate(
+        total_revenue=revenue,
+        total_deliveries_cost=deliveries_cost,
+        total_waste_cost=waste_cost,
+        current_inventory_value=_location_total(IngredientStock.objects.all(), F('units_available') * F('ingredient__cost')),
+    )
+
+
+FINANCIAL_SUMMARY_FIELDS = ['total_revenue', 'total_deliveries_cost', 'total_waste_cost', 'current_inventory_value', 'inventory_value_at']
+
+
+def financial_summary(location_id, start, end):
+    '''
+    The financial summary figures of one location, in a single query.
+    '''
+    return annotate_financial_summary(Location.objects.filter(location_id=location_id), start, end).values(
+        *FINANCIAL_SUMMARY_FIELDS
+    ).get()
+
+
+def current_inventory_value(location_id):
+    return IngredientStock.objects.filter(location_id=location_id).aggregate(
+        value=Coalesce(Sum(F('units_available') * F('ingredient__cost')), Value(0.0))
+    )['value']
+
+
+async def afinancial_summary(location_id, start, end):
+    return await annotate_financial_summary(Location.objects.filter(location_id=location_id), start, end).values(
+        *FINANCIAL_SUMMARY_FIELDS
+    ).aget()
+
+
+def _grouped_totals(queryset, expression, *keys):
+    '''
+    The rows (*keys, total) of the sum of expression over queryset grouped by keys, in one query.
+    '''
+    return queryset.order_by().values(*keys).annotate(total=Sum(expression)).values_list(*keys, 'total')
+
+
+def chain_financial_summaries(location_ids, start, end):
+    '''
+    The financial summary figures of each of location_ids, as a dict location_id -> summary, with one
+    query per figure grouped by location whatever the number of locations (two for the period totals,
+    one for its whole days from the rollups and one for its partial days from the raw audits).
+    '''
+    location_ids = list(location_ids)
+    first_day, last_day, edges = split_period(start, end)
+    delivery = StockAudit.StockAuditReason.DELIVERY
+    waste = StockAudit.StockAuditReason.WASTE
+
+    sales = [SalesAudit.objects.filter(edges)]
+    stock = [StockAudit.objects.filter(edges)]
+    if first_day:
+        sales.append(DailySalesRollup.objects.filter(day__gte=first_day, day__lt=last_day))
+        stock.append(DailyStockRollup.objects.filter(day__gte=first_day, day__lt=last_day))
+
+    revenue = defaultdict(float)
+    costs = defaultdict(float)
+    for queryset in sales:
+        for location_id, total in _grouped_totals(queryset.filter(location_id__in=location_ids), 'sale_amount', 'location'):
+            revenue[location_id] += total
+    for queryset in stock:
+        for location_id, reason, total in _grouped_totals(
+            queryset.filter(location_id__in=location_ids, reason__in=[delivery, waste]), 'cost', 'location', 'reason'
+        ):
+            costs[(location_id, reason)] += total
+    current_value = dict(_grouped_totals(
+        IngredientStock.objects.filter(location_id__in=location_ids), F('units_available') * F('ingredient__cost'), 'location'
+    ))
+    value_at = dict(annotate_inventory_value_at(Location.objects.filter(location_id__in=location_ids), end).values_list(
+        'location_id', 'inventory_value_at'
+    ))
+
+    return {
+        location_id: {
+            'total_revenue': revenue[location_id],
+            'total_deliveries_cost': costs[(location_id, delivery)],
+            'total_waste_cost': costs[(location_id, waste)],
+            'current_inventory_value': current_value.get(location_id, 0.0),
+            'inventory_value_at': value_at[location_id],
+        }
+        for location_id in location_ids if location_id in value_at
+    }
+
+
+def _chain_financial_summaries_in_thread(location_ids, start, end):
+    try:
+        return chain_financial_summaries(location_ids, start, end)
+    finally:
+        # the connection of a pool thread is not closed by the request cycle
+        connection.close()
+
+
+def chain_financial_summaries_by_batch(location_ids, start, end, batch_size=None, workers=None):
+    '''
+    Yield the (location_id, summary) of each of location_ids as soon as its batch is computed.
+    The locations are summarized in batches of CHAIN_SUMMARY_BATCH_SIZE, spread over CHAIN_SUMMARY_WORKERS
+    threads, each with its own database connection, so the batches run at the same time on the database.
+    With a single worker or a single batch everything runs in the calling thread.
+    '''
+    location_ids = sorted(location_ids)
+    batch_size = batch_size or settings.CHAIN_SUMMARY_BATCH_SIZE
+    workers = workers or settings.CHAIN_SUMMARY_WORKERS
+    batches = [location_ids[index:index + batch_size] for index in range(0, len(location_ids), batch_size)]
+
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            yield from chain_financial_summaries(batch, start, end).items()
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(batches)))
+    try:
+        futures = [executor.submit(_chain_financial_summaries_in_thread, batch, start, end) for batch in batches]
+        for future in as_completed(futures):
+            yield from future.result().items()
+    finally:
+        # a client that stops reading the response does not wait for the batches not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def financial_summary_header():
+    return [
+        'location_id',
+        'period',
+        'total revenue from sales (in period)',
+        'total deliveries cost (in period)',
+        'total waste cost (in period)',
+        f"current inventory value ({datetime.today().strftime('%d-%m-%Y')})",
+        'inventory value (at end of period)'
+    ]
+
+
+def financial_summary_row(location_id, request_data, summary):
+    return [
+        location_id,
+        f"{request_data.get('start_date')} to {request_data.get('end_date')}",
+        summary['total_revenue'],
+        summary['total_deliveries_cost'],
+        summary['total_waste_cost'],
+        summary['current_inventory_value'],
+        summary['inventory_value_at']
+    ]
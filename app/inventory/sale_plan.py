@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from inventory.models import Menu, ModifierOption, RecipeIngredient
+
+# Everything a sale needs to know about a menu item, compiled from the catalog tables.
+# lines is a tuple of (ingredient_id, quantity, unit cost), options a dict of modifier_option_id -> SaleOption
+# for the options of the menu item modifier.
+SalePlan = namedtuple('SalePlan', ['menu_id', 'recipe_id', 'location_id', 'price', 'lines', 'modifier_id', 'options'])
+# What a modifier option adds to a portion: its price and the lines of its ingredient (none or one)
+SaleOption = namedtuple('SaleOption', ['price', 'lines'])
+
+_plans = {}
+_lock = threading.Lock()
+
+
+def _ttl():
+    # Bounds how long another worker process can keep serving a plan after a catalog change
+    return settings.SALE_PLAN_CACHE_TTL
+
+
+def compile_sale_plan(menu_id):
+    menu = Menu.objects.filter(menu_id=menu_id).values('recipe_id', 'location_id', 'price', 'modifier_id').first()
+    if not menu:
+        return None
+    lines = tuple(
+        RecipeIngredient.objects.filter(recipe_id=menu['recipe_id']).values_list('ingredient_id', 'quantity', 'ingredient__cost')
+    )
+    options = {}
+    if menu['modifier_id']:
+        for option_id, price, ingredient_id, quantity, cost in ModifierOption.objects.filter(modifier_id=menu['modifier_id']).values_list(
+            'modifier_option_id', 'price', 'ingredient_id', 'quantity', 'ingredient__cost'
+        ):
+            options[option_id] = SaleOption(price, ((ingredient_id, quantity, cost),) if ingredient_id else ())
+    return SalePlan(menu_id, menu['recipe_id'], menu['location_id'], menu['price'], lines, menu['modifier_id'], options)
+
+
+def portion(plan, option_ids=()):
+    '''
+    The ingredient lines and the price of a portion of the menu item of plan with the modifier options
+    option_ids (an option can be chosen more than once), or None if one is not an option of the menu item.
+    An ingredient of both the recipe and an option gets a single line. No query, the options are in the plan.
+    '''
+    if not option_ids:
+        return plan.lines, plan.price
+    if any(type(option_id) is not int or option_id not in plan.options for option_id in option_ids):
+        return None
+
+    price = plan.price
+    quantities = {ingredient_id: [quantity, cost] for ingredient_id, quantity, cost in plan.lines}
+    for option_id in option_ids:
+        option = plan.options[option_id]
+        price += option.price
+        for ingredient_id, quantity, cost in option.lines:
+            quantities.setdefault(ingredient_id, [0.0, cost])[0] += quantity
+    return tuple((ingredient_id, quantity, cost) for ingredient_id, (quantity, cost) in quantities.items()), price
+
+
+def get_sale_plan(menu_id):
+    '''
+    Return the SalePlan of a menu item from the per-process cache, compiling it on a miss.
+    Returns None if the menu item does not exist.
+    '''
+    now = time.monotonic()
+    cached = _plans.get(menu_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    plan = compile_sale_plan(menu_id)
+    if plan:
+        with _lock:
+            _plans[menu_id] = (plan, now + _ttl())
+    return plan
+
+
+def invalidate(menu_id=None, recipe_id=None, ingredient_id=None, modifier_id=None):
+    '''
+    Drop the cached plans of a menu item, of all menu items of a recipe, of all menu items using
+    an ingredient or of all menu items with a modifier. With no arguments the whole cache is cleared.
+    '''
+    with _lock:
+        if menu_id is None and recipe_id is None and ingredient_id is None and modifier_id is None:
+            _plans.clear()
+            return
+        for cached_menu_id, (plan, _) in list(_plans.items()):
+            ingredient_ids = {line[0] for line in plan.lines}
+            ingredient_ids.update(line[0] for option in plan.options.values() for line in option.lines)
+            if cached_menu_id == menu_id or plan.recipe_id == recipe_id or ingredient_id in ingredient_ids or (
+                modifier_id is not None and plan.modifier_id == modifier_id
+            ):
+                del _plans[cached_menu_id]
@@ -0,0 +1,60 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from inventory import availability, report_cache, sale_plan
+from inventory.models import Menu, Recipe, RecipeIngredient, Ingredient, ModifierOption, SalesAudit, StockAudit
+
+
+@receiver([post_save, post_delete], sender=Menu)
+def menu_changed(sender, instance, **kwargs):
+    sale_plan.invalidate(menu_id=instance.menu_id)
+    # the menu item may have moved to another location, the matrices are cheap to compile again
+    availability.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    sale_plan.invalidate(recipe_id=instance.recipe_id)
+    availability.invalidate()
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, created=False, **kwargs):
+    availability.invalidate()
+    if kwargs['signal'] is post_save and not created:
+        # The row may have been moved to another recipe, we don't know which plans used it before
+        sale_plan.invalidate()
+    else:
+        sale_plan.invalidate(recipe_id=instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, reverse, **kwargs):
+    availability.invalidate()
+    if reverse:
+        sale_plan.invalidate(ingredient_id=instance.ingredient_id)
+    else:
+        sale_plan.invalidate(recipe_id=instance.recipe_id)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    # The plans carry the ingredient unit cost, and the financial summaries value the inventory with it
+    sale_plan.invalidate(ingredient_id=instance.ingredient_id)
+    report_cache.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=ModifierOption)
+def modifier_option_changed(sender, instance, created=False, **kwargs):
+    if kwargs['signal'] is post_save and not created:
+        # The option may have been moved to another modifier
+        sale_plan.invalidate()
+    else:
+        sale_plan.invalidate(modifier_id=instance.modifier_id)
+
+
+@receiver([post_save, post_delete], sender=StockAudit)
+@receiver([post_save, post_delete], sender=SalesAudit)
+def audit_changed(sender, instance, **kwargs):
+    # An audit saved one by one, i.e. edited in the admin. Inserted audits invalidate in inventory.audit
+    report_cache.invalidate_audits([instance])
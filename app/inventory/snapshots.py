@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from inventory.models import Location, StockAudit, StockSnapshot
+
+# Audits get their created_at before they are committed, so snapshots are only taken for times at least
+# this many seconds in the past, when no audit up to them can still be in flight.
+SETTLE_SECONDS = 60
+# Rows fetched from the database per round trip while replaying the audits
+DB_CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+
+# Snapshot times are multiples of the interval since the epoch, i.e. midnight UTC for daily snapshots
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _snapshot_time_after(moment, step):
+    '''
+    The first snapshot time at or after moment.
+    '''
+    periods, rest = divmod(moment - EPOCH, step)
+    return EPOCH + step * (periods + 1 if rest else periods)
+
+
+def _snapshot_time_before(moment, step):
+    '''
+    The last snapshot time at or before moment.
+    '''
+    return EPOCH + step * ((moment - EPOCH) // step)
+
+
+def latest_snapshot(location_id, at):
+    '''
+    The time of the latest snapshot of the location at or before at, or None, and its units by ingredient_id.
+    '''
+    taken_at = StockSnapshot.objects.filter(location_id=location_id, taken_at__lte=at).aggregate(
+        latest=Max('taken_at')
+    )['latest']
+    if taken_at is None:
+        return None, {}
+    return taken_at, dict(
+        StockSnapshot.objects.filter(location_id=location_id, taken_at=taken_at).values_list('ingredient_id', 'units_available')
+    )
+
+
+def stock_at(location_id, at):
+    '''
+    The units of every ingredient a location had at at (audits created up to at included), as a dict
+    of ingredient_id -> units. Built from the latest snapshot before at plus the audits after it,
+    so it costs at most one snapshot interval of audits whatever the length of the history.
+    '''
+    taken_at, units = latest_snapshot(location_id, at)
+    audits = StockAudit.objects.filter(location_id=location_id, created_at__lte=at)
+    if taken_at:
+        audits = audits.filter(created_at__gt=taken_at)
+    for ingredient_id, units_change in audits.order_by().values('ingredient_id').annotate(
+        total=Sum('units_change')
+    ).values_list('ingredient_id', 'total'):
+        units[ingredient_id] = units.get(ingredient_id, 0.0) + units_change
+    return units
+
+
+def take_location_snapshots(location_id, until, interval=None):
+    '''
+    Snapshot the stock of a location at every snapshot time since its latest snapshot and up to until,
+    replaying the audits after that snapshot in a single ordered pass.
+    A snapshot time without any audit since the previous snapshot is skipped, the previous snapshot
+    still holds its stock. Returns the number of snapshots taken.
+    '''
+    step = timedelta(seconds=interval or settings.STOCK_SNAPSHOT_INTERVAL)
+    last_time = _snapshot_time_before(until, step)
+    taken_at, units = latest_snapshot(location_id, last_time)
+
+    audits = StockAudit.objects.filter(location_id=location_id, created_at__lte=last_time)
+    if taken_at:
+        audits = audits.filter(created_at__gt=taken_at)
+
+    snapshots = []
+    snapshot_time = None
+    for created_at, ingredient_id, units_change in audits.order_by('created_at').values_list(
+        'created_at', 'ingredient_id', 'units_change'
+    ).iterator(chunk_size=DB_CHUNK_SIZE):
+        if snapshot_time and created_at > snapshot_time:
+            snapshots.extend(_snapshot(location_id, snapshot_time, units))
+            snapshot_time = None
+        if not snapshot_time:
+            snapshot_time = _snapshot_time_after(created_at, step)
+        units[ingredient_id] = units.get(ingredient_id, 0.0) + units_change
+    if snapshot_time:
+        snapshots.extend(_snapshot(location_id, snapshot_time, units))
+
+    # a concurrent run takes the very same snapshots
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len({snapshot.taken_at for snapshot in snapshots})
+
+
+def _snapshot(location_id, taken_at, units):
+    return [
+        StockSnapshot(taken_at=taken_at, location_id=location_id, ingredient_id=ingredient_id, units_available=units_available)
+        for ingredient_id, units_available in units.items()
+    ]
+
+
+def discard_snapshots(stock_audits):
+    '''
+    Delete the snapshots of each location taken at or after the earliest of the stock audits created more than
+    SETTLE_SECONDS ago, to be called when they are inserted: a backdated audit (i.e. from an offline tablet)
+    changes the stock of every snapshot after it. They are taken again by the next take_stock_snapshots run,
+    until then the stock is rebuilt from an earlier snapshot.
+    '''
+    settled = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    earliest = {}
+    for audit in stock_audits:
+        if audit.created_at < settled:
+            earliest[audit.location_id] = min(earliest.get(audit.location_id, audit.created_at), audit.created_at)
+    if earliest:
+        conditions = Q()
+        for location_id, created_at in earliest.items():
+            conditions |= Q(location_id=location_id, taken_at__gte=created_at)
+        StockSnapshot.objects.filter(conditions).delete()
+
+
+def take_stock_snapshots(until=None, interval=None):
+    '''
+    Bring the stock snapshots of every location up to date. Returns the number of snapshots taken.
+    '''
+    until = until or timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    taken = 0
+    for location_id in Location.objects.values_list('location_id', flat=True):
+        with transaction.atomic():
+            taken += take_location_snapshots(location_id, until, interval)
+    return taken
@@ -0,0 +1,216 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.db import bulk_upsert_add
+from inventory.models import Ingredient, IngredientStock, StockAudit, SalesAudit
+from inventory.sale_plan import get_sale_plan, portion
+
+
+class StockError(Exception):
+    '''
+    A stock movement that cannot be applied. The message is meant to be returned to the client.
+    '''
+
+
+class NotEnoughStock(StockError):
+    '''
+    The location has no stock record for the ingredient (in_records is False) or not enough units of it.
+    '''
+
+    def __init__(self, ingredient_id, in_records):
+        super().__init__(f"Error: Not enough units of ingredient {ingredient_id} in stock")
+        self.ingredient_id = ingredient_id
+        self.in_records = in_records
+
+
+def _is_units(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def line_ingredient_ids(lines):
+    return {line.get('ingredient_id') for line in lines if isinstance(line, dict) and isinstance(line.get('ingredient_id'), int)}
+
+
+def ingredient_costs_of(ingredient_ids):
+    return dict(Ingredient.objects.filter(ingredient_id__in=ingredient_ids).values_list('ingredient_id', 'cost'))
+
+
+def resolve_lines(lines, ingredient_costs=None):
+    '''
+    Validate a list of {"ingredient_id": ..., "units": ...} lines and fetch the cost of all
+    their ingredients with a single query, unless their ingredient_costs are given.
+    Returns a list of (ingredient_id, units) and a dict of ingredient_id -> cost.
+    Raises StockError naming every offending line (by its position in the list).
+    '''
+    parsed = []
+    for line in lines:
+        if not isinstance(line, dict):
+            parsed.append((None, None))
+            continue
+        parsed.append((line.get('ingredient_id'), line.get('units', 0)))
+
+    if ingredient_costs is None:
+        ingredient_costs = ingredient_costs_of(line_ingredient_ids(lines))
+
+    wrong_lines = [
+        str(index) for index, (ingredient_id, units) in enumerate(parsed)
+        if ingredient_id not in ingredient_costs or not _is_units(units) or units < 0.0
+    ]
+    if wrong_lines:
+        raise StockError(f"Error: Ingredient not in catalog or negative units (lines {', '.join(wrong_lines)})")
+
+    return parsed, ingredient_costs
+
+
+def receive_delivery(location_id, staff_id, delivery):
+    '''
+    Add a whole delivery to the location stock as a set: one query to resolve the ingredients,
+    one upsert for the stock rows and one bulk insert for the audit rows, whatever the number of lines.
+    '''
+    lines, ingredient_costs = resolve_lines(delivery)
+
+    units_by_ingredient = defaultdict(float)
+    for ingredient_id, units in lines:
+        units_by_ingredient[ingredient_id] += units
+
+    with transaction.atomic():
+        bulk_upsert_add(
+            IngredientStock,
+            ['ingredient', 'location'],
+            ['units_available'],
+            # in ingredient order, like decrement_stock
+            [(ingredient_id, location_id, units) for ingredient_id, units in sorted(units_by_ingredient.items())]
+        )
+        save_stock_audits([
+            StockAudit(
+                reason=StockAudit.StockAuditReason.DELIVERY,
+                units_change=units,
+                cost=units * ingredient_costs[ingredient_id],
+                ingredient_id=ingredient_id,
+                location_id=location_id,
+                staff_id=staff_id
+            )
+            for ingredient_id, units in lines
+        ])
+
+
+def decrement_stock(location_id, units_by_ingredient):
+    '''
+    Take units off the location stock with one conditional UPDATE per ingredient, evaluated by the database,
+    so concurrent requests can neither oversell nor lose an update.
+    Raises NotEnoughStock for the first ingredient that cannot be decremented; call it inside
+    a transaction so that the decrements already applied are rolled back.
+    The rows are updated (and locked) in ingredient order, so two requests taking the same ingredients
+    listed in a different order wait for each other instead of deadlocking.
+    '''
+    for ingredient_id, units in sorted(units_by_ingredient.items()):
+        updated = IngredientStock.objects.filter(
+            ingredient_id=ingredient_id, location_id=location_id, units_available__gte=units
+        ).update(units_available=F('units_available') - units)
+        if not updated:
+            in_records = IngredientStock.objects.filter(ingredient_id=ingredient_id, location_id=location_id).exists()
+            raise NotEnoughStock(ingredient_id, in_records)
+
+
+def take_waste(location_id, staff_id, take_stock):
+    '''
+    Remove the wasted units of every line from the location stock and audit them.
+    '''
+    lines, ingredient_costs = resolve_lines(take_stock)
+
+    units_by_ingredient = defaultdict(float)
+    for ingredient_id, units in lines:
+        units_by_ingredient[ingredient_id] += units
+
+    with transaction.atomic():
+        decrement_stock(location_id, units_by_ingredient)
+        save_stock_audits([
+            StockAudit(
+                reason=StockAudit.StockAuditReason.WASTE,
+                units_change=(-1) * units,  # a negative change
+                cost=units * ingredient_costs[ingredient_id],
+                ingredient_id=ingredient_id,
+                location_id=location_id,
+                staff_id=staff_id
+            )
+            for ingredient_id, units in lines
+        ])
+
+
+def resolve_order(location_id, items):
+    '''
+    Validate a list of {"menu_id": ..., "quantity": ..., "options": [...]} order lines against the menu items
+    of the location and their modifier options. A line sells 1 to settings.ORDER_MAX_QUANTITY portions and
+    the order at most settings.ORDER_MAX_PORTIONS.
+    Returns a list of (SalePlan, quantity, option_ids). Raises StockError naming every offending line.
+    '''
+    # every line sells a portion at least, a longer order is refused before its lines are read
+    if len(items) > settings.ORDER_MAX_PORTIONS:
+        raise StockError(f"Error: More than {settings.ORDER_MAX_PORTIONS} portions in the order")
+    order = []
+    wrong_lines = []
+    for index, item in enumerate(items):
+        plan = get_sale_plan(item.get('menu_id')) if isinstance(item, dict) and isinstance(item.get('menu_id'), int) else None
+        quantity = item.get('quantity', 1) if isinstance(item, dict) else None
+        option_ids = item.get('options', []) if isinstance(item, dict) else None
+        if not plan or plan.location_id != location_id or not isinstance(quantity, int) or isinstance(quantity, bool) or (
+            not 1 <= quantity <= settings.ORDER_MAX_QUANTITY
+        ) or (
+            not isinstance(option_ids, list) or portion(plan, option_ids) is None
+        ):
+            wrong_lines.append(str(index))
+            continue
+        order.append((plan, quantity, option_ids))
+
+    if wrong_lines:
+        raise StockError(f"Error: Menu item not available in location or wrong quantity or modifier options (lines {', '.join(wrong_lines)})")
+    if sum(quantity for _, quantity, _ in order) > settings.ORDER_MAX_PORTIONS:
+        raise StockError(f"Error: More than {settings.ORDER_MAX_PORTIONS} portions in the order")
+    return order
+
+
+def sell_ticket(location_id, staff_id, order):
+    '''
+    Sell a whole ticket, a list of (SalePlan, quantity, modifier option_ids), in one transaction: the ingredient
+    demand of all its lines, recipes and modifier options, is added up so each ingredient is checked and
+    decremented once, and the audits are bulk inserted.
+    The stock audits hold one row per line and ingredient, the sales audits one row per menu item sold,
+    priced with its options.
+    '''
+    portions_order = [(plan, portions) + portion(plan, option_ids) for plan, portions, option_ids in order]
+    units_by_ingredient = defaultdict(float)
+    for _, portions, lines, _ in portions_order:
+        for ingredient_id, quantity, _ in lines:
+            units_by_ingredient[ingredient_id] += quantity * portions
+
+    with transaction.atomic():
+        decrement_stock(location_id, units_by_ingredient)
+        save_stock_audits([
+            StockAudit(
+                reason=StockAudit.StockAuditReason.SALE,
+                units_change=(-1) * quantity * portions,  # a negative change
+                cost=quantity * portions * cost,
+                ingredient_id=ingredient_id,
+                location_id=location_id,
+                staff_id=staff_id
+            )
+            for _, portions, lines, _ in portions_order
+            for ingredient_id, quantity, cost in lines
+        ])
+        save_sales_audits([
+            SalesAudit(sale_amount=price, location_id=location_id, menu_id=plan.menu_id, staff_id=staff_id)
+            for plan, portions, _, price in portions_order
+            for _ in range(portions)
+        ])
+
+
+def sell_menu(location_id, staff_id, plan, option_ids=()):
+    '''
+    Take the recipe ingredients of a menu item, described by its SalePlan, and of its chosen modifier options
+    off the location stock and audit the sale. No catalog query is needed, only the stock and audit writes.
+    '''
+    sell_ticket(location_id, staff_id, [(plan, 1, option_ids)])
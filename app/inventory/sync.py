@@ -0,0 +1,234 @@
+'''
+Offline sync: the deliveries, waste and sales a tablet queued while offline, applied in one request.
+
+The operations of a batch are all validated first, with one query for the costs of all their ingredients,
+and a batch holding a wrong operation is refused whole. The batch is then applied in order in one transaction:
+the stock rows of all its ingredients are read (and locked on PostgreSQL) with one query, each operation is checked
+against the stock left by the operations before it, then the net change of every ingredient is written, with the
+conditional decrement of the sales for the ingredients taken and one upsert for those added, and the audits of all
+the operations are bulk inserted, whatever the number of operations.
+An operation the stock cannot cover is rejected on its own, the others are applied.
+The audits keep the time the operation was made on the tablet, a backdated audit invalidates the cached reports
+and the stock snapshots after it (see inventory.audit.insert_stock_audits).
+'''
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions, status
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.db import bulk_upsert_add
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from inventory.sale_plan import portion
+from inventory.stock import NotEnoughStock, StockError, decrement_stock, ingredient_costs_of, line_ingredient_ids, resolve_lines, resolve_order
+
+# Operation type -> the field holding its lines, the staff roles allowed to make it (None for all)
+# and the reason of its stock audits
+OPERATIONS = {
+    'delivery': ('delivery', [Staff.StaffRoles.CHEF, Staff.StaffRoles.BACK_OF_HOUSE], StockAudit.StockAuditReason.DELIVERY),
+    'take_stock': ('take_stock', None, StockAudit.StockAuditReason.WASTE),
+    'sale': ('items', [Staff.StaffRoles.FRONT_OF_HOUSE], StockAudit.StockAuditReason.SALE),
+}
+
+# A validated operation: its type, the time it was made, its stock changes as (ingredient_id, units_change, cost)
+# and, for a sale, the menu items sold as (menu_id, sale_amount, portions)
+SyncOperation = namedtuple('SyncOperation', ['type', 'created_at', 'changes', 'sales'])
+
+APPLIED = 'applied'
+REJECTED = 'rejected'
+
+
+class WrongOperations(StockError):
+    '''
+    The batch holds wrong operations, errors maps their positions in the batch to their error messages.
+    '''
+
+    def __init__(self, errors):
+        super().__init__(f"Error: Wrong operations ({', '.join(str(index) for index in sorted(errors))})")
+        self.errors = errors
+
+
+class StockChanged(exceptions.APIException):
+    '''
+    A concurrent request took stock the batch was checked against before the batch was written.
+    Raised out of the view rather than returned, so the transaction of a keyed request is rolled back with its
+    idempotency record and the retry of the batch applies it.
+    '''
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The stock changed while the batch was applied, send it again'
+    default_code = 'stock_changed'
+
+
+def parse_created_at(value):
+    '''
+    The aware datetime of an ISO 8601 created_at, in the current timezone when it has none, or None.
+    '''
+    try:
+        created_at = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+    if created_at is not None and timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, timezone.get_current_timezone())
+    return created_at
+
+
+def _too_many_portions():
+    return StockError(f"Error: More than {settings.SYNC_MAX_PORTIONS} portions sold in the batch")
+
+
+def _changes(operation_type, lines, ingredient_costs):
+    if operation_type == 'sale':
+        changes = []
+        sales = []
+        for plan, quantity, option_ids in lines:
+            portion_lines, price = portion(plan, option_ids)
+            changes.extend(
+                (ingredient_id, (-1) * units * quantity, units * quantity * cost) for ingredient_id, units, cost in portion_lines
+            )
+            sales.append((plan.menu_id, price, quantity))
+        return changes, sales
+    sign = 1 if operation_type == 'delivery' else -1  # waste is a negative change
+    return [(ingredient_id, sign * units, units * ingredient_costs[ingredient_id]) for ingredient_id, units in lines], []
+
+
+def resolve_operations(location_id, role, operations):
+    '''
+    Validate a batch of {"type": ..., "created_at": ..., <lines field>: [...]} operations made by a staff member
+    with role at the location, the lines as sent to accept-delivery, take-stock and sell-order.
+    A created_at after now, from a tablet clock running ahead, is taken as now.
+    Returns a list of SyncOperation. Raises WrongOperations naming every offending operation, or StockError
+    when the sales of the batch sell more than settings.SYNC_MAX_PORTIONS portions.
+    '''
+    now = timezone.now()
+    oldest = now - timedelta(days=settings.SYNC_MAX_AGE_DAYS)
+    errors = {}
+    parsed = []
+    for index, operation in enumerate(operations):
+        operation_type = operation.get('type') if isinstance(operation, dict) else None
+        if operation_type not in OPERATIONS:
+            errors[index] = 'Missing or wrong type'
+            continue
+        field, roles, _ = OPERATIONS[operation_type]
+        lines = operation.get(field)
+        created_at = parse_created_at(operation.get('created_at'))
+        if roles and role not in roles:
+            errors[index] = f"Staff with wrong role for {operation_type}"
+        elif not lines or type(lines) is not list:
+            errors[index] = f"Missing or wrong {field}"
+        elif created_at is None or created_at < oldest:
+            errors[index] = f"Missing or wrong created_at, or older than {settings.SYNC_MAX_AGE_DAYS} days"
+        else:
+            parsed.append((index, operation_type, min(created_at, now), lines))
+
+    # every sale line sells a portion at least, a longer batch is refused before its lines are read
+    if sum(len(lines) for _, operation_type, _, lines in parsed if operation_type == 'sale') > settings.SYNC_MAX_PORTIONS:
+        raise _too_many_portions()
+    # one query for the ingredients of all the deliveries and waste
+    ingredient_costs = ingredient_costs_of(set().union(*(
+        line_ingredient_ids(lines) for _, operation_type, _, lines in parsed if operation_type != 'sale'
+    )))
+    resolved = []
+    for index, operation_type, created_at, lines in parsed:
+        try:
+            if operation_type == 'sale':
+                lines = resolve_order(location_id, lines)
+            else:
+                lines, _ = resolve_lines(lines, ingredient_costs)
+        except StockError as error:
+            errors[index] = str(error)
+            continue
+        resolved.append(SyncOperation(operation_type, created_at, *_changes(operation_type, lines, ingredient_costs)))
+
+    if errors:
+        raise WrongOperations(errors)
+    if sum(portions for operation in resolved for _, _, portions in operation.sales) > settings.SYNC_MAX_PORTIONS:
+        raise _too_many_portions()
+    return resolved
+
+
+def _shortage(stock, units_by_ingredient):
+    # the NotEnoughStock of the first ingredient the stock cannot cover, or None
+    for ingredient_id, units_change in units_by_ingredient.items():
+        if units_change < 0 and (ingredient_id not in stock or stock[ingredient_id] < (-1) * units_change):
+            return NotEnoughStock(ingredient_id, ingredient_id in stock)
+    return None
+
+
+def _locked_stock(location_id, ingredient_ids):
+    # locked until the commit on PostgreSQL, so a concurrent sale waits for the batch instead of overtaking it,
+    # in ingredient order like every other stock write so the two cannot deadlock
+    return dict(IngredientStock.objects.select_for_update().filter(
+        location_id=location_id, ingredient_id__in=ingredient_ids
+    ).order_by('ingredient_id').values_list('ingredient_id', 'units_available'))
+
+
+def apply_operations(location_id, staff_id, operations):
+    '''
+    Apply the resolved operations in order at the location, in one transaction.
+    Returns the (status, error message) of every operation: APPLIED, or REJECTED when the stock left by
+    the operations before it cannot cover it. Raises StockChanged, and applies nothing, when a concurrent
+    request took the stock the batch was checked against.
+    '''
+    ingredient_ids = {ingredient_id for operation in operations for ingredient_id, _, _ in operation.changes}
+    results = []
+    net_changes = defaultdict(float)
+    stock_audits = []
+    sales_audits = []
+    with transaction.atomic():
+        stock = _locked_stock(location_id, ingredient_ids)
+
+        for operation in operations:
+            units_by_ingredient = defaultdict(float)
+            for ingredient_id, units_change, _ in operation.changes:
+                units_by_ingredient[ingredient_id] += units_change
+            shortage = _shortage(stock, units_by_ingredient)
+            if shortage:
+                results.append((REJECTED, str(shortage)))
+                continue
+
+            for ingredient_id, units_change in units_by_ingredient.items():
+                stock[ingredient_id] = stock.get(ingredient_id, 0.0) + units_change
+                net_changes[ingredient_id] += units_change
+            reason = OPERATIONS[operation.type][2]
+            stock_audits.extend(
+                StockAudit(
+                    reason=reason,
+                    units_change=units_change,
+                    cost=cost,
+                    ingredient_id=ingredient_id,
+                    location_id=location_id,
+                    staff_id=staff_id,
+                    created_at=operation.created_at
+                )
+                for ingredient_id, units_change, cost in operation.changes
+            )
+            sales_audits.extend(
+                SalesAudit(sale_amount=price, location_id=location_id, menu_id=menu_id, staff_id=staff_id, created_at=operation.created_at)
+                for menu_id, price, portions in operation.sales
+                for _ in range(portions)
+            )
+            results.append((APPLIED, None))
+
+        # the decrements are conditional like any sale: SQLite does not lock the rows read above,
+        # a sale committed since then must not be oversold
+        try:
+            decrement_stock(location_id, {
+                ingredient_id: (-1) * units_change for ingredient_id, units_change in net_changes.items() if units_change < 0
+            })
+        except NotEnoughStock:
+            raise StockChanged()
+        bulk_upsert_add(
+            IngredientStock,
+            ['ingredient', 'location'],
+            ['units_available'],
+            [(ingredient_id, location_id, units_change) for ingredient_id, units_change in sorted(net_changes.items()) if units_change > 0]
+        )
+        if stock_audits:
+            save_stock_audits(stock_audits)
+        if sales_audits:
+            save_sales_audits(sales_audits)
+    return results
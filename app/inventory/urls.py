@@ -1,11 +1,21 @@
 from django.urls import path
 
-from . import views
+from . import views, async_views
 
 urlpatterns = [
+    path('staff-token/', views.issue_staff_token, name='issue_staff_token'),
     path('ingredient-stock/accept-delivery/', views.accept_delivery, name='accept_delivery'),
     path('ingredient-stock/take-stock/', views.take_stock, name='take_stock'),
     path('menu/<int:menu_id>/sell/', views.sell_item, name='sell_item'),
+    path('order/sell/', views.sell_order, name='sell_order'),
+    path('sync/', views.sync_operations, name='sync_operations'),
+    path('menu/availability/', views.check_menu_availability, name='check_menu_availability'),
+    path('ingredient-stock/reorder-suggestions/', views.suggest_reorders, name='suggest_reorders'),
     path('inventory-report/', views.generate_inventory_report, name='generate_inventory_report'),
     path('finantial-summary/', views.generate_finantial_summary, name='generate_finantial_summary'),
+    path('finantial-summary/chain/', views.generate_chain_finantial_summary, name='generate_chain_finantial_summary'),
+    path('ledger/stock-audits/', views.list_stock_audits, name='list_stock_audits'),
+    path('ledger/sales-audits/', views.list_sales_audits, name='list_sales_audits'),
+    path('async/inventory-report/', async_views.generate_inventory_report, name='generate_inventory_report_async'),
+    path('async/finantial-summary/', async_views.generate_finantial_summary, name='generate_finantial_summary_async'),
 ]
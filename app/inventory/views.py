@@ -2,196 +2,264 @@
 from rest_framework.decorators import api_view
 from rest_framework import status
 from rest_framework.response import Response
-from inventory.models import Staff, Location, Ingredient, IngredientStock, Menu, RecipeIngredient, StockAudit, SalesAudit
-from django.db import transaction
+from inventory import report_cache
+from inventory.authentication import authorize_staff, authorize_staff_locations, sign_staff_token, staff_role
+from inventory.availability import menu_availability
+from inventory.forecast import reorder_suggestions
+from inventory.idempotency import idempotent
+from inventory.ledger import LEDGERS, MAX_PAGE_SIZE, PAGE_SIZE, WrongCursor, ledger_page
+from inventory.models import Staff, StockAudit
+from inventory.sale_plan import get_sale_plan, portion
+from inventory.reports import INVENTORY_REPORT_HEADER, stream_csv, inventory_report_rows, financial_summary
+from inventory.reports import parse_period, financial_summary_header, financial_summary_row, chain_financial_summaries_by_batch
+from inventory.reports import FINANCIAL_SUMMARY_FIELDS, current_inventory_value
+from inventory.snapshots import EPOCH
+from inventory.stock import StockError, NotEnoughStock, receive_delivery, take_waste, sell_menu, resolve_order, sell_ticket
+from inventory.sync import WrongOperations, resolve_operations, apply_operations
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 import csv
+import io
+import json
 
 
 @api_view(['POST'])
+def issue_staff_token(request):
+    '''
+    Issue a signed staff token to send as "Authorization: Bearer <token>" instead of the staff_id in the body.
+    '''
+    staff = Staff.objects.filter(staff_id=request.data.get('staff_id', -1)).first()
+    if not staff:
+        return Response('Missing/wrong staff_id', status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {'token': sign_staff_token(staff), 'expires_in': settings.STAFF_TOKEN_MAX_AGE},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@idempotent
 def accept_delivery(request):
     request_data = request.data  # could use somthing like marshmallow to validate request json
-    staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).first()
-    # only allowed roles for this action
-    if not staff or staff.role not in ['Chef', 'Back-of-house']:
-        return Response('Missing/wrong staff_id or staff with wrong role', status=status.HTTP_400_BAD_REQUEST)
-
-    # staff can only make this action within a location that they work in
-    location = Location.objects.filter(location_id=request_data.get('location_id', -1)).first()
-    if not location or not location.staff_set.filter(staff_id=staff.staff_id).exists():
-        return Response('Missing location or staff does not work in location', status=status.HTTP_400_BAD_REQUEST)
+    # only allowed roles for this action, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user, ['Chef', 'Back-of-house'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
 
     delivery = request_data.get('delivery')
     if not delivery or type(delivery) is not list:
         return Response('Missing or wrong delivery', status=status.HTTP_400_BAD_REQUEST)
 
-    with transaction.atomic():
-        # This below code executes inside a transaction.
-        for batch in delivery:
-            ingredient = Ingredient.objects.filter(ingredient_id=batch.get('ingredient_id')).first()
-            batch_units = batch.get("units", 0)
-            if not ingredient or batch_units < 0.0:
-                # We should log this, or maybe return a bad request since the ingredient doesn't belong to our catalog
-                return Response(
-                    'Error: Ingredient not in catalog or negative units',
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            ingredient_stock, created = IngredientStock.objects.get_or_create(ingredient=ingredient, location=location)
-            if created:
-                ingredient_stock.units_available = batch_units
-            else:
-                ingredient_stock.units_available += batch_units
-            ingredient_stock.save()
-
-            stock_audit = StockAudit(
-                reason='delivery',
-                units_change=batch_units,
-                cost=batch_units * ingredient.cost,
-                ingredient=ingredient,
-                location=location,
-                staff=staff
-            )
-            stock_audit.save()
+    try:
+        receive_delivery(location_id, staff_id, delivery)
+    except StockError as error:
+        # We should log this, or maybe return a bad request since the ingredient doesn't belong to our catalog
+        return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
 
     return Response('Successful process of delivery', status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
+@idempotent
 def take_stock(request):
     request_data = request.data  # could use somthing like marshmallow to validate request json
-    staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).first()
     # No need to check for staff roles since according to specs all staff can do this action
-    if not staff:
-        return Response('Missing/wrong staff_id', status=status.HTTP_400_BAD_REQUEST)
-
-    # staff can only make this action within a location that they work in
-    location = Location.objects.filter(location_id=request_data.get('location_id', -1)).first()
-    if not location or not location.staff_set.filter(staff_id=staff.staff_id).exists():
-        return Response('Missing location or staff does not work in location', status=status.HTTP_400_BAD_REQUEST)
+    # but only within a location that they work in
+    staff_id, location_id, error = authorize_staff(request_data, request.user)
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
 
     delivery = request_data.get('take_stock')
     if not delivery or type(delivery) is not list:
         return Response('Missing or wrong take_stock', status=status.HTTP_400_BAD_REQUEST)
 
-    with transaction.atomic():
-        # This below code executes inside a transaction.
-        for batch in delivery:
-            ingredient = Ingredient.objects.filter(ingredient_id=batch.get('ingredient_id')).first()
-            batch_units = batch.get("units", 0)
-            if not ingredient or batch_units < 0.0:
-                # We should log this, or maybe return a bad request since the ingredient doesn't belong to our catalog
-                return Response(
-                    'Error: Ingredient not in catalog or negative units',
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            ingredient_stock = IngredientStock.objects.filter(ingredient=ingredient, location=location).first()
-            if not ingredient_stock:
-                # Log this and trigger some alert
-                return Response(
-                    'Error: Location did not have ingredient in the stock records thus it cannot be decreased',
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if ingredient_stock.units_available < batch_units:
-                return Response(
-                    'Error: We cannot remove more units than we have on records',
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            ingredient_stock.units_available -= batch_units
-            ingredient_stock.save()
-            stock_audit = StockAudit(
-                reason='waste',
-                units_change=(-1) * batch_units,  # a negative change
-                cost=batch_units * ingredient.cost,
-                ingredient=ingredient,
-                location=location,
-                staff=staff
+    try:
+        take_waste(location_id, staff_id, delivery)
+    except NotEnoughStock as error:
+        if not error.in_records:
+            # Log this and trigger some alert
+            return Response(
+                'Error: Location did not have ingredient in the stock records thus it cannot be decreased',
+                status=status.HTTP_400_BAD_REQUEST
             )
-            stock_audit.save()
+        return Response(
+            'Error: We cannot remove more units than we have on records',
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except StockError as error:
+        # We should log this, or maybe return a bad request since the ingredient doesn't belong to our catalog
+        return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
 
     return Response('Successful process of take stock', status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
+@idempotent
 def sell_item(request, menu_id):
     request_data = request.data  # could use somthing like marshmallow to validate request json
-    staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).first()
-    # only allowed roles for this action
-    if not staff or staff.role not in ['Front-of-house']:
-        return Response('Missing/wrong staff_id or staff with wrong role', status=status.HTTP_400_BAD_REQUEST)
-
-    # staff can only make this action within a location that they work in
-    location = Location.objects.filter(location_id=request_data.get('location_id', -1)).first()
-    if not location or not location.staff_set.filter(staff_id=staff.staff_id).exists():
-        return Response('Missing location or staff does not work in location', status=status.HTTP_400_BAD_REQUEST)
-
-    menu = Menu.objects.filter(menu_id=menu_id).first()
-    if not menu or not menu.location.location_id == location.location_id:
+    # only allowed roles for this action, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user, ['Front-of-house'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    plan = get_sale_plan(menu_id)
+    if not plan or not plan.location_id == location_id:
         return Response('Missing menu_id or menu not available in location', status=status.HTTP_400_BAD_REQUEST)
 
-    recipe_ingredients = RecipeIngredient.objects.filter(recipe=menu.recipe)
-    with transaction.atomic():
-        for recipe_ingredient in recipe_ingredients:
-            ingredient_stock = IngredientStock.objects.filter(
-                ingredient=recipe_ingredient.ingredient, location=location
-            ).first()
-            if not ingredient_stock or ingredient_stock.units_available < recipe_ingredient.quantity:
-                return Response('Not enough ingredients to sell menu item', status=status.HTTP_400_BAD_REQUEST)
-
-            ingredient_stock.units_available -= recipe_ingredient.quantity
-            ingredient_stock.save()
-            stock_audit = StockAudit(
-                reason='sale',
-                units_change=(-1) * (recipe_ingredient.quantity),  # a negative change
-                cost=(recipe_ingredient.quantity) * (recipe_ingredient.ingredient.cost),
-                ingredient=recipe_ingredient.ingredient,
-                location=location,
-                staff=staff
-            )
-            stock_audit.save()
+    # modifier_option_ids chosen for the menu item, i.e. extra toppings
+    option_ids = request_data.get('options', [])
+    if not isinstance(option_ids, list) or portion(plan, option_ids) is None:
+        return Response('Wrong modifier options for menu item', status=status.HTTP_400_BAD_REQUEST)
 
-        sale_audit = SalesAudit(sale_amount=menu.price, location=location, menu=menu, staff=staff)
-        sale_audit.save()
+    try:
+        sell_menu(location_id, staff_id, plan, option_ids)
+    except NotEnoughStock:
+        return Response('Not enough ingredients to sell menu item', status=status.HTTP_400_BAD_REQUEST)
 
     return Response('Successful menu item sale', status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
-def generate_inventory_report(request):
-    request_data = request.data  # could use something like marshmallow to validate request json
-    staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).first()
-    # only allowed roles for this action
-    if not staff or staff.role not in ['Manager']:
-        return Response('Missing/wrong staff_id or staff with wrong role', status=status.HTTP_400_BAD_REQUEST)
+@idempotent
+def sell_order(request):
+    request_data = request.data  # could use somthing like marshmallow to validate request json
+    # only allowed roles for this action, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user, ['Front-of-house'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
 
-    # staff can only make this action within a location that they work in
-    location = Location.objects.filter(location_id=request_data.get('location_id', -1)).first()
-    if not location or not location.staff_set.filter(staff_id=staff.staff_id).exists():
-        return Response('Missing location or staff does not work in location', status=status.HTTP_400_BAD_REQUEST)
+    items = request_data.get('items')
+    if not items or type(items) is not list:
+        return Response('Missing or wrong items', status=status.HTTP_400_BAD_REQUEST)
 
-    tz = timezone.get_current_timezone()
-    start_date = datetime.strptime(request_data.get('start_date'), '%d/%m/%Y')
-    timezone_start_date = timezone.make_aware(start_date, tz, True)
-    end_date = datetime.strptime(request_data.get('end_date'), '%d/%m/%Y')
-    timezone_end_date = timezone.make_aware(end_date, tz, True)
+    try:
+        sell_ticket(location_id, staff_id, resolve_order(location_id, items))
+    except NotEnoughStock:
+        return Response('Not enough ingredients to sell order', status=status.HTTP_400_BAD_REQUEST)
+    except StockError as error:
+        return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
 
-    stock_audit = StockAudit.objects.filter(location=location, created_at__range=(timezone_start_date, timezone_end_date))
+    return Response('Successful order sale', status=status.HTTP_200_OK)
 
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': f"attachment; filename=inventory_report_{int(round(datetime.now().timestamp()))}.csv"},
+
+@api_view(['POST'])
+@idempotent
+def sync_operations(request):
+    '''
+    Apply a batch of the deliveries, waste and sales made on a tablet while it was offline, in order and with
+    the time they were made, in one transaction. Returns the result of every operation.
+    '''
+    request_data = request.data  # could use somthing like marshmallow to validate request json
+    # the role is checked for each operation, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user)
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    operations = request_data.get('operations')
+    if not operations or type(operations) is not list or len(operations) > settings.SYNC_MAX_OPERATIONS:
+        return Response(f"Missing or wrong operations (at most {settings.SYNC_MAX_OPERATIONS})", status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        operations = resolve_operations(location_id, staff_role(staff_id, request.user), operations)
+    except WrongOperations as error:
+        # nothing is applied, the tablet has to fix or drop the wrong operations
+        return Response(
+            {'errors': [{'index': index, 'error': message} for index, message in sorted(error.errors.items())]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except StockError as error:
+        return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'results': [
+            {'index': index, 'status': result, 'error': message}
+            for index, (result, message) in enumerate(apply_operations(location_id, staff_id, operations))
+        ]
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def check_menu_availability(request):
+    '''
+    How many portions of every menu item of the location can be made with the current stock.
+    portions is null for a menu item without ingredients.
+    '''
+    request_data = request.data  # could use somthing like marshmallow to validate request json
+    # all staff can check it, within a location that they work in
+    _, location_id, error = authorize_staff(request_data, request.user)
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        [{'menu_id': menu_id, 'portions': portions} for menu_id, portions in menu_availability(location_id)],
+        status=status.HTTP_200_OK
     )
 
-    writer = csv.writer(response)
-    writer.writerow(['stock_audit_id', 'reason', 'cost', 'ingredient_id', 'staff_id', 'created_at'])
-    stock_audit_vals = stock_audit.values_list('stock_audit_id', 'reason', 'cost', 'ingredient_id', 'staff_id', 'created_at')
-    for stock_audit_row in stock_audit_vals:
-        writer.writerow(stock_audit_row)
+
+@api_view(['POST'])
+def suggest_reorders(request):
+    '''
+    The ingredients of the location that will run out before a delivery ordered today covers
+    REORDER_COVER_DAYS, with the units to order, from their recent sales and waste.
+    '''
+    request_data = request.data  # could use somthing like marshmallow to validate request json
+    # only allowed roles for this action, within a location that the staff works in
+    _, location_id, error = authorize_staff(request_data, request.user, ['Manager', 'Chef'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response([
+        {
+            'ingredient_id': line.ingredient_id,
+            'units_available': line.units_available,
+            'daily_rate': line.daily_rate,
+            'days_until_stockout': line.days_until_stockout,
+            'suggested_units': line.suggested_units,
+            'suggested_cost': line.suggested_cost,
+        }
+        for line in reorder_suggestions([location_id])
+    ], status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def generate_inventory_report(request):
+    request_data = request.data  # could use something like marshmallow to validate request json
+    # only allowed roles for this action, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user, ['Manager'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    timezone_start_date, timezone_end_date = parse_period(request_data)
+
+    filename = f"inventory_report_{int(round(datetime.now().timestamp()))}.csv"
+
+    # The audits of a closed period do not change, its report is computed once and then served from the cache
+    closed = report_cache.is_closed(timezone_end_date)
+    cached = closed and report_cache.get('inventory_report', location_id, timezone_start_date, timezone_end_date)
+    if not cached:
+        stock_audit = StockAudit.objects.filter(location_id=location_id, created_at__range=(timezone_start_date, timezone_end_date))
+
+        # Rows are read with a chunked iterator and sent as they are rendered, so memory
+        # stays flat whatever the date range
+        chunks = stream_csv(INVENTORY_REPORT_HEADER, inventory_report_rows(stock_audit))
+        if closed:
+            # a report small enough to be cached is sent whole, with its ETag from the first download on
+            cached, chunks = report_cache.collect('inventory_report', location_id, timezone_start_date, timezone_end_date, chunks)
+    if cached:
+        if report_cache.not_modified(request, cached.etag):
+            return HttpResponseNotModified(headers={'ETag': cached.etag})
+        return HttpResponse(
+            cached.content, content_type='text/csv', headers={'Content-Disposition': f"attachment; filename={filename}", 'ETag': cached.etag}
+        )
+
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='text/csv',
+        headers={'Content-Disposition': f"attachment; filename={filename}"},
+    )
 
     return response
 
@@ -199,54 +267,110 @@ def generate_inventory_report(request):
 @api_view(['POST'])
 def generate_finantial_summary(request):
     request_data = request.data  # could use something like marshmallow to validate request json
-    staff = Staff.objects.filter(staff_id=request_data.get('staff_id', -1)).first()
-    # only allowed roles for this action
-    if not staff or staff.role not in ['Manager']:
-        return Response('Missing/wrong staff_id or staff with wrong role', status=status.HTTP_400_BAD_REQUEST)
-
-    # staff can only make this action within a location that they work in
-    location = Location.objects.filter(location_id=request_data.get('location_id', -1)).first()
-    if not location or not location.staff_set.filter(staff_id=staff.staff_id).exists():
-        return Response('Missing location or staff does not work in location', status=status.HTTP_400_BAD_REQUEST)
-
-    tz = timezone.get_current_timezone()
-    start_date = datetime.strptime(request_data.get('start_date'), '%d/%m/%Y')
-    timezone_start_date = timezone.make_aware(start_date, tz, True)
-    end_date = datetime.strptime(request_data.get('end_date'), '%d/%m/%Y')
-    timezone_end_date = timezone.make_aware(end_date, tz, True)
-
-    stock_audit = StockAudit.objects.filter(location=location, created_at__range=(timezone_start_date, timezone_end_date))
-    sales_audit = SalesAudit.objects.filter(location=location, created_at__range=(timezone_start_date, timezone_end_date))
-    ingredient_stock = IngredientStock.objects.filter(location=location)
-    total_revenue = sales_audit.aggregate(Sum('sale_amount'))
-    total_deliveries_cost = stock_audit.filter(reason='delivery').aggregate(Sum('cost'))
-    total_waste_cost = stock_audit.filter(reason='waste').aggregate(Sum('cost'))
-    current_inventory_value = 0
-    for ingredient in ingredient_stock:
-        current_inventory_value += ingredient.units_available * (ingredient.ingredient.cost)
-
-    response = HttpResponse(
+    # only allowed roles for this action, within a location that the staff works in
+    staff_id, location_id, error = authorize_staff(request_data, request.user, ['Manager'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    timezone_start_date, timezone_end_date = parse_period(request_data)
+
+    # The figures of a closed period are cached, only the current inventory value is read again.
+    # The inventory value at the end of the period depends on all the audits before it.
+    closed = report_cache.is_closed(timezone_end_date)
+    cached = closed and report_cache.get('financial_summary', location_id, timezone_start_date, timezone_end_date, since=EPOCH)
+    if cached:
+        summary = {**json.loads(cached.content), 'current_inventory_value': current_inventory_value(location_id)}
+    else:
+        computed_at = timezone.now()
+        summary = financial_summary(location_id, timezone_start_date, timezone_end_date)
+        if closed:
+            figures = {field: summary[field] for field in FINANCIAL_SUMMARY_FIELDS if field != 'current_inventory_value'}
+            report_cache.put('financial_summary', location_id, timezone_start_date, timezone_end_date, json.dumps(figures), computed_at)
+
+    content = io.StringIO()
+    writer = csv.writer(content)
+    writer.writerow(financial_summary_header())
+    writer.writerow(financial_summary_row(location_id, request_data, summary))
+    etag = report_cache.content_etag(content.getvalue())
+    if report_cache.not_modified(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    return HttpResponse(
+        content.getvalue(),
         content_type='text/csv',
-        headers={'Content-Disposition': f"attachment; filename=finantial_summary_{int(round(datetime.now().timestamp()))}.csv"},
+        headers={'Content-Disposition': f"attachment; filename=finantial_summary_{int(round(datetime.now().timestamp()))}.csv", 'ETag': etag},
     )
 
-    writer = csv.writer(response)
-    writer.writerow([
-        'location_id',
-        'period',
-        'total revenue from sales (in period)',
-        'total deliveries cost (in period)',
-        'total waste cost (in period)',
-        f"current inventory value ({datetime.today().strftime('%d-%m-%Y')})"]
+
+@api_view(['POST'])
+def generate_chain_finantial_summary(request):
+    '''
+    The financial summary of several locations in one CSV, a row per location: those listed in location_ids
+    or all the locations the manager works in. The rows are sent as each batch of locations is computed.
+    '''
+    request_data = request.data  # could use something like marshmallow to validate request json
+    # only allowed roles for this action, within locations that the staff works in
+    staff_id, location_ids, error = authorize_staff_locations(request_data, request.user, ['Manager'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    timezone_start_date, timezone_end_date = parse_period(request_data)
+
+    rows = (
+        financial_summary_row(location_id, request_data, summary)
+        for location_id, summary in chain_financial_summaries_by_batch(location_ids, timezone_start_date, timezone_end_date)
+    )
+    return StreamingHttpResponse(
+        stream_csv(financial_summary_header(), rows, chunk_rows=1),
+        content_type='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=chain_finantial_summary_{int(round(datetime.now().timestamp()))}.csv"},
     )
 
-    writer.writerow([
-        location.location_id,
-        f"{request_data.get('start_date')} to {request_data.get('end_date')}",
-        total_revenue['sale_amount__sum'],
-        total_deliveries_cost['cost__sum'],
-        total_waste_cost['cost__sum'],
-        current_inventory_value
-    ])
 
-    return response
+def audit_ledger_page(request, kind):
+    request_data = request.data  # could use something like marshmallow to validate request json
+    # only allowed roles for this action, within a location that the staff works in
+    _, location_id, error = authorize_staff(request_data, request.user, ['Manager'])
+    if error:
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = request_data.get('limit', PAGE_SIZE)
+    if type(limit) is not int or not 0 < limit <= MAX_PAGE_SIZE:
+        return Response(f"limit must be between 1 and {MAX_PAGE_SIZE}", status=status.HTTP_400_BAD_REQUEST)
+    filters = {name: request_data[name] for name in LEDGERS[kind].filters if name in request_data}
+    for name, value in filters.items():
+        if not (value in StockAudit.StockAuditReason.values if name == 'reason' else type(value) is int):
+            return Response(f"Wrong {name}", status=status.HTTP_400_BAD_REQUEST)
+    since = None
+    if request_data.get('start_date'):
+        try:
+            since = timezone.make_aware(datetime.strptime(request_data['start_date'], '%d/%m/%Y'), timezone.get_current_timezone())
+        except (TypeError, ValueError):
+            return Response('Wrong start_date', status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = ledger_page(kind, location_id, filters, request_data.get('cursor'), since, limit)
+    except WrongCursor:
+        return Response('Wrong cursor', status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'results': page.movements,
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_more,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def list_stock_audits(request):
+    '''
+    A page of the stock movements of the location, optionally of one reason or ingredient, after a cursor.
+    '''
+    return audit_ledger_page(request, 'stock')
+
+
+@api_view(['POST'])
+def list_sales_audits(request):
+    '''
+    A page of the sales of the location, optionally of one menu item, after a cursor.
+    '''
+    return audit_ledger_page(request, 'sales')
@@ -0,0 +1,243 @@
+'''
+Per route request count, latency histogram, SQL query count and SQL time, served as Prometheus text at /metrics/.
+
+Each worker process adds up its requests in memory and writes them every METRICS_FLUSH_INTERVAL seconds
+to its own file in METRICS_DIR, so /metrics/ can add up the figures of all the workers of the host,
+whichever worker serves it. The files of stopped workers are kept, Prometheus counters must not go down.
+'''
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class MetricsStore:
+    '''
+    The metrics of this process, written to METRICS_DIR/metrics-<pid>.json.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)  # (route, method, status) -> count
+        self.latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])  # route -> bucket counts, +Inf, sum
+        self.queries = defaultdict(int)  # route -> SQL queries
+        self.query_seconds = defaultdict(float)  # route -> SQL time
+        self.flushed_at = 0.0
+
+    def record(self, route, method, status, elapsed, queries, query_seconds):
+        with self.lock:
+            self.requests[(route, method, str(status))] += 1
+            histogram = self.latency[route]
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += elapsed
+            self.queries[route] += queries
+            self.query_seconds[route] += query_seconds
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            data = {
+                'requests': [[*labels, count] for labels, count in self.requests.items()],
+                'latency': [[route, histogram] for route, histogram in self.latency.items()],
+                'queries': [[route, count] for route, count in self.queries.items()],
+                'query_seconds': [[route, seconds] for route, seconds in self.query_seconds.items()],
+            }
+            self.flushed_at = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f"metrics-{os.getpid()}.json")
+        fd, temporary_path = tempfile.mkstemp(dir=settings.METRICS_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'w') as temporary:
+            json.dump(data, temporary)
+        os.replace(temporary_path, path)
+
+
+store = MetricsStore()
+
+
+def collect():
+    '''
+    Add up the metrics files of all the workers.
+    '''
+    requests = defaultdict(int)
+    latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+    queries = defaultdict(int)
+    query_seconds = defaultdict(float)
+    for path in glob.glob(os.path.join(glob.escape(settings.METRICS_DIR), 'metrics-*.json')):
+        try:
+            with open(path) as metrics_file:
+                data = json.load(metrics_file)
+        except (OSError, ValueError):
+            continue
+        for route, method, status, count in data['requests']:
+            requests[(route, method, status)] += count
+        for route, histogram in data['latency']:
+            latency[route] = [total + value for total, value in zip(latency[route], histogram)]
+        for route, count in data['queries']:
+            queries[route] += count
+        for route, seconds in data['query_seconds']:
+            query_seconds[route] += seconds
+    return requests, latency, queries, query_seconds
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    requests, latency, queries, query_seconds = collect()
+    lines = [
+        '# HELP http_requests_total Requests by route, method and status.',
+        '# TYPE http_requests_total counter',
+    ]
+    for (route, method, status), count in sorted(requests.items()):
+        lines.append(f'http_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Request latency by route.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for route, histogram in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{route="{_label(route)}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{route="{_label(route)}"}} {histogram[-1]}')
+        lines.append(f'http_request_duration_seconds_count{{route="{_label(route)}"}} {cumulative}')
+
+    lines += [
+        '# HELP db_queries_total SQL queries run by the requests of a route.',
+        '# TYPE db_queries_total counter',
+    ]
+    for route, count in sorted(queries.items()):
+        lines.append(f'db_queries_total{{route="{_label(route)}"}} {count}')
+
+    lines += [
+        '# HELP db_query_duration_seconds_total Time spent in SQL queries by the requests of a route.',
+        '# TYPE db_query_duration_seconds_total counter',
+    ]
+    for route, seconds in sorted(query_seconds.items()):
+        lines.append(f'db_query_duration_seconds_total{{route="{_label(route)}"}} {seconds}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    '''
+    The metrics of all the workers, in the Prometheus text format.
+    '''
+    store.flush()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryCounter:
+    '''
+    Database execute wrapper counting the queries of a request and the time spent in them.
+    '''
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def install(self):
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class MetricsMiddleware:
+    '''
+    Record the metrics of every request. The queries of a streaming response run while it is sent,
+    so its request is recorded when the streaming ends.
+    In an async request, the queries are counted in the thread the request runs its sync_to_async calls in.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        counter.install()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            counter.uninstall()
+            raise
+        if response.streaming:
+            response.streaming_content = self.streaming(response.streaming_content, request, response, counter, started)
+        else:
+            counter.uninstall()
+            self.record(request, response, counter, started)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        await sync_to_async(counter.install)()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(counter.uninstall)()
+            raise
+        if response.streaming and response.is_async:
+            response.streaming_content = self.astreaming(response.streaming_content, request, response, counter, started)
+        else:
+            await sync_to_async(counter.uninstall)()
+            self.record(request, response, counter, started)
+        return response
+
+    def streaming(self, content, request, response, counter, started):
+        try:
+            yield from content
+        finally:
+            counter.uninstall()
+            self.record(request, response, counter, started)
+
+    async def astreaming(self, content, request, response, counter, started):
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            await sync_to_async(counter.uninstall)()
+            self.record(request, response, counter, started)
+
+    def record(self, request, response, counter, started):
+        match = request.resolver_match
+        route = match.route if match else UNMATCHED_ROUTE
+        store.record(route, request.method, response.status_code, time.perf_counter() - started, counter.queries, counter.seconds)
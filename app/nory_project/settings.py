@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'nory_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,15 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        "TEST": {
+            # On SQLite the test database is a file, not in memory, so the multi-threaded tests (stock contention,
+            # concurrent retries...) can share it and run in the build pipeline too
+            "NAME": os.environ.get(
+                "SQL_TEST_DATABASE",
+                os.path.join(tempfile.gettempdir(), 'nory-test.sqlite3')
+                if os.environ.get("SQL_ENGINE", "django.db.backends.sqlite3") == "django.db.backends.sqlite3" else None
+            ),
+        },
     }
 }
 
@@ -133,3 +144,83 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Inventory
+
+# Seconds a worker process keeps a compiled menu sale plan or menu availability matrix. Changes made through
+# the ORM invalidate them in the process that made them straight away, this bounds staleness in the other processes.
+SALE_PLAN_CACHE_TTL = int(os.environ.get("SALE_PLAN_CACHE_TTL", 300))
+
+# Portions of a menu item a ticket line (or a synced sale line) can sell at most, and portions a whole ticket
+# can sell at most: one sales audit is written per portion
+ORDER_MAX_QUANTITY = int(os.environ.get("ORDER_MAX_QUANTITY", 100))
+ORDER_MAX_PORTIONS = int(os.environ.get("ORDER_MAX_PORTIONS", 500))
+
+# Staff tokens: seconds a token is valid for, and seconds between reloads of the revoked tokens list in each process
+STAFF_TOKEN_MAX_AGE = int(os.environ.get("STAFF_TOKEN_MAX_AGE", 12 * 60 * 60))
+STAFF_TOKEN_REVOCATION_REFRESH = int(os.environ.get("STAFF_TOKEN_REVOCATION_REFRESH", 30))
+
+# Seconds between stock snapshots, the stock at any time is rebuilt from the latest snapshot before it
+# and at most this long of stock audits. Changing it only affects the snapshots taken afterwards.
+STOCK_SNAPSHOT_INTERVAL = int(os.environ.get("STOCK_SNAPSHOT_INTERVAL", 24 * 60 * 60))
+
+# Write-behind audits: stock movements append their audits to a local journal file and the
+# flush_audit_journal command inserts them in batches, see inventory.journal
+AUDIT_WRITE_BEHIND = bool(int(os.environ.get("AUDIT_WRITE_BEHIND", 0)))
+AUDIT_JOURNAL_PATH = os.environ.get("AUDIT_JOURNAL_PATH", os.path.join(BASE_DIR, 'audit-journal.jsonl'))
+
+# Per route request and SQL metrics, served at /metrics/. Each worker writes its figures to METRICS_DIR
+# every METRICS_FLUSH_INTERVAL seconds, the workers of a host must share the directory.
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), 'nory-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+
+# Reorder suggestions: days a delivery takes to arrive, and days of consumption it should cover
+REORDER_LEAD_DAYS = float(os.environ.get("REORDER_LEAD_DAYS", 2))
+REORDER_COVER_DAYS = float(os.environ.get("REORDER_COVER_DAYS", 7))
+
+# Chain-wide financial summary: locations summarized by the same grouped queries, and threads (each with
+# its own database connection) computing the batches at the same time
+CHAIN_SUMMARY_BATCH_SIZE = int(os.environ.get("CHAIN_SUMMARY_BATCH_SIZE", 20))
+CHAIN_SUMMARY_WORKERS = int(os.environ.get("CHAIN_SUMMARY_WORKERS", 4))
+
+# Report results over closed periods (see inventory.report_cache): cached in the REPORT_CACHE_ALIAS cache for
+# REPORT_CACHE_TIMEOUT seconds, reports larger than REPORT_CACHE_MAX_BYTES are not cached. The default in-memory
+# cache of each worker evicts its least recently used reports beyond REPORT_CACHE_MAX_ENTRIES, set
+# REPORT_CACHE_BACKEND and REPORT_CACHE_LOCATION to share one cache between workers (i.e. a directory or Redis).
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_CACHE_TIMEOUT = int(os.environ.get("REPORT_CACHE_TIMEOUT", 7 * 24 * 60 * 60))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", 1024 * 1024))
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", 256))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    REPORT_CACHE_ALIAS: {
+        "BACKEND": os.environ.get("REPORT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("REPORT_CACHE_LOCATION", "reports"),
+        "TIMEOUT": REPORT_CACHE_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": REPORT_CACHE_MAX_ENTRIES},
+    },
+}
+
+# PostgreSQL audit partitions (see inventory.partitions): months created ahead by manage_audit_partitions,
+# and months of audits kept, older months are detached (0 keeps them all)
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.environ.get("AUDIT_PARTITION_MONTHS_AHEAD", 3))
+AUDIT_RETENTION_MONTHS = int(os.environ.get("AUDIT_RETENTION_MONTHS", 0))
+
+# Seconds the response to a request sent with an Idempotency-Key is kept to be replayed to its retries
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Offline sync (see inventory.sync): operations per batch, portions the sales of a batch can sell, and days
+# an operation can be queued on a tablet for
+SYNC_MAX_OPERATIONS = int(os.environ.get("SYNC_MAX_OPERATIONS", 1000))
+SYNC_MAX_PORTIONS = int(os.environ.get("SYNC_MAX_PORTIONS", 5000))
+SYNC_MAX_AGE_DAYS = int(os.environ.get("SYNC_MAX_AGE_DAYS", 7))
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'inventory.authentication.StaffTokenAuthentication',
+    ],
+}
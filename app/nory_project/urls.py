@@ -17,6 +17,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 
+from nory_project.metrics import metrics
+
 
 def ping(request):
     '''
@@ -28,5 +30,6 @@ def ping(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('ping/', ping, name='ping'),
+    path('metrics/', metrics, name='metrics'),
     path('inventory/', include('inventory.urls')),
 ]
@@ -0,0 +1,39 @@
+import datetime
+
+from django.contrib.auth.models import User
+
+from inventory.models import Location, Staff, Ingredient, Recipe, RecipeIngredient, Menu
+
+
+def create_location(name='Green House'):
+    return Location.objects.create(name=name, address=f"{name} street")
+
+
+def create_staff(staff_id, role, *locations):
+    user = User.objects.create(username=f"staff_{staff_id}", is_active=False)
+    staff = Staff.objects.create(
+        staff_id=staff_id,
+        user=user,
+        name=f"Staff {staff_id}",
+        dob=datetime.date(1990, 1, 1),
+        role=role,
+        iban=f"GB{staff_id:020d}",
+        bic='AAPUGB21'
+    )
+    staff.location.add(*locations)
+    return staff
+
+
+def create_ingredients(count, cost=2.0):
+    return Ingredient.objects.bulk_create([
+        Ingredient(name=f"Ingredient {index}", unit=Ingredient.IngredientUnit.LITER, cost=cost)
+        for index in range(count)
+    ])
+
+
+def create_menu(location, ingredients, quantity=1.0, price=10.0, name='The Kinks'):
+    recipe = Recipe.objects.create(name=name)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=quantity) for ingredient in ingredients
+    ])
+    return Menu.objects.create(recipe=recipe, location=location, price=price)
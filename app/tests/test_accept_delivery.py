@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.models import IngredientStock, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+
+class AcceptDeliveryTests(APITestCase):
+    url = '/inventory/ingredient-stock/accept-delivery/'
+
+    def setUp(self):
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.CHEF, self.location)
+        self.ingredients = create_ingredients(100)
+
+    def deliver(self, delivery):
+        return self.client.post(self.url, {
+            'staff_id': self.staff.staff_id,
+            'location_id': self.location.location_id,
+            'delivery': delivery
+        }, format='json')
+
+    def test_delivery_adds_to_existing_stock(self):
+        ingredient = self.ingredients[0]
+        IngredientStock.objects.create(ingredient=ingredient, location=self.location, units_available=5)
+
+        response = self.deliver([
+            {'ingredient_id': ingredient.ingredient_id, 'units': 10},
+            {'ingredient_id': ingredient.ingredient_id, 'units': 2.5},
+            {'ingredient_id': self.ingredients[1].ingredient_id, 'units': 4},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stock = dict(IngredientStock.objects.values_list('ingredient_id', 'units_available'))
+        self.assertEqual(stock, {ingredient.ingredient_id: 17.5, self.ingredients[1].ingredient_id: 4})
+        self.assertEqual(StockAudit.objects.filter(reason='delivery').count(), 3)
+        self.assertEqual(StockAudit.objects.get(units_change=2.5).cost, 5.0)
+
+    def test_wrong_lines_are_named_and_nothing_is_applied(self):
+        response = self.deliver([
+            {'ingredient_id': self.ingredients[0].ingredient_id, 'units': 1},
+            {'ingredient_id': -1, 'units': 1},
+            {'ingredient_id': self.ingredients[1].ingredient_id, 'units': -3},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, 'Error: Ingredient not in catalog or negative units (lines 1, 2)')
+        self.assertFalse(IngredientStock.objects.exists())
+        self.assertFalse(StockAudit.objects.exists())
+
+    def test_query_count_does_not_grow_with_delivery_lines(self):
+        query_counts = []
+        for size in (1, 100):
+            delivery = [{'ingredient_id': ingredient.ingredient_id, 'units': 1} for ingredient in self.ingredients[:size]]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.deliver(delivery)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(IngredientStock.objects.count(), 100)
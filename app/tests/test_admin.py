@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from inventory.db import estimated_count
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+START = datetime(2023, 11, 28, 12, tzinfo=timezone.utc)
+
+
+class AuditAdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.locations = [create_location(), create_location('Big Pub')]
+        self.staff = [create_staff(index + 1, Staff.StaffRoles.CHEF, location) for index, location in enumerate(self.locations)]
+        self.ingredients = create_ingredients(5)
+        self.menu = create_menu(self.locations[0], self.ingredients)
+
+    def add_audits(self, count, start=START):
+        StockAudit.objects.bulk_create([
+            StockAudit(
+                reason=StockAudit.StockAuditReason.DELIVERY, units_change=1.0, cost=2.0, ingredient=self.ingredients[index % 5],
+                location=self.locations[index % 2], staff=self.staff[index % 2], created_at=start + timedelta(days=index)
+            )
+            for index in range(count)
+        ])
+        SalesAudit.objects.bulk_create([
+            SalesAudit(sale_amount=10.0, location=self.locations[0], menu=self.menu, staff=self.staff[0], created_at=start + timedelta(days=index))
+            for index in range(count)
+        ])
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_the_audits(self):
+        for url in ('/admin/inventory/stockaudit/', '/admin/inventory/salesaudit/'):
+            self.add_audits(5)
+            few = self.changelist_queries(url)
+            self.add_audits(60, START + timedelta(days=10))
+            self.assertEqual(self.changelist_queries(url), few)
+
+    def test_date_hierarchy_covers_the_first_to_the_last_audit(self):
+        self.add_audits(70)
+
+        response = self.client.get('/admin/inventory/stockaudit/')
+        self.assertContains(response, '?created_at__year=2023')
+        self.assertContains(response, '?created_at__year=2024')
+
+        response = self.client.get('/admin/inventory/stockaudit/?created_at__year=2024')
+        self.assertContains(response, 'created_at__month=1')
+        self.assertContains(response, 'created_at__month=2')
+        self.assertNotContains(response, 'created_at__month=3')
+
+        response = self.client.get('/admin/inventory/stockaudit/?created_at__year=2023&created_at__month=12')
+        self.assertContains(response, 'created_at__day=31')
+        self.assertEqual(len(response.context['cl'].result_list), 31)
+
+    def test_counts_are_bounded(self):
+        self.add_audits(8)
+
+        with mock.patch('inventory.admin.EXACT_COUNT_LIMIT', 3):
+            response = self.client.get(f"/admin/inventory/stockaudit/?location__location_id__exact={self.locations[0].location_id}")
+            self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(f"/admin/inventory/stockaudit/?location__location_id__exact={self.locations[0].location_id}")
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+    def test_audits_are_not_added_here(self):
+        self.assertEqual(self.client.get('/admin/inventory/stockaudit/add/').status_code, 403)
+
+    def test_audits_are_read_only_here(self):
+        self.add_audits(1)
+        audit = StockAudit.objects.get()
+
+        response = self.client.get(f"/admin/inventory/stockaudit/{audit.pk}/change/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['has_change_permission'])
+        response = self.client.post(f"/admin/inventory/stockaudit/{audit.pk}/change/", {'units_change': 100.0})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(f"/admin/inventory/stockaudit/{audit.pk}/delete/").status_code, 403)
+        self.assertEqual(StockAudit.objects.get().units_change, 1.0)
+        self.assertNotContains(self.client.get('/admin/inventory/stockaudit/'), 'delete_selected')
+
+    def test_stock_autocomplete(self):
+        IngredientStock.objects.create(ingredient=self.ingredients[0], location=self.locations[0], units_available=3)
+
+        self.assertEqual(self.changelist_queries('/admin/inventory/ingredientstock/'), self.changelist_queries('/admin/inventory/ingredientstock/'))
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'inventory', 'model_name': 'ingredientstock', 'field_name': 'ingredient', 'term': 'Ingredient 3'
+        })
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(self.ingredients[3].ingredient_id)])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Planner statistics are only read on PostgreSQL')
+    def test_estimated_count(self):
+        self.add_audits(40)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE inventory_stock_audit')
+
+        self.assertEqual(estimated_count(StockAudit), 40)
+        with mock.patch('inventory.admin.EXACT_COUNT_LIMIT', 10):
+            self.assertEqual(self.client.get('/admin/inventory/stockaudit/').context['cl'].result_count, 40)
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.authentication import sign_staff_token
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class AsyncReportTests(TestCase):
+
+    def setUp(self):
+        caches['reports'].clear()
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.create(ingredient=self.ingredients[0], location=self.location, units_available=3)
+        save_stock_audits([
+            StockAudit(reason=reason, units_change=1, cost=2.5, ingredient=self.ingredients[0], location=self.location, staff=self.manager)
+            for reason in ('delivery', 'waste', 'sale') * 400
+        ])
+        save_sales_audits([SalesAudit(sale_amount=9.0, location=self.location, menu=self.menu, staff=self.manager)])
+        self.payload = {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }
+
+    def sync_report(self, url):
+        response = self.client.post(url, self.payload, content_type='application/json')
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    async def test_async_inventory_report_matches_sync_report(self):
+        response = await self.async_client.post('/inventory/async/inventory-report/', self.payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(content, await sync_to_async(self.sync_report)('/inventory/inventory-report/'))
+        self.assertEqual(len(content.splitlines()), 1201)
+
+    async def test_async_financial_summary_matches_sync_summary(self):
+        token = await sync_to_async(sign_staff_token)(self.manager)
+        response = await self.async_client.post(
+            '/inventory/async/finantial-summary/', self.payload, content_type='application/json', AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.content, await sync_to_async(self.sync_report)('/inventory/finantial-summary/'))
+
+    async def test_async_reports_check_the_staff(self):
+        response = await self.async_client.post(
+            '/inventory/async/finantial-summary/', {**self.payload, 'staff_id': -1}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), 'Missing/wrong staff_id or staff with wrong role')
+
+        response = await self.async_client.post(
+            '/inventory/async/inventory-report/', self.payload, content_type='application/json', AUTHORIZATION='Bearer wrong'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_reports_of_a_closed_period_are_cached(self):
+        yesterday = (timezone.localdate() - timedelta(days=1)).strftime('%d/%m/%Y')
+        payload = {**self.payload, 'end_date': yesterday}
+        for url in ('/inventory/async/inventory-report/', '/inventory/async/finantial-summary/'):
+            response = await self.async_client.post(url, payload, content_type='application/json')
+            content = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+
+            cached = await self.async_client.post(url, payload, content_type='application/json')
+            self.assertFalse(cached.streaming)
+            self.assertEqual(cached.content, content)
+            self.assertTrue(cached['ETag'])
+            self.assertEqual(response['ETag'], cached['ETag'])
+
+            not_modified = await self.async_client.post(url, payload, content_type='application/json', IF_NONE_MATCH=cached['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(not_modified['ETag'], cached['ETag'])
+
+    @override_settings(REPORT_CACHE_MAX_BYTES=10)
+    async def test_async_report_larger_than_the_cache_is_streamed_whole(self):
+        yesterday = (timezone.localdate() - timedelta(days=1)).strftime('%d/%m/%Y')
+        self.payload['end_date'] = yesterday
+        response = await self.async_client.post('/inventory/async/inventory-report/', self.payload, content_type='application/json')
+
+        self.assertTrue(response.streaming)
+        self.assertNotIn('ETag', response)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content, await sync_to_async(self.sync_report)('/inventory/inventory-report/'))
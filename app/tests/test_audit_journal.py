@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import journal, sale_plan
+from inventory.audit import insert_journaled_audits, flush_journal
+from inventory.models import DailySalesRollup, DailyStockRollup, IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class AuditJournalTests(APITestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.journal_path = os.path.join(directory, 'audit-journal.jsonl')
+        write_behind = self.settings(AUDIT_WRITE_BEHIND=True, AUDIT_JOURNAL_PATH=self.journal_path)
+        write_behind.enable()
+        self.addCleanup(write_behind.disable)
+
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=2) for ingredient in self.ingredients
+        ])
+
+    def sell(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/inventory/menu/{self.menu.menu_id}/sell/", {
+                'staff_id': self.staff.staff_id,
+                'location_id': self.location.location_id
+            }, format='json')
+
+    def check_journal(self):
+        out = StringIO()
+        call_command('check_audit_journal', stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_sale_only_updates_the_stock(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sell()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(IngredientStock.objects.values_list('units_available', flat=True)), [1.0, 1.0, 1.0])
+        self.assertFalse([query for query in queries if 'audit' in query['sql'] or 'rollup' in query['sql']])
+        self.assertFalse(StockAudit.objects.exists())
+        self.assertIn('0 journaled audits already inserted, 4 pending', self.check_journal())
+
+    def test_flush_inserts_the_audits_and_rollups(self):
+        self.sell()
+        self.sell()
+
+        self.assertEqual(flush_journal(), 8)
+        self.assertEqual(StockAudit.objects.count(), 6)
+        self.assertEqual(SalesAudit.objects.count(), 2)
+        self.assertEqual(sorted(DailyStockRollup.objects.values_list('units_change', flat=True)), [-2.0, -2.0, -2.0])
+        self.assertEqual(DailySalesRollup.objects.get().sales, 2)
+        self.assertEqual(journal.segments(), [])
+        self.assertEqual(flush_journal(), 0)
+
+    def test_flush_is_retried_safely_after_a_crash(self):
+        self.sell()
+        # a flusher inserted the segment but crashed before deleting it
+        segment, = journal.rotate()
+        records, _ = journal.read(segment)
+        insert_journaled_audits(records)
+        self.assertIn('4 journaled audits already inserted, 0 pending', self.check_journal())
+        self.sell()
+
+        self.assertEqual(flush_journal(), 4)
+        self.assertEqual(StockAudit.objects.count(), 6)
+        self.assertEqual(DailySalesRollup.objects.get().sales, 2)
+
+    def test_failed_movement_is_not_journaled(self):
+        self.sell()
+        self.sell()
+        response = self.sell()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(flush_journal(), 8)
+
+    def test_check_reports_differences(self):
+        self.sell()
+        segment, = journal.rotate()
+        insert_journaled_audits(journal.read(segment)[0])
+        SalesAudit.objects.update(sale_amount=1.0)
+
+        with self.assertRaisesMessage(CommandError, '1 journaled audits differ from the database'):
+            self.check_journal()
+
+    def test_torn_record_is_rejected(self):
+        self.sell()
+        with open(self.journal_path, 'a') as journal_file:
+            journal_file.write('{"kind":"sto')
+
+        self.assertEqual(flush_journal(), 4)
+        with open(self.journal_path + '.rejected') as rejected:
+            self.assertEqual(rejected.read(), '{"kind":"sto\n')
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.models import SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+START = datetime(2023, 3, 1, 12, tzinfo=timezone.utc)
+
+
+class AuditLedgerTests(APITestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.other_location = create_location('Elsewhere')
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(2)
+        self.menu = create_menu(self.location, self.ingredients)
+        # 7 movements, the first 3 at the same instant
+        moments = [START] * 3 + [START + timedelta(hours=hours) for hours in range(1, 5)]
+        save_stock_audits([
+            self.stock_audit(created_at, reason='delivery' if index % 2 else 'waste', ingredient=self.ingredients[index % 2])
+            for index, created_at in enumerate(moments)
+        ])
+        save_stock_audits([self.stock_audit(START, location=self.other_location)])
+        save_sales_audits([self.sales_audit(START + timedelta(hours=hours)) for hours in range(3)])
+
+    def stock_audit(self, created_at, reason='delivery', ingredient=None, location=None):
+        audit = StockAudit(
+            reason=reason, units_change=1, cost=1, ingredient=ingredient or self.ingredients[0],
+            location=location or self.location, staff=self.manager
+        )
+        audit.created_at = created_at or audit.created_at
+        return audit
+
+    def sales_audit(self, created_at):
+        audit = SalesAudit(sale_amount=9.0, location=self.location, menu=self.menu, staff=self.manager)
+        audit.created_at = created_at
+        return audit
+
+    def page(self, ledger='stock-audits', **body):
+        return self.client.post(f"/inventory/ledger/{ledger}/", {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            **body
+        }, format='json')
+
+    def read_all(self, **body):
+        ids, cursor = [], None
+        while True:
+            response = self.page(cursor=cursor, **body) if cursor else self.page(**body)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [movement['stock_audit_id'] for movement in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not response.data['has_more']:
+                return ids, cursor
+
+    def test_pages_follow_created_at_and_id(self):
+        ids, _ = self.read_all(limit=2)
+
+        expected = list(StockAudit.objects.filter(location=self.location).order_by('created_at', 'stock_audit_id').values_list(
+            'stock_audit_id', flat=True
+        ))
+        self.assertEqual(ids, expected)
+
+    def test_page_is_one_query(self):
+        cursor = self.page(limit=2).data['next_cursor']
+        # 2 queries to authorize the staff member and 1 for the page
+        with self.assertNumQueries(3):
+            response = self.page(limit=2, cursor=cursor)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_filters(self):
+        ids, _ = self.read_all(reason='waste', ingredient_id=self.ingredients[0].ingredient_id)
+
+        self.assertEqual(ids, list(StockAudit.objects.filter(
+            location=self.location, reason='waste', ingredient=self.ingredients[0]
+        ).order_by('created_at', 'stock_audit_id').values_list('stock_audit_id', flat=True)))
+        self.assertEqual(self.page(reason='lost').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.page(ingredient_id='1').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tail_from_cursor(self):
+        _, cursor = self.read_all()
+        self.assertEqual(self.page(cursor=cursor).data['results'], [])
+
+        settled = self.stock_audit(datetime.now(timezone.utc) - timedelta(minutes=5))
+        in_flight = self.stock_audit(None)
+        save_stock_audits([settled, in_flight])
+
+        response = self.page(cursor=cursor)
+        self.assertEqual([movement['stock_audit_id'] for movement in response.data['results']], [settled.stock_audit_id])
+        self.assertFalse(response.data['has_more'])
+
+    def test_start_date(self):
+        ids, _ = self.read_all(start_date='01/03/2023')
+        self.assertEqual(len(ids), 7)
+        ids, _ = self.read_all(start_date='02/03/2023')
+        self.assertEqual(ids, [])
+        for start_date in ('2023-03-01', 5):
+            response = self.page(start_date=start_date)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, 'Wrong start_date')
+
+    def test_sales_ledger(self):
+        response = self.page('sales-audits', menu_id=self.menu.menu_id, limit=2)
+
+        self.assertEqual([movement['sale_amount'] for movement in response.data['results']], [9.0, 9.0])
+        self.assertTrue(response.data['has_more'])
+        response = self.page('sales-audits', cursor=response.data['next_cursor'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_wrong_cursor_and_limit(self):
+        self.assertEqual(self.page(cursor='not-a-cursor').data, 'Wrong cursor')
+        self.assertEqual(self.page(limit=0).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.page(limit=5000).status_code, status.HTTP_400_BAD_REQUEST)
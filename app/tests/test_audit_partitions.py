@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from inventory import partitions
+from inventory.audit import save_stock_audits
+from inventory.models import StockAudit, StockSnapshot, Staff
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+
+class MonthsTests(SimpleTestCase):
+
+    def test_month_start_is_utc(self):
+        moment = datetime(2023, 3, 1, 0, 30, tzinfo=timezone(timedelta(hours=1)))
+        self.assertEqual(partitions.month_start(moment), datetime(2023, 2, 1, tzinfo=timezone.utc))
+
+    def test_add_months_across_years(self):
+        month = datetime(2023, 11, 1, tzinfo=timezone.utc)
+        self.assertEqual(partitions.add_months(month, 3), datetime(2024, 2, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.add_months(month, -11), datetime(2022, 12, 1, tzinfo=timezone.utc))
+
+    def test_partition_name(self):
+        self.assertEqual(
+            partitions.partition_name('inventory_stock_audit', datetime(2023, 3, 1, tzinfo=timezone.utc)), 'inventory_stock_audit_y2023m03'
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The audit tables are only partitioned on PostgreSQL')
+class AuditPartitionsTests(TransactionTestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.CHEF, self.location)
+        self.ingredient = create_ingredients(1)[0]
+        self.this_month = partitions.month_start(datetime.now(timezone.utc))
+
+    def audit(self, created_at):
+        audit = StockAudit(reason='delivery', units_change=1, cost=1, ingredient=self.ingredient, location=self.location, staff=self.staff)
+        audit.created_at = created_at
+        save_stock_audits([audit])
+
+    def test_partitions_created_ahead(self):
+        call_command('manage_audit_partitions', ahead=5, stdout=StringIO())
+
+        for table in partitions.PARTITIONED_TABLES:
+            months = [partition.month for partition in partitions.partitions(table)]
+            self.assertIn(partitions.add_months(self.this_month, 5), months)
+
+    def test_audits_land_in_their_month(self):
+        self.audit(self.this_month + timedelta(days=3))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {partitions.partition_name('inventory_stock_audit', self.this_month)}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_expired_months_are_detached(self):
+        old_month = partitions.add_months(self.this_month, -14)
+        partitions.create_partitions(old_month, old_month)
+        self.audit(old_month + timedelta(days=1))
+        self.audit(self.this_month)
+
+        with self.assertRaises(CommandError):
+            call_command('manage_audit_partitions', retention_months=12, stdout=StringIO())
+
+        StockSnapshot.objects.create(
+            taken_at=self.this_month, location=self.location, ingredient=self.ingredient, units_available=2
+        )
+        call_command('manage_audit_partitions', retention_months=12, drop=True, stdout=StringIO())
+
+        self.assertEqual(list(StockAudit.objects.values_list('created_at', flat=True)), [self.this_month])
+        self.assertNotIn(old_month, [partition.month for partition in partitions.partitions('inventory_stock_audit')])
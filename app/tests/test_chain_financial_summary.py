@@ -0,0 +1,127 @@
+import csv
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from inventory.reports import parse_period, financial_summary
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+def create_chain(test, locations):
+    test.locations = [create_location(f"Site {index}") for index in range(locations)]
+    test.elsewhere = create_location('Elsewhere')
+    test.manager = create_staff(1, Staff.StaffRoles.MANAGER, *test.locations)
+    test.ingredients = create_ingredients(5, cost=0.5)
+    seed_locations(test, test.locations + [test.elsewhere])
+
+
+def seed_locations(test, locations):
+    for index, location in enumerate(locations, 1):
+        menu = create_menu(location, test.ingredients[:2], name=f"Menu {location.location_id}")
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=location, units_available=index) for ingredient in test.ingredients
+        ])
+        save_stock_audits([
+            StockAudit(reason=reason, units_change=1, cost=cost * index, ingredient=test.ingredients[0], location=location, staff=test.manager)
+            for reason, cost in (('delivery', 10.0), ('delivery', 5.0), ('waste', 1.5), ('sale', 2.0))
+        ])
+        save_sales_audits([SalesAudit(sale_amount=9.0, location=location, menu=menu, staff=test.manager) for _ in range(index)])
+
+
+def summary_rows(response):
+    return {row[0]: row for row in list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))[1:]}
+
+
+@override_settings(CHAIN_SUMMARY_WORKERS=1)
+class ChainFinancialSummaryTests(APITestCase):
+
+    def setUp(self):
+        create_chain(self, 3)
+
+    def request_summary(self, start_date='01/01/2023', end_date='01/01/2100', **body):
+        return self.client.post('/inventory/finantial-summary/chain/', {
+            'staff_id': self.manager.staff_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            **body
+        }, format='json')
+
+    def expected_rows(self, start_date, end_date):
+        period = {'start_date': start_date, 'end_date': end_date}
+        start, end = parse_period(period)
+        rows = {}
+        for location in self.locations:
+            summary = financial_summary(location.location_id, start, end)
+            rows[str(location.location_id)] = [
+                str(location.location_id), f"{start_date} to {end_date}",
+                *(str(summary[field]) for field in (
+                    'total_revenue', 'total_deliveries_cost', 'total_waste_cost', 'current_inventory_value', 'inventory_value_at'
+                ))
+            ]
+        return rows
+
+    def test_all_locations_of_the_manager(self):
+        response = self.request_summary()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = summary_rows(response)
+        self.assertEqual(rows, self.expected_rows('01/01/2023', '01/01/2100'))
+        self.assertEqual(rows[str(self.locations[1].location_id)][2:], ['18.0', '30.0', '3.0', '5.0', '2.0'])
+
+    def test_partial_day_period(self):
+        today = timezone.localdate().strftime('%d/%m/%Y')
+        response = self.request_summary(today, today)
+
+        self.assertEqual(summary_rows(response), self.expected_rows(today, today))
+
+    def test_selected_locations(self):
+        response = self.request_summary(location_ids=[self.locations[2].location_id])
+
+        self.assertEqual(list(summary_rows(response)), [str(self.locations[2].location_id)])
+
+    def test_locations_the_manager_does_not_work_in(self):
+        for location_ids in ([self.elsewhere.location_id], [self.locations[0].location_id, self.elsewhere.location_id], [], 'all'):
+            response = self.request_summary(location_ids=location_ids)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, 'Wrong location_ids or staff does not work in all of them')
+
+    def test_query_count_does_not_grow_with_locations(self):
+        more_locations = [create_location(f"New site {index}") for index in range(5)]
+        self.manager.location.add(*more_locations)
+        seed_locations(self, more_locations)
+        # 2 queries to authorize the staff member, 6 grouped queries for all the locations
+        with self.assertNumQueries(8):
+            response = self.request_summary()
+            b''.join(response.streaming_content)
+
+    @override_settings(CHAIN_SUMMARY_BATCH_SIZE=2)
+    def test_batches(self):
+        response = self.request_summary()
+
+        self.assertEqual(summary_rows(response), self.expected_rows('01/01/2023', '01/01/2100'))
+
+
+@override_settings(CHAIN_SUMMARY_BATCH_SIZE=1, CHAIN_SUMMARY_WORKERS=3)
+class ParallelChainFinancialSummaryTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        create_chain(self, 4)
+
+    def test_rows_of_every_batch(self):
+        response = APIClient().post('/inventory/finantial-summary/chain/', {
+            'staff_id': self.manager.staff_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }, format='json')
+
+        rows = summary_rows(response)
+        self.assertEqual(sorted(rows), sorted(str(location.location_id) for location in self.locations))
+        for index, location in enumerate(self.locations, 1):
+            self.assertEqual(rows[str(location.location_id)][2], str(9.0 * index))
@@ -0,0 +1,49 @@
+import csv
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class FinancialSummaryTests(APITestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(200, cost=0.5)
+        self.menu = create_menu(self.location, self.ingredients[:2])
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=4)
+            for ingredient in self.ingredients
+        ])
+        save_stock_audits([
+            StockAudit(reason=reason, units_change=1, cost=cost, ingredient=self.ingredients[0], location=self.location, staff=self.manager)
+            for reason, cost in (('delivery', 10.0), ('delivery', 5.0), ('waste', 1.5), ('sale', 2.0))
+        ])
+        save_sales_audits([
+            SalesAudit(sale_amount=9.0, location=self.location, menu=self.menu, staff=self.manager) for _ in range(3)
+        ])
+
+    def request_summary(self):
+        return self.client.post('/inventory/finantial-summary/', {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }, format='json')
+
+    def test_summary_figures(self):
+        response = self.request_summary()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(response.content.decode().splitlines()))
+        self.assertEqual(rows[1], [str(self.location.location_id), '01/01/2023 to 01/01/2100', '27.0', '15.0', '1.5', '400.0', '2.0'])
+
+    def test_query_count(self):
+        # 2 queries to authorize the staff member and 1 for the whole summary, whatever the number of ingredients
+        with self.assertNumQueries(3):
+            response = self.request_summary()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
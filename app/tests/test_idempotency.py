@@ -0,0 +1,161 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from inventory.models import IdempotencyRecord, IngredientStock, SalesAudit, Staff, StockAudit
+from inventory.authentication import sign_staff_token
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class IdempotencyKeyTests(APITestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.chef = create_staff(1, Staff.StaffRoles.CHEF, self.location)
+        self.front_of_house = create_staff(2, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(2)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients
+        ])
+
+    def deliver(self, units=5, key='delivery-1', staff=None, staff_id=None, **headers):
+        if key:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        return self.client.post('/inventory/ingredient-stock/accept-delivery/', {
+            'staff_id': staff_id or (staff or self.chef).staff_id,
+            'location_id': self.location.location_id,
+            'delivery': [{'ingredient_id': self.ingredients[0].ingredient_id, 'units': units}]
+        }, format='json', **headers)
+
+    def sell(self, key):
+        return self.client.post(f"/inventory/menu/{self.menu.menu_id}/sell/", {
+            'staff_id': self.front_of_house.staff_id,
+            'location_id': self.location.location_id,
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def units(self):
+        return IngredientStock.objects.get(ingredient=self.ingredients[0]).units_available
+
+    def test_retry_is_replayed_without_running_again(self):
+        first = self.deliver()
+        # a single lookup, no authorization or stock query
+        with self.assertNumQueries(1):
+            retry = self.deliver()
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.units(), 15)
+        self.assertEqual(StockAudit.objects.count(), 1)
+
+    def test_errors_are_replayed(self):
+        IngredientStock.objects.update(units_available=0)
+        first = self.sell('sale-1')
+        IngredientStock.objects.update(units_available=10)
+        retry = self.sell('sale-1')
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((retry.status_code, retry.data), (first.status_code, first.data))
+        self.assertFalse(SalesAudit.objects.exists())
+
+    def test_other_keys_and_no_key_run(self):
+        self.deliver(key='delivery-1')
+        self.deliver(key='delivery-2')
+        self.deliver(key=None)
+        self.deliver(key=None)
+
+        self.assertEqual(self.units(), 30)
+
+    def test_keys_are_per_staff_member(self):
+        other_chef = create_staff(3, Staff.StaffRoles.CHEF, self.location)
+        self.deliver()
+        self.deliver(staff=other_chef)
+
+        self.assertEqual(self.units(), 20)
+
+    def test_staff_token_scopes_the_key(self):
+        token = sign_staff_token(self.chef)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.deliver()
+        retry = self.deliver()
+
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(IdempotencyRecord.objects.get().staff_id, self.chef.staff_id)
+
+    def test_staff_id_sent_as_a_string(self):
+        self.deliver(staff_id=str(self.chef.staff_id))
+        retry = self.deliver(staff_id=str(self.chef.staff_id))
+
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.units(), 15)
+
+    def test_key_without_a_staff_member_is_refused(self):
+        response = self.deliver(staff_id='chef')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, 'Missing/wrong staff_id')
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.assertEqual(self.units(), 10)
+
+    def test_key_reused_for_another_request(self):
+        self.deliver(units=5)
+        response = self.deliver(units=6)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.units(), 15)
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_expired_keys_are_evicted(self):
+        self.deliver()
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.deliver()
+
+        self.assertEqual(self.units(), 20)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+
+class ConcurrentRetriesTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients
+        ])
+
+    def test_retry_storm_sells_once(self):
+        responses = []
+        barrier = threading.Barrier(8)
+
+        def retry():
+            barrier.wait()
+            try:
+                responses.append(APIClient().post(
+                    f"/inventory/menu/{self.menu.menu_id}/sell/",
+                    {'staff_id': self.staff.staff_id, 'location_id': self.location.location_id},
+                    format='json', HTTP_IDEMPOTENCY_KEY='ticket-42'
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=retry) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 8)
+        self.assertEqual(SalesAudit.objects.count(), 1)
+        self.assertEqual(
+            list(IngredientStock.objects.values_list('units_available', flat=True)), [9.0] * len(self.ingredients)
+        )
@@ -0,0 +1,65 @@
+import csv
+import tracemalloc
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.models import Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+
+class InventoryReportTests(APITestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.other_location = create_location('Big Pub')
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredient = create_ingredients(1)[0]
+
+    def add_audits(self, count, location=None):
+        StockAudit.objects.bulk_create([
+            StockAudit(
+                reason='delivery', units_change=1, cost=2.0, ingredient=self.ingredient,
+                location=location or self.location, staff=self.manager
+            )
+            for _ in range(count)
+        ], batch_size=1000)
+
+    def request_report(self):
+        return self.client.post('/inventory/inventory-report/', {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }, format='json')
+
+    def consume(self, response):
+        tracemalloc.start()
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size, peak
+
+    def test_report_lists_location_audits(self):
+        self.add_audits(3)
+        self.add_audits(2, self.other_location)
+
+        response = self.request_report()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['stock_audit_id', 'reason', 'cost', 'ingredient_id', 'staff_id', 'created_at'])
+        self.assertEqual(len(rows), 4)
+
+    def test_peak_memory_does_not_grow_with_report_size(self):
+        self.add_audits(2000)
+        small_size, small_peak = self.consume(self.request_report())
+
+        self.add_audits(48000)
+        large_size, large_peak = self.consume(self.request_report())
+
+        self.assertGreater(large_size, 20 * small_size)
+        # The whole large report would be several MB, streaming keeps the peak close to the small one
+        self.assertLess(large_peak, small_peak * 2)
+        self.assertLess(large_peak, large_size / 2)
@@ -0,0 +1,60 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import availability
+from inventory.models import IngredientStock, RecipeIngredient, Staff
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class MenuAvailabilityTests(APITestCase):
+    url = '/inventory/menu/availability/'
+
+    def setUp(self):
+        availability.invalidate()
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.BACK_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(4)
+        self.salad = create_menu(self.location, self.ingredients[:2], quantity=1.0, name='Salad')
+        self.soup = create_menu(self.location, self.ingredients[1:3], quantity=2.0, name='Soup')
+        self.water = create_menu(self.location, [], name='Water')
+        other_location = create_location('Other')
+        create_menu(other_location, self.ingredients[3:], name='Elsewhere')
+        for ingredient, units in zip(self.ingredients, (3, 5, 1)):
+            IngredientStock.objects.create(ingredient=ingredient, location=self.location, units_available=units)
+
+    def check(self):
+        response = self.client.post(self.url, {
+            'staff_id': self.staff.staff_id,
+            'location_id': self.location.location_id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {line['menu_id']: line['portions'] for line in response.json()}
+
+    def test_portions_per_menu_item(self):
+        self.assertEqual(self.check(), {self.salad.menu_id: 3, self.soup.menu_id: 0, self.water.menu_id: None})
+
+    def test_stock_changes_are_seen_straight_away(self):
+        self.check()
+        IngredientStock.objects.filter(ingredient=self.ingredients[2]).update(units_available=4.5)
+
+        with self.assertNumQueries(3):
+            portions = self.check()
+        self.assertEqual(portions[self.soup.menu_id], 2)
+
+    def test_recipe_changes_invalidate_the_matrix(self):
+        self.check()
+        RecipeIngredient.objects.create(recipe=self.salad.recipe, ingredient=self.ingredients[3], quantity=1.0)
+
+        self.assertEqual(self.check()[self.salad.menu_id], 0)
+
+    def test_float_quantities(self):
+        RecipeIngredient.objects.filter(recipe=self.salad.recipe).update(quantity=0.1)
+        IngredientStock.objects.filter(ingredient__in=self.ingredients[:2]).update(units_available=0.3)
+        availability.invalidate()
+
+        self.assertEqual(self.check()[self.salad.menu_id], 3)
+
+    def test_staff_must_work_in_location(self):
+        response = self.client.post(self.url, {'staff_id': self.staff.staff_id, 'location_id': -1}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,92 @@
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.models import IngredientStock, Staff
+from nory_project import metrics
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class MetricsTests(APITestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        metrics_settings = self.settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=60)
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+        metrics.store = metrics.MetricsStore()
+
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.staff = create_staff(2, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients
+        ])
+
+    def sample(self, text, name, **labels):
+        label_pattern = ','.join(f'{key}="{re.escape(value)}"' for key, value in labels.items())
+        match = re.search(rf'^{name}{{{label_pattern}}} (\S+)$', text, re.MULTILINE)
+        return float(match.group(1)) if match else None
+
+    def test_metrics_per_route(self):
+        body = {'staff_id': self.staff.staff_id, 'location_id': self.location.location_id}
+        for _ in range(2):
+            self.client.post(f"/inventory/menu/{self.menu.menu_id}/sell/", body, format='json')
+        self.client.post('/inventory/menu/999/sell/', body, format='json')
+        response = self.client.post('/inventory/inventory-report/', {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }, format='json')
+        b''.join(response.streaming_content)
+
+        response = self.client.get('/metrics/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        text = response.content.decode()
+        route = 'inventory/menu/<int:menu_id>/sell/'
+        self.assertEqual(self.sample(text, 'http_requests_total', route=route, method='POST', status='200'), 2)
+        self.assertEqual(self.sample(text, 'http_requests_total', route=route, method='POST', status='400'), 1)
+        self.assertEqual(self.sample(text, 'http_request_duration_seconds_count', route=route), 3)
+        self.assertEqual(self.sample(text, 'http_request_duration_seconds_bucket', route=route, le='+Inf'), 3)
+        self.assertGreater(self.sample(text, 'db_queries_total', route=route), 3)
+        self.assertGreater(self.sample(text, 'db_query_duration_seconds_total', route=route), 0)
+        # the report query runs while the response streams
+        self.assertEqual(self.sample(text, 'db_queries_total', route='inventory/inventory-report/'), 3)
+
+    def test_metrics_of_all_workers_are_added_up(self):
+        other_worker = metrics.MetricsStore()
+        other_worker.record('ping/', 'GET', 200, 0.02, 0, 0.0)
+        with mock.patch('os.getpid', return_value=1):
+            other_worker.flush()
+        self.client.get('/ping/')
+
+        text = self.client.get('/metrics/').content.decode()
+
+        self.assertEqual(self.sample(text, 'http_requests_total', route='ping/', method='GET', status='200'), 2)
+        self.assertEqual(self.sample(text, 'http_request_duration_seconds_bucket', route='ping/', le='+Inf'), 2)
+
+    async def test_async_requests(self):
+        response = await self.async_client.post('/inventory/async/inventory-report/', {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/01/2023',
+            'end_date': '01/01/2100'
+        }, content_type='application/json')
+        [chunk async for chunk in response.streaming_content]
+
+        text = (await self.async_client.get('/metrics/')).content.decode()
+
+        route = 'inventory/async/inventory-report/'
+        self.assertEqual(self.sample(text, 'http_requests_total', route=route, method='POST', status='200'), 1)
+        self.assertEqual(self.sample(text, 'db_queries_total', route=route), 3)
@@ -0,0 +1,85 @@
+import csv
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.audit import save_stock_audits
+from inventory.forecast import reorder_lines
+from inventory.models import IngredientStock, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+TODAY = date(2023, 6, 30)
+
+
+class ReorderSuggestionTests(APITestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.steady, self.surging, self.wasted, self.unused = create_ingredients(4, cost=0.5)
+        for ingredient, units in ((self.steady, 5), (self.surging, 100), (self.wasted, 0), (self.unused, 3)):
+            IngredientStock.objects.create(ingredient=ingredient, location=self.location, units_available=units)
+
+        audits = []
+        for days_ago in range(1, 29):
+            audits.append(self.audit(self.steady, 'sale', -2, days_ago))
+            audits.append(self.audit(self.surging, 'sale', -5 if days_ago <= 7 else -1, days_ago))
+            audits.append(self.audit(self.steady, 'delivery', 10, days_ago))
+        audits += [self.audit(self.wasted, 'waste', -1, days_ago) for days_ago in range(1, 8)]
+        # today is not a whole day yet
+        audits.append(self.audit(self.unused, 'sale', -50, 0))
+        save_stock_audits(audits)
+
+    def audit(self, ingredient, reason, units_change, days_ago):
+        created_at = timezone.make_aware(datetime.combine(TODAY - timedelta(days=days_ago), time(12)))
+        return StockAudit(
+            reason=reason, units_change=units_change, cost=abs(units_change) * 0.5, ingredient=ingredient,
+            location=self.location, staff=self.manager, created_at=created_at
+        )
+
+    def test_forecast_per_ingredient(self):
+        lines = {line.ingredient_id: line for line in reorder_lines(self.location.location_id, TODAY)}
+
+        self.assertEqual(set(lines), {self.steady.ingredient_id, self.surging.ingredient_id, self.wasted.ingredient_id})
+        steady = lines[self.steady.ingredient_id]
+        self.assertEqual(steady.daily_rates, [2.0, 2.0, 2.0 * 28 / 91])
+        self.assertEqual(steady.days_until_stockout, 2.5)
+        # 9 days of lead time and cover at 2 units a day, less the 5 units in stock
+        self.assertEqual(steady.suggested_units, 13)
+        self.assertEqual(steady.suggested_cost, 6.5)
+
+        surging = lines[self.surging.ingredient_id]
+        self.assertEqual(surging.daily_rate, 5.0)
+        self.assertEqual(surging.days_until_stockout, 20)
+        self.assertEqual(surging.suggested_units, 0)
+
+        wasted = lines[self.wasted.ingredient_id]
+        self.assertEqual(wasted.days_until_stockout, 0)
+        self.assertEqual(wasted.suggested_units, 9)
+
+    def test_endpoint(self):
+        with mock.patch('django.utils.timezone.localdate', return_value=TODAY):
+            response = self.client.post('/inventory/ingredient-stock/reorder-suggestions/', {
+                'staff_id': self.manager.staff_id,
+                'location_id': self.location.location_id
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(line['ingredient_id'], line['suggested_units']) for line in response.json()],
+            [(self.wasted.ingredient_id, 9), (self.steady.ingredient_id, 13)]
+        )
+
+    def test_command(self):
+        out = StringIO()
+        with mock.patch('django.utils.timezone.localdate', return_value=TODAY):
+            call_command('suggest_reorders', stdout=out, stderr=StringIO())
+
+        rows = list(csv.reader(out.getvalue().splitlines()))
+        self.assertEqual(rows[0][-3:], ['days until stockout', 'suggested units', 'suggested cost'])
+        self.assertEqual(len(rows), 3)
@@ -0,0 +1,149 @@
+import csv
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.models import Ingredient, IngredientStock, ReportInvalidation, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+IN_PERIOD = datetime(2023, 3, 15, 12, tzinfo=timezone.utc)
+AFTER_PERIOD = datetime(2023, 6, 15, 12, tzinfo=timezone.utc)
+
+
+class ReportCacheTests(APITestCase):
+
+    def setUp(self):
+        caches['reports'].clear()
+        self.location = create_location()
+        self.manager = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(3, cost=0.5)
+        self.menu = create_menu(self.location, self.ingredients[:2])
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=4) for ingredient in self.ingredients
+        ])
+        self.delivery(IN_PERIOD, cost=10.0)
+        save_sales_audits([SalesAudit(sale_amount=9.0, location=self.location, menu=self.menu, staff=self.manager, created_at=IN_PERIOD)])
+        # the history was written long before the reports are requested
+        ReportInvalidation.objects.update(invalidated_at=datetime(2023, 7, 1, tzinfo=timezone.utc))
+
+    def delivery(self, created_at=None, cost=1.0, location=None):
+        audit = StockAudit(
+            reason='delivery', units_change=1, cost=cost, ingredient=self.ingredients[0], location=location or self.location, staff=self.manager
+        )
+        audit.created_at = created_at or audit.created_at
+        save_stock_audits([audit])
+
+    def request_report(self, endpoint, end_date='01/05/2023', **headers):
+        return self.client.post(f"/inventory/{endpoint}/", {
+            'staff_id': self.manager.staff_id,
+            'location_id': self.location.location_id,
+            'start_date': '01/03/2023',
+            'end_date': end_date
+        }, format='json', **headers)
+
+    def inventory_report(self, **kwargs):
+        response = self.request_report('inventory-report', **kwargs)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, list(csv.reader(content.decode().splitlines()))
+
+    def financial_summary(self, **kwargs):
+        response = self.request_report('finantial-summary', **kwargs)
+        return response, list(csv.reader(response.content.decode().splitlines()))
+
+    def test_inventory_report_served_from_cache(self):
+        first, rows = self.inventory_report()
+        self.assertFalse(first.streaming)
+        self.assertEqual(len(rows), 2)
+        # the first download already carries the ETag
+        self.assertEqual(self.inventory_report(HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 2 queries to authorize the staff member and 1 to check the cached report is still valid
+        with self.assertNumQueries(3):
+            second, cached_rows = self.inventory_report()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_rows, rows)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        third, _ = self.inventory_report(HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(third.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(third['ETag'], second['ETag'])
+
+    def test_open_period_is_not_cached(self):
+        end_date = (datetime.now(timezone.utc) + timedelta(days=2)).strftime('%d/%m/%Y')
+        self.inventory_report(end_date=end_date)
+        response, _ = self.inventory_report(end_date=end_date)
+        self.assertTrue(response.streaming)
+        self.assertNotIn('ETag', response)
+
+    def test_backdated_audit_in_window_invalidates(self):
+        _, rows = self.inventory_report()
+        self.delivery(IN_PERIOD + timedelta(days=1))
+
+        _, new_rows = self.inventory_report()
+        self.assertEqual(len(new_rows), len(rows) + 1)
+
+    def test_backdated_audit_out_of_window_keeps_cache(self):
+        self.inventory_report()
+        self.delivery(AFTER_PERIOD)
+        self.delivery(IN_PERIOD, location=create_location('Far away'))
+        self.delivery()  # created now
+
+        with self.assertNumQueries(3):
+            self.inventory_report()
+
+    def test_edited_audit_invalidates(self):
+        _, rows = self.inventory_report()
+        audit = StockAudit.objects.get()
+        audit.cost = 12.0
+        audit.save()
+
+        _, new_rows = self.inventory_report()
+        self.assertEqual(new_rows[1][2], '12.0')
+
+    @override_settings(REPORT_CACHE_MAX_BYTES=100)
+    def test_large_report_is_not_cached(self):
+        for days in range(5):
+            self.delivery(IN_PERIOD + timedelta(days=days))
+        first, first_rows = self.inventory_report()
+
+        response, rows = self.inventory_report()
+        for streamed in (first, response):
+            self.assertTrue(streamed.streaming)
+            self.assertNotIn('ETag', streamed)
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(first_rows, rows)
+
+    def test_financial_summary_figures_served_from_cache(self):
+        first, rows = self.financial_summary()
+        self.assertEqual(rows[1][2:], ['9.0', '10.0', '0.0', '6.0', '0.5'])
+
+        # the current inventory value is read again, the figures of the period are not
+        IngredientStock.objects.filter(ingredient=self.ingredients[2]).update(units_available=0)
+        with self.assertNumQueries(4):
+            second, cached_rows = self.financial_summary()
+        self.assertEqual(cached_rows[1][2:], ['9.0', '10.0', '0.0', '4.0', '0.5'])
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+        third, _ = self.financial_summary(HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(third.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_financial_summary_depends_on_audits_before_period(self):
+        self.financial_summary()
+        self.delivery(IN_PERIOD - timedelta(days=60))
+
+        _, rows = self.financial_summary()
+        # the delivery is before the period, but part of the inventory at its end
+        self.assertEqual(rows[1][2:], ['9.0', '10.0', '0.0', '6.0', '1.0'])
+
+    def test_ingredient_cost_change_invalidates(self):
+        self.financial_summary()
+        ingredient = Ingredient.objects.get(pk=self.ingredients[0].pk)
+        ingredient.cost = 1.0
+        ingredient.save()
+
+        _, rows = self.financial_summary()
+        self.assertEqual(rows[1][2:], ['9.0', '10.0', '0.0', '8.0', '1.0'])
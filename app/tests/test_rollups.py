@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+
+from inventory.audit import save_stock_audits, save_sales_audits
+from inventory.models import DailySalesRollup, DailyStockRollup, SalesAudit, Staff, StockAudit
+from inventory.reports import financial_summary
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class DailyRollupTests(TestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.CHEF, self.location)
+        self.ingredients = create_ingredients(2)
+        self.menu = create_menu(self.location, self.ingredients)
+
+    def record_history(self):
+        '''
+        A delivery, a waste record and a sale every 7 hours over 10 days, then the rollups are rebuilt.
+        '''
+        first = datetime(2023, 3, 1, 5, 30, tzinfo=timezone.utc)
+        for step in range(35):
+            stock_audits = StockAudit.objects.bulk_create([
+                StockAudit(reason=reason, units_change=1, cost=cost, ingredient=self.ingredients[step % 2], location=self.location, staff=self.staff)
+                for reason, cost in (('delivery', 3.0 + step), ('waste', 0.5 * step))
+            ])
+            sales_audit = SalesAudit.objects.create(sale_amount=10 + step, location=self.location, menu=self.menu, staff=self.staff)
+            # created_at is set on insert, move the rows back in time
+            StockAudit.objects.filter(pk__in=[audit.pk for audit in stock_audits]).update(created_at=first + timedelta(hours=7 * step))
+            SalesAudit.objects.filter(pk=sales_audit.pk).update(created_at=first + timedelta(hours=7 * step))
+        call_command('rebuild_rollups', stdout=StringIO())
+
+    def test_audits_are_added_to_rollups_as_they_are_written(self):
+        save_stock_audits([
+            StockAudit(reason='delivery', units_change=2, cost=4.0, ingredient=self.ingredients[0], location=self.location, staff=self.staff),
+            StockAudit(reason='delivery', units_change=3, cost=6.0, ingredient=self.ingredients[0], location=self.location, staff=self.staff),
+        ])
+        save_sales_audits([SalesAudit(sale_amount=9.5, location=self.location, menu=self.menu, staff=self.staff)])
+        save_sales_audits([SalesAudit(sale_amount=9.5, location=self.location, menu=self.menu, staff=self.staff)])
+
+        stock_rollup = DailyStockRollup.objects.get()
+        self.assertEqual((stock_rollup.units_change, stock_rollup.cost, stock_rollup.entries), (5.0, 10.0, 2))
+        sales_rollup = DailySalesRollup.objects.get()
+        self.assertEqual((sales_rollup.sale_amount, sales_rollup.sales), (19.0, 2))
+
+    def test_summary_from_rollups_matches_raw_audits(self):
+        self.record_history()
+        start = datetime(2023, 3, 2, 9, 0, tzinfo=timezone.utc)
+        end = datetime(2023, 3, 9, 15, 0, tzinfo=timezone.utc)
+
+        summary = financial_summary(self.location.location_id, start, end)
+
+        stock_audit = StockAudit.objects.filter(created_at__range=(start, end))
+        self.assertEqual(summary['total_revenue'], SalesAudit.objects.filter(created_at__range=(start, end)).aggregate(total=Sum('sale_amount'))['total'])
+        self.assertEqual(summary['total_deliveries_cost'], stock_audit.filter(reason='delivery').aggregate(total=Sum('cost'))['total'])
+        self.assertEqual(summary['total_waste_cost'], stock_audit.filter(reason='waste').aggregate(total=Sum('cost'))['total'])
+
+    def test_rebuild_rollups_for_a_range_of_days(self):
+        self.record_history()
+        DailyStockRollup.objects.update(cost=0)
+
+        call_command('rebuild_rollups', start='2023-03-03', end='2023-03-04', stdout=StringIO())
+
+        self.assertEqual(
+            DailyStockRollup.objects.filter(day__range=('2023-03-03', '2023-03-04')).aggregate(total=Sum('cost'))['total'],
+            StockAudit.objects.filter(created_at__date__range=('2023-03-03', '2023-03-04')).aggregate(total=Sum('cost'))['total']
+        )
+        self.assertEqual(DailyStockRollup.objects.exclude(day__range=('2023-03-03', '2023-03-04')).aggregate(total=Sum('cost'))['total'], 0)
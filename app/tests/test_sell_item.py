@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+CATALOG_TABLES = ('"inventory_menu"', '"inventory_recipe_ingredient"', '"inventory_ingredient"', '"inventory_recipe"', '"inventory_modifier"', '"inventory_modifier_option"')
+
+
+class SellItemTests(APITestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(4)
+        self.menu = create_menu(self.location, self.ingredients, quantity=2.0, price=9.5)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10)
+            for ingredient in self.ingredients
+        ])
+
+    def sell(self):
+        return self.client.post(
+            f"/inventory/menu/{self.menu.menu_id}/sell/",
+            {'staff_id': self.staff.staff_id, 'location_id': self.location.location_id},
+            format='json'
+        )
+
+    def test_sale_takes_recipe_off_stock(self):
+        response = self.sell()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(IngredientStock.objects.values_list('units_available', flat=True)), {8.0})
+        self.assertEqual(StockAudit.objects.filter(reason='sale', cost=4.0).count(), 4)
+        self.assertEqual(SalesAudit.objects.get().sale_amount, 9.5)
+
+    def test_cached_plan_needs_no_catalog_queries(self):
+        self.sell()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sell()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        catalog_queries = [query['sql'] for query in queries if any(table in query['sql'] for table in CATALOG_TABLES)]
+        self.assertEqual(catalog_queries, [])
+
+    def test_ingredient_cost_change_invalidates_plan(self):
+        self.sell()
+        ingredient = self.ingredients[0]
+        ingredient.cost = 5.0
+        ingredient.save()
+
+        self.sell()
+
+        self.assertEqual(StockAudit.objects.filter(ingredient=ingredient).latest('stock_audit_id').cost, 10.0)
+
+    def test_not_enough_stock_rolls_back_the_sale(self):
+        IngredientStock.objects.filter(ingredient=self.ingredients[-1]).update(units_available=1)
+
+        response = self.sell()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(IngredientStock.objects.exclude(ingredient=self.ingredients[-1]).values_list('units_available', flat=True)), {10.0})
+        self.assertFalse(StockAudit.objects.exists())
+        self.assertFalse(SalesAudit.objects.exists())
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.models import Ingredient, IngredientStock, Modifier, ModifierOption, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+from tests.test_sell_item import CATALOG_TABLES
+
+
+class SellModifiersTests(APITestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.bread, self.cheese, self.bacon = create_ingredients(3)
+        self.menu = create_menu(self.location, [self.bread, self.cheese], quantity=1.0, price=9.0)
+        self.modifier = Modifier.objects.create(name='Toppings')
+        self.menu.modifier = self.modifier
+        self.menu.save()
+        self.extra_cheese = ModifierOption.objects.create(modifier=self.modifier, ingredient=self.cheese, option='Cheese', price=1.0, quantity=0.5)
+        self.extra_bacon = ModifierOption.objects.create(modifier=self.modifier, ingredient=self.bacon, option='Bacon', price=2.0)
+        self.no_salt = ModifierOption.objects.create(modifier=self.modifier, option='No salt', price=0.0)
+        other_modifier = Modifier.objects.create(name='Sauces')
+        self.ketchup = ModifierOption.objects.create(modifier=other_modifier, ingredient=self.bacon, option='Ketchup', price=0.5)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10)
+            for ingredient in (self.bread, self.cheese, self.bacon)
+        ])
+
+    def sell(self, options):
+        return self.client.post(f"/inventory/menu/{self.menu.menu_id}/sell/", {
+            'staff_id': self.staff.staff_id,
+            'location_id': self.location.location_id,
+            'options': options
+        }, format='json')
+
+    def stock(self):
+        return dict(IngredientStock.objects.values_list('ingredient_id', 'units_available'))
+
+    def test_options_are_taken_off_stock_and_priced(self):
+        ids = [self.extra_cheese.pk, self.extra_cheese.pk, self.extra_bacon.pk, self.no_salt.pk]
+        response = self.sell(ids)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock(), {self.bread.pk: 9.0, self.cheese.pk: 8.0, self.bacon.pk: 9.0})
+        self.assertEqual(SalesAudit.objects.get().sale_amount, 13.0)
+        # one audit per ingredient, the extra cheese is added to the recipe cheese
+        self.assertEqual(
+            sorted(StockAudit.objects.values_list('ingredient_id', 'units_change', 'cost')),
+            [(self.bread.pk, -1.0, 2.0), (self.cheese.pk, -2.0, 4.0), (self.bacon.pk, -1.0, 2.0)]
+        )
+
+    def test_cached_plan_needs_no_catalog_queries(self):
+        self.sell([self.extra_cheese.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sell([self.extra_cheese.pk, self.extra_bacon.pk])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        catalog_queries = [query['sql'] for query in queries if any(table in query['sql'] for table in CATALOG_TABLES)]
+        self.assertEqual(catalog_queries, [])
+
+    def test_options_of_another_modifier_are_refused(self):
+        for options in ([self.ketchup.pk], [-1], 'cheese', [str(self.extra_cheese.pk)]):
+            response = self.sell(options)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, 'Wrong modifier options for menu item')
+        self.assertFalse(StockAudit.objects.exists())
+
+    def test_option_changes_invalidate_the_plan(self):
+        self.sell([self.extra_bacon.pk])
+        self.extra_bacon.price = 3.0
+        self.extra_bacon.save()
+        Ingredient.objects.filter(pk=self.bacon.pk).first().save()
+
+        self.sell([self.extra_bacon.pk])
+
+        self.assertEqual(SalesAudit.objects.latest('sales_audit_id').sale_amount, 12.0)
+
+    def test_order_with_options(self):
+        response = self.client.post('/inventory/order/sell/', {
+            'staff_id': self.staff.staff_id,
+            'location_id': self.location.location_id,
+            'items': [
+                {'menu_id': self.menu.menu_id, 'quantity': 2, 'options': [self.extra_bacon.pk]},
+                {'menu_id': self.menu.menu_id},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock(), {self.bread.pk: 7.0, self.cheese.pk: 7.0, self.bacon.pk: 8.0})
+        self.assertEqual(sorted(SalesAudit.objects.values_list('sale_amount', flat=True)), [9.0, 11.0, 11.0])
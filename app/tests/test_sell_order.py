@@ -0,0 +1,81 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class SellOrderTests(APITestCase):
+    url = '/inventory/order/sell/'
+
+    def setUp(self):
+        sale_plan.invalidate()
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.salad = create_menu(self.location, self.ingredients[:2], quantity=1.0, price=8.0, name='Salad')
+        self.soup = create_menu(self.location, self.ingredients[1:], quantity=2.0, price=6.0, name='Soup')
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients
+        ])
+
+    def order(self, items):
+        return self.client.post(self.url, {
+            'staff_id': self.staff.staff_id,
+            'location_id': self.location.location_id,
+            'items': items
+        }, format='json')
+
+    def stock(self):
+        return list(IngredientStock.objects.order_by('ingredient_id').values_list('units_available', flat=True))
+
+    def test_ticket_is_sold_in_one_go(self):
+        response = self.order([{'menu_id': self.salad.menu_id, 'quantity': 2}, {'menu_id': self.soup.menu_id}])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock(), [8.0, 6.0, 8.0])
+        self.assertEqual(StockAudit.objects.filter(reason='sale').count(), 4)
+        self.assertEqual(sorted(SalesAudit.objects.values_list('sale_amount', flat=True)), [6.0, 8.0, 8.0])
+
+    def test_ticket_demand_is_checked_across_lines(self):
+        # each line alone fits in the stock of the shared ingredient, together they don't
+        response = self.order([{'menu_id': self.salad.menu_id, 'quantity': 4}, {'menu_id': self.soup.menu_id, 'quantity': 4}])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.stock(), [10.0, 10.0, 10.0])
+        self.assertFalse(SalesAudit.objects.exists())
+
+    def test_wrong_lines_are_named(self):
+        other_menu = create_menu(create_location('Big Pub'), self.ingredients, name='Elsewhere')
+
+        response = self.order([{'menu_id': self.salad.menu_id}, {'menu_id': other_menu.menu_id}, {'menu_id': self.soup.menu_id, 'quantity': 0}])
+
+        self.assertEqual(response.data, 'Error: Menu item not available in location or wrong quantity or modifier options (lines 1, 2)')
+        self.assertFalse(StockAudit.objects.exists())
+
+    def test_ticket_portions_are_bounded(self):
+        IngredientStock.objects.update(units_available=1000)
+        with self.settings(ORDER_MAX_PORTIONS=3):
+            too_many_lines = self.order([{'menu_id': self.salad.menu_id}] * 4)
+            too_many_portions = self.order([{'menu_id': self.salad.menu_id, 'quantity': 2}, {'menu_id': self.soup.menu_id, 'quantity': 2}])
+            self.assertEqual(self.order([{'menu_id': self.salad.menu_id, 'quantity': 2}, {'menu_id': self.soup.menu_id}]).status_code, status.HTTP_200_OK)
+
+        for response in (too_many_lines, too_many_portions):
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, 'Error: More than 3 portions in the order')
+        self.assertEqual(SalesAudit.objects.count(), 3)
+
+    def test_stock_rows_are_updated_in_ingredient_order(self):
+        # tickets listing the same ingredients in a different order lock their rows in the same order
+        reversed_menu = create_menu(self.location, self.ingredients[::-1], name='Reversed')
+        with CaptureQueriesContext(connection) as context:
+            self.order([{'menu_id': reversed_menu.menu_id}, {'menu_id': self.salad.menu_id}])
+
+        updated = [
+            int(query['sql'].split('"ingredient_id" = ')[1].split(' ')[0])
+            for query in context.captured_queries if query['sql'].startswith('UPDATE "inventory_ingredient_stock"')
+        ]
+        self.assertEqual(updated, sorted(ingredient.ingredient_id for ingredient in self.ingredients))
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.authentication import revoked_tokens
+from inventory.models import IngredientStock, Staff
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class StaffTokenTests(APITestCase):
+
+    def setUp(self):
+        sale_plan.invalidate()
+        revoked_tokens.clear()
+        self.location = create_location()
+        self.other_location = create_location('Big Pub')
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients
+        ])
+
+    def issue_token(self, staff_id):
+        return self.client.post('/inventory/staff-token/', {'staff_id': staff_id}, format='json')
+
+    def sell(self, token, location_id=None):
+        return self.client.post(
+            f"/inventory/menu/{self.menu.menu_id}/sell/",
+            {'location_id': location_id or self.location.location_id},
+            format='json',
+            HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def test_token_authorizes_without_staff_queries(self):
+        token = self.issue_token(self.staff.staff_id).data['token']
+        self.sell(token)  # compiles the sale plan and loads the revocation list
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sell(token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'inventory_staff' in query['sql'] or 'inventory_location' in query['sql']])
+        # 3 stock decrements, the stock audits and their rollups, the sale audit and its rollup
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 7)
+
+    def test_token_only_allows_its_locations_and_role(self):
+        token = self.issue_token(self.staff.staff_id).data['token']
+        response = self.sell(token, self.other_location.location_id)
+        self.assertEqual(response.data, 'Missing location or staff does not work in location')
+
+        manager = create_staff(2, Staff.StaffRoles.MANAGER, self.location)
+        response = self.sell(self.issue_token(manager.staff_id).data['token'])
+        self.assertEqual(response.data, 'Missing/wrong staff_id or staff with wrong role')
+
+    def test_wrong_expired_and_revoked_tokens_are_rejected(self):
+        self.assertEqual(self.issue_token(-1).status_code, status.HTTP_400_BAD_REQUEST)
+        token = self.issue_token(self.staff.staff_id).data['token']
+
+        self.assertEqual(self.sell(token[:-2]).status_code, status.HTTP_401_UNAUTHORIZED)
+        with override_settings(STAFF_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.sell(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        call_command('revoke_staff_token', token, stdout=StringIO())
+        self.assertEqual(self.sell(token).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from inventory.models import IngredientStock, SalesAudit, Staff
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class SellItemContentionTests(TransactionTestCase):
+    '''
+    Several tills sell the same dish at the same time until the stock runs out.
+    The conditional decrement must never let more sales through than the stock allows.
+    '''
+    portions = 40
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared by concurrent connections, set SQL_TEST_DATABASE to a file')
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients, quantity=0.5)
+
+    def sell_concurrently(self, sellers):
+        IngredientStock.objects.filter(location=self.location).delete()
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=0.5 * self.portions)
+            for ingredient in self.ingredients
+        ])
+        SalesAudit.objects.all().delete()
+        sold = []
+        barrier = threading.Barrier(sellers)
+
+        def seller():
+            client = APIClient()
+            barrier.wait()
+            try:
+                while True:
+                    response = client.post(
+                        f"/inventory/menu/{self.menu.menu_id}/sell/",
+                        {'staff_id': self.staff.staff_id, 'location_id': self.location.location_id},
+                        format='json'
+                    )
+                    if response.status_code != status.HTTP_200_OK:
+                        break
+                    sold.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=seller) for _ in range(sellers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(sold), time.perf_counter() - started
+
+    def test_concurrent_sellers_never_oversell(self):
+        for sellers in (1, 2, 4, 8):
+            sold, elapsed = self.sell_concurrently(sellers)
+            print(f"\n{sellers} concurrent sellers: {sold / elapsed:.1f} sales/s")
+
+            self.assertEqual(sold, self.portions)
+            self.assertEqual(SalesAudit.objects.count(), self.portions)
+            self.assertEqual(
+                list(IngredientStock.objects.filter(location=self.location).values_list('units_available', flat=True)),
+                [0.0] * len(self.ingredients)
+            )
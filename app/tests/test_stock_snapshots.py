@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+
+from inventory.audit import insert_stock_audits
+from inventory.models import Location, StockAudit, StockSnapshot, Staff
+from inventory.reports import annotate_inventory_value_at
+from inventory.snapshots import stock_at, take_stock_snapshots
+from tests.fixtures import create_location, create_staff, create_ingredients
+
+HOUR = 60 * 60
+START = datetime(2023, 3, 1, tzinfo=timezone.utc)
+
+
+class StockSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.location = create_location()
+        self.staff = create_staff(1, Staff.StaffRoles.MANAGER, self.location)
+        self.ingredients = create_ingredients(3, cost=0.5)
+        # every 20 minutes for 10 hours, a delivery of 3 units of an ingredient and a sale of 1 unit of the next one
+        self.add_audits(START, 30)
+
+    def add_audits(self, start, count):
+        for index in range(count):
+            created_at = start + timedelta(minutes=20 * index)
+            for units_change, ingredient in ((3.0, self.ingredients[index % 3]), (-1.0, self.ingredients[(index + 1) % 3])):
+                audit = StockAudit.objects.create(
+                    reason=StockAudit.StockAuditReason.DELIVERY if units_change > 0 else StockAudit.StockAuditReason.SALE,
+                    units_change=units_change, cost=0.5 * abs(units_change),
+                    ingredient=ingredient, location=self.location, staff=self.staff
+                )
+                StockAudit.objects.filter(pk=audit.pk).update(created_at=created_at)
+
+    def replay(self, at):
+        units = {}
+        for audit in StockAudit.objects.filter(location=self.location, created_at__lte=at):
+            units[audit.ingredient_id] = units.get(audit.ingredient_id, 0.0) + audit.units_change
+        return units
+
+    def test_snapshots_every_interval_with_audits(self):
+        taken = take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR)
+
+        self.assertEqual(taken, 11)
+        self.assertEqual(
+            sorted(StockSnapshot.objects.values_list('taken_at', flat=True).distinct()),
+            [START + timedelta(hours=hour) for hour in range(11)]
+        )
+        for taken_at in StockSnapshot.objects.values_list('taken_at', flat=True).distinct():
+            snapshot = dict(StockSnapshot.objects.filter(taken_at=taken_at).values_list('ingredient_id', 'units_available'))
+            self.assertEqual(snapshot, self.replay(taken_at))
+
+        # up to date, then only the new audits are replayed
+        self.assertEqual(take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR), 0)
+        self.add_audits(START + timedelta(hours=20), 3)
+        self.assertEqual(take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR), 2)
+        self.assertEqual(StockSnapshot.objects.latest('taken_at').taken_at, START + timedelta(hours=21))
+
+    def test_snapshots_are_not_taken_after_until(self):
+        take_stock_snapshots(until=START + timedelta(hours=4, minutes=30), interval=HOUR)
+
+        self.assertEqual(StockSnapshot.objects.latest('taken_at').taken_at, START + timedelta(hours=4))
+
+    def test_stock_at_any_time(self):
+        take_stock_snapshots(until=START + timedelta(hours=5), interval=HOUR)
+
+        for minutes in (0, 25, 60, 130, 299, 300, 301, 450, 2000):
+            at = START + timedelta(minutes=minutes)
+            with self.assertNumQueries(3):
+                units = stock_at(self.location.location_id, at)
+            self.assertEqual(units, self.replay(at))
+        self.assertEqual(stock_at(self.location.location_id, START - timedelta(minutes=10)), {})
+
+    def test_inventory_value_at(self):
+        at = START + timedelta(hours=7, minutes=10)
+        expected = sum(self.replay(at).values()) * 0.5
+
+        def value_at():
+            return annotate_inventory_value_at(Location.objects.filter(pk=self.location.pk), at).get().inventory_value_at
+
+        self.assertAlmostEqual(value_at(), expected)
+        take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR)
+        self.assertAlmostEqual(value_at(), expected)
+
+    def test_backdated_audits_discard_the_snapshots_after_them(self):
+        take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR)
+        insert_stock_audits([StockAudit(
+            reason=StockAudit.StockAuditReason.WASTE, units_change=-2.0, cost=1.0, ingredient=self.ingredients[0],
+            location=self.location, staff=self.staff, created_at=START + timedelta(hours=6, minutes=30)
+        )])
+
+        self.assertEqual(StockSnapshot.objects.latest('taken_at').taken_at, START + timedelta(hours=6))
+        for minutes in (300, 400, 2000):
+            at = START + timedelta(minutes=minutes)
+            self.assertEqual(stock_at(self.location.location_id, at), self.replay(at))
+        # taken again from the latest snapshot kept
+        self.assertEqual(take_stock_snapshots(until=START + timedelta(days=1), interval=HOUR), 4)
+        at = START + timedelta(hours=10)
+        snapshot = dict(StockSnapshot.objects.filter(taken_at=at).values_list('ingredient_id', 'units_available'))
+        self.assertEqual(snapshot, self.replay(at))
@@ -0,0 +1,174 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from inventory import sale_plan
+from inventory.models import IngredientStock, SalesAudit, Staff, StockAudit
+from tests.fixtures import create_location, create_staff, create_ingredients, create_menu
+
+
+class SyncTests(APITestCase):
+    url = '/inventory/sync/'
+
+    def setUp(self):
+        sale_plan.invalidate()
+        self.location = create_location()
+        self.front_of_house = create_staff(1, Staff.StaffRoles.FRONT_OF_HOUSE, self.location)
+        self.chef = create_staff(2, Staff.StaffRoles.CHEF, self.location)
+        self.ingredients = create_ingredients(3)
+        self.menu = create_menu(self.location, self.ingredients[:2], quantity=1.0, price=8.0)
+        IngredientStock.objects.bulk_create([
+            IngredientStock(ingredient=ingredient, location=self.location, units_available=10) for ingredient in self.ingredients[:2]
+        ])
+        self.now = timezone.now()
+
+    def sync(self, operations, staff=None, **headers):
+        return self.client.post(self.url, {
+            'staff_id': (staff or self.front_of_house).staff_id,
+            'location_id': self.location.location_id,
+            'operations': operations
+        }, format='json', **headers)
+
+    def at(self, minutes_ago):
+        return (self.now - timedelta(minutes=minutes_ago)).isoformat()
+
+    def waste(self, ingredient, units, minutes_ago=30):
+        return {'type': 'take_stock', 'created_at': self.at(minutes_ago), 'take_stock': [{'ingredient_id': ingredient.ingredient_id, 'units': units}]}
+
+    def sale(self, quantity=1, minutes_ago=30):
+        return {'type': 'sale', 'created_at': self.at(minutes_ago), 'items': [{'menu_id': self.menu.menu_id, 'quantity': quantity}]}
+
+    def stock(self):
+        return dict(IngredientStock.objects.values_list('ingredient_id', 'units_available'))
+
+    def test_operations_are_applied_with_their_times(self):
+        response = self.sync([self.waste(self.ingredients[0], 2, minutes_ago=90), self.sale(2, minutes_ago=60), self.sale(minutes_ago=30)])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['applied'] * 3)
+        self.assertEqual(self.stock(), {self.ingredients[0].ingredient_id: 5.0, self.ingredients[1].ingredient_id: 7.0})
+        self.assertEqual(
+            sorted(StockAudit.objects.values_list('reason', 'created_at')),
+            sorted([('waste', self.now - timedelta(minutes=90))] + [('sale', self.now - timedelta(minutes=60))] * 2 + [('sale', self.now - timedelta(minutes=30))] * 2)
+        )
+        self.assertEqual(
+            sorted(SalesAudit.objects.values_list('created_at', flat=True)),
+            [self.now - timedelta(minutes=60)] * 2 + [self.now - timedelta(minutes=30)]
+        )
+
+    def test_operation_the_stock_cannot_cover_is_rejected_alone(self):
+        response = self.sync([self.waste(self.ingredients[0], 9), self.sale(2), self.sale()])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']], ['applied', 'rejected', 'applied'])
+        self.assertEqual(response.data['results'][1]['error'], f"Error: Not enough units of ingredient {self.ingredients[0].ingredient_id} in stock")
+        self.assertEqual(self.stock(), {self.ingredients[0].ingredient_id: 0.0, self.ingredients[1].ingredient_id: 9.0})
+        self.assertEqual(SalesAudit.objects.count(), 1)
+
+    def test_later_operations_use_the_delivered_stock(self):
+        new_ingredient = self.ingredients[2]
+        delivery = {'type': 'delivery', 'created_at': self.at(20), 'delivery': [{'ingredient_id': new_ingredient.ingredient_id, 'units': 5}]}
+
+        response = self.sync([self.waste(new_ingredient, 1), delivery, self.waste(new_ingredient, 2, minutes_ago=10)], staff=self.chef)
+
+        self.assertEqual([result['status'] for result in response.data['results']], ['rejected', 'applied', 'applied'])
+        self.assertEqual(self.stock()[new_ingredient.ingredient_id], 3.0)
+        self.assertEqual(sorted(StockAudit.objects.values_list('units_change', 'cost')), [(-2.0, 4.0), (5.0, 10.0)])
+
+    def test_wrong_operations_refuse_the_batch(self):
+        delivery = {'type': 'delivery', 'created_at': self.at(20), 'delivery': [{'ingredient_id': self.ingredients[0].ingredient_id, 'units': 5}]}
+        response = self.sync([
+            self.sale(),
+            {'type': 'refund', 'created_at': self.at(20)},
+            delivery,
+            {**self.sale(), 'created_at': 'yesterday'},
+            self.sale(minutes_ago=8 * 24 * 60),
+            self.waste(self.ingredients[0], -1),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'error': 'Missing or wrong type'},
+            {'index': 2, 'error': 'Staff with wrong role for delivery'},
+            {'index': 3, 'error': 'Missing or wrong created_at, or older than 7 days'},
+            {'index': 4, 'error': 'Missing or wrong created_at, or older than 7 days'},
+            {'index': 5, 'error': 'Error: Ingredient not in catalog or negative units (lines 0)'},
+        ])
+        self.assertFalse(StockAudit.objects.exists())
+        self.assertEqual(set(self.stock().values()), {10.0})
+
+    def test_sale_quantity_is_bounded(self):
+        response = self.sync([self.sale(10 ** 9)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [
+            {'index': 0, 'error': 'Error: Menu item not available in location or wrong quantity or modifier options (lines 0)'}
+        ])
+        with self.settings(ORDER_MAX_QUANTITY=3):
+            self.assertEqual(self.sync([self.sale(3)]).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.sync([self.sale(4)]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SalesAudit.objects.count(), 3)
+
+    def test_batch_portions_are_bounded(self):
+        IngredientStock.objects.update(units_available=1000)
+        with self.settings(SYNC_MAX_PORTIONS=3):
+            too_many_lines = self.sync([self.sale(), self.sale(), {**self.sale(), 'items': [self.sale()['items'][0]] * 2}])
+            too_many_portions = self.sync([self.sale(2), self.sale(2)])
+            self.assertEqual(self.sync([self.sale(2), self.sale()]).status_code, status.HTTP_200_OK)
+
+        for response in (too_many_lines, too_many_portions):
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, 'Error: More than 3 portions sold in the batch')
+        self.assertEqual(SalesAudit.objects.count(), 3)
+
+    def test_stock_taken_by_a_concurrent_sale_is_not_oversold(self):
+        # the batch is checked against 10 units, a sale committed meanwhile left 1
+        IngredientStock.objects.filter(ingredient=self.ingredients[0]).update(units_available=1)
+        checked_stock = {ingredient.ingredient_id: 10.0 for ingredient in self.ingredients[:2]}
+        with mock.patch('inventory.sync._locked_stock', return_value=checked_stock):
+            response = self.sync([self.sale(2)], HTTP_IDEMPOTENCY_KEY='sync-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.stock(), {self.ingredients[0].ingredient_id: 1.0, self.ingredients[1].ingredient_id: 10.0})
+        self.assertFalse(SalesAudit.objects.exists())
+        # nothing was recorded for the key, the retry is applied
+        IngredientStock.objects.update(units_available=10)
+        retry = self.sync([self.sale(2)], HTTP_IDEMPOTENCY_KEY='sync-1')
+        self.assertEqual(retry.data['results'][0]['status'], 'applied')
+
+    def test_stock_rows_are_locked_in_ingredient_order(self):
+        with CaptureQueriesContext(connection) as context:
+            self.sync([self.sale()])
+
+        locking = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT "inventory_ingredient_stock"')]
+        self.assertTrue(locking[0].endswith('ORDER BY "inventory_ingredient_stock"."ingredient_id" ASC' + (' FOR UPDATE' if connection.features.has_select_for_update else '')))
+
+    def test_created_at_ahead_of_the_server_clock_is_now(self):
+        self.sync([self.sale(minutes_ago=-60)])
+
+        self.assertLess(SalesAudit.objects.get().created_at, timezone.now())
+
+    def test_batch_size_is_bounded(self):
+        with self.settings(SYNC_MAX_OPERATIONS=2):
+            response = self.sync([self.sale()] * 3)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, 'Missing or wrong operations (at most 2)')
+
+    def test_queries_do_not_grow_with_the_operations(self):
+        IngredientStock.objects.update(units_available=1000)
+        self.sync([self.sale()])  # compiles the sale plan
+
+        def queries(count):
+            with CaptureQueriesContext(connection) as context:
+                response = self.sync([self.waste(self.ingredients[0], 1), self.sale()] * count)
+            self.assertEqual(len(response.data['results']), 2 * count)
+            return len(context)
+
+        # up to the number of audits a bulk insert takes in one statement on SQLite
+        self.assertEqual(queries(10), queries(30))